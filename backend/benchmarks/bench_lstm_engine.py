@@ -0,0 +1,57 @@
+"""
+Compare the per-step `model.predict` LSTM rollout with the batched engine.
+
+    PYTHONPATH=./backend python backend/benchmarks/bench_lstm_engine.py --tickers 500 --steps 30
+"""
+import argparse
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from lstm_engine import LSTMRolloutEngine, LSTM_WINDOW
+
+
+def build_model(seed: int):
+    tf.keras.utils.set_random_seed(seed)
+    return tf.keras.Sequential([
+        tf.keras.Input(shape=(LSTM_WINDOW, 1)),
+        tf.keras.layers.LSTM(50, activation="relu"),
+        tf.keras.layers.Dense(1),
+    ])
+
+
+def predict_loop(model, window, steps):
+    seq = window.reshape(1, LSTM_WINDOW, 1)
+    for _ in range(steps):
+        p = model.predict(seq, verbose=0)[0][0]
+        seq = np.roll(seq, -1)
+        seq[0, -1, 0] = p
+    return p
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--loop-sample", type=int, default=5, help="tickers timed with the predict loop")
+    args = parser.parse_args()
+
+    models = [build_model(i) for i in range(args.tickers)]
+    windows = np.random.default_rng(0).uniform(0, 1, (args.tickers, LSTM_WINDOW)).astype(np.float32)
+
+    start = time.perf_counter()
+    for i in range(args.loop_sample):
+        predict_loop(models[i], windows[i], args.steps)
+    loop_rate = args.loop_sample / (time.perf_counter() - start)
+
+    engine = LSTMRolloutEngine(models)
+    engine.rollout(windows[:1], args.steps, model_index=np.zeros(1))  # trace
+    engine.rollout(windows, args.steps)
+
+    print(f"model.predict loop : {loop_rate:10,.1f} seq/s")
+    print(f"batched engine     : {engine.last_throughput:10,.1f} seq/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Startup time and peak RSS of serving one LSTM forecast with each runtime.
+
+Every runtime runs in a fresh interpreter: import model_loader, load one model,
+roll it forward 30 days.
+
+    PYTHONPATH=./backend python backend/benchmarks/bench_lstm_runtime.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+
+def peak_rss_mb():
+    # VmHWM (not ru_maxrss, which survives exec from the forking parent)
+    with open("/proc/self/status") as f:
+        line = next(l for l in f if l.startswith("VmHWM:"))
+    return round(int(line.split()[1]) / 1024, 1)
+
+start = time.perf_counter()
+import numpy as np
+import model_loader
+imported = time.perf_counter() - start
+mdl = model_loader.load_model("BENCH", "lstm")
+engine = model_loader.lstm_rollout_engine([mdl])
+engine.rollout(np.linspace(0, 1, 10)[None, :], 30)
+print(json.dumps({
+    "import_s": round(imported, 3),
+    "first_forecast_s": round(time.perf_counter() - start, 3),
+    "peak_rss_mb": peak_rss_mb(),
+    "tensorflow_imported": "tensorflow" in sys.modules,
+}))
+"""
+
+
+def build_artifacts(model_dir: str) -> None:
+    import tensorflow as tf
+    from lstm_numpy import export_lstm_bundle
+
+    os.makedirs(os.path.join(model_dir, "lstm"), exist_ok=True)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(10, 1)),
+        tf.keras.layers.LSTM(50, activation="relu"),
+        tf.keras.layers.Dense(1),
+    ])
+    keras_path = os.path.join(model_dir, "lstm", "BENCH.keras")
+    model.save(keras_path)
+    export_lstm_bundle(keras_path)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        # model_loader resolves local models relative to ../ml/models
+        model_dir = os.path.join(tmp, "ml", "models")
+        build_artifacts(model_dir)
+        os.makedirs(os.path.join(tmp, "backend"))
+        for name in os.listdir(BACKEND_DIR):
+            if name.endswith(".py"):
+                os.symlink(os.path.join(BACKEND_DIR, name), os.path.join(tmp, "backend", name))
+
+        results = {}
+        for runtime in ("numpy", "tensorflow"):
+            env = dict(os.environ, LSTM_RUNTIME=runtime, USE_LOCAL_MODELS="true",
+                       PYTHONPATH=os.path.join(tmp, "backend"), TF_CPP_MIN_LOG_LEVEL="3")
+            out = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+            results[runtime] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
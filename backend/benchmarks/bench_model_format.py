@@ -0,0 +1,81 @@
+"""
+Artifact size, load time and first-forecast time of pickled vs slim models.
+
+Fits one Prophet, ARIMA and XGBoost model on three years of synthetic closes,
+writes both formats, then loads each artifact in a fresh interpreter.
+
+    PYTHONPATH=./backend python backend/benchmarks/bench_model_format.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+path, family = sys.argv[1], sys.argv[2]
+if path.endswith(".slim"):
+    from slim_models import load_slim_model
+    model, _ = load_slim_model(path)
+else:
+    import joblib
+    model = joblib.load(path)
+loaded = time.perf_counter() - start
+if family == "prophet":
+    model.predict(model.make_future_dataframe(periods=30))
+elif family == "arima":
+    model.forecast(steps=30)
+else:
+    model.predict([[1.9e9]])
+print(json.dumps({"load_s": round(loaded, 4), "first_forecast_s": round(time.perf_counter() - start, 4)}))
+"""
+
+
+def fit_models(df):
+    from prophet import Prophet
+    from statsmodels.tsa.arima.model import ARIMA
+    from xgboost import XGBRegressor
+
+    X = (df["ds"].astype("int64") // 10**9).to_numpy().reshape(-1, 1)
+    return {
+        "prophet": Prophet(daily_seasonality=True).fit(df),
+        "arima": ARIMA(df["y"], order=(5, 1, 0)).fit(),
+        "xgboost": XGBRegressor(n_estimators=100).fit(X, df["y"]),
+    }
+
+
+def measure(path, family, repeats=3):
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", CHILD, path, family], env=env,
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r["load_s"])
+    return {"bytes": os.path.getsize(path), **best}
+
+
+def main():
+    from slim_models import convert_pickle
+
+    ds = pd.bdate_range(end="2024-06-28", periods=756)
+    df = pd.DataFrame({"ds": ds, "y": 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, len(ds)))})
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for family, model in fit_models(df).items():
+            pkl = os.path.join(tmp, f"{family}.pkl")
+            joblib.dump(model, pkl)
+            results[family] = {"pickle": measure(pkl, family), "slim": measure(convert_pickle(pkl), family)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
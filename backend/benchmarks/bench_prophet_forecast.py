@@ -0,0 +1,51 @@
+"""
+Latency of a Prophet forecast at the /predict horizons: the full `predict` over
+the history plus a daily future frame (what predict_horizons used to run) vs
+evaluating only the requested dates, for a pickled and a slim model, plus the
+cost of sampled uncertainty intervals.
+
+    PYTHONPATH=./backend python backend/benchmarks/bench_prophet_forecast.py
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+HORIZONS = [1, 2, 7, 10, 30]
+
+
+def timings(fn, repeats=20):
+    fn()
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"p50_ms": round(1000 * float(np.median(runs)), 3), "min_ms": round(1000 * min(runs), 3)}
+
+
+def main():
+    from prophet import Prophet
+    from model_loader import _forecast_day, _prophet_target_dates, _prophet_yhat
+    from slim_models import SlimProphet
+
+    ds = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=756)
+    df = pd.DataFrame({"ds": ds, "y": 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, len(ds)))})
+    fitted = Prophet(daily_seasonality=True).fit(df)
+    slim = SlimProphet.from_model(fitted)
+    targets = _prophet_target_dates(ds[-1], _forecast_day(ds[-1], ds[-1]), HORIZONS)
+    dates = pd.DatetimeIndex(list(targets.values()))
+
+    results = {
+        "pickle_full_predict": timings(lambda: fitted.predict(fitted.make_future_dataframe(periods=HORIZONS[-1])), 5),
+        "pickle_requested_dates": timings(lambda: _prophet_yhat(fitted, dates)),
+        "slim_future_frame": timings(lambda: slim.predict(slim.make_future_dataframe(periods=HORIZONS[-1]))),
+        "slim_requested_dates": timings(lambda: _prophet_yhat(slim, dates)),
+        "slim_intervals_1000": timings(lambda: slim.predict_interval(dates, samples=1000)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
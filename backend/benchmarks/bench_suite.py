@@ -0,0 +1,513 @@
+"""
+Offline latency, throughput and memory baseline for the API and the explore batch job.
+
+Builds a self-contained fixture in a temporary directory: synthetic OHLC
+histories for the first N S&P 500 symbols in a price store, small real
+Prophet/ARIMA/XGBoost/LSTM artifacts in a local models dir, a fundamentals
+snapshot and a constituent list restricted to those symbols. Every scenario
+then runs in a fresh interpreter with USE_LOCAL_MODELS=true and the network
+pointed at a dead proxy, and reports p50/p99 latency, throughput and peak RSS.
+
+    PYTHONPATH=./backend python backend/benchmarks/bench_suite.py --out baseline.json
+    PYTHONPATH=./backend python backend/benchmarks/bench_suite.py --compare baseline.json
+    PYTHONPATH=./backend python backend/benchmarks/bench_suite.py --compare old.json --current new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+ML_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "ml")
+BASELINE_VERSION = 1
+MODELS = ["prophet", "arima", "xgboost", "lstm"]
+SCENARIOS = ["cold_start", "load_model", "predict", "predict_pool", "compare", "predict_batch", "explore", "metrics", "explore_batch"]
+# Results compared by --compare: a higher value is worse unless listed in HIGHER_IS_BETTER
+COMPARED = ("p50_ms", "p99_ms", "throughput_per_s")
+HIGHER_IS_BETTER = {"throughput_per_s"}
+# Cold-start import budgets (ms, cumulative per backend module, p50 over fresh
+# interpreters) on top of numpy/pandas/fastapi, which every worker pays anyway.
+# Exceeding one is reported, and fails --compare.
+IMPORT_BUDGET_MS = {"main": 400, "model_loader": 150, "price_store": 50, "data": 100}
+
+
+# === Fixture ===
+
+def synthetic_ohlc(rows: int, seed: int, end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """Daily OHLCV bars from a geometric random walk, shaped like `yf.download`."""
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range(end=end or pd.Timestamp.now().normalize(), periods=rows)
+    close = (20 + 480 * rng.random()) * np.exp(np.cumsum(rng.normal(0.0003, 0.015, rows)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * np.exp(rng.normal(0, 0.004, rows))
+    spread = np.abs(rng.normal(0, 0.01, rows)) * close
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 50_000_000, rows),
+    }, index=idx)
+
+
+class SyntheticSource:
+    """PriceStore source serving the synthetic bars, in place of Yahoo Finance."""
+
+    def __init__(self, bars: Dict[str, pd.DataFrame]):
+        self.bars = bars
+
+    def fetch(self, ticker: str, start=None, period: str = "3y") -> pd.DataFrame:
+        df = self.bars[ticker]
+        if start is not None:
+            df = df[df.index >= start]
+        return pd.DataFrame({"ds": df.index, "y": df["Close"].to_numpy(dtype=np.float64)})
+
+
+def fit_artifacts(df: pd.DataFrame, out: str) -> Dict[str, str]:
+    """Fit one small model per family and write its serving artifact. Returns {model: path}."""
+    import tensorflow as tf
+    from prophet import Prophet
+    from statsmodels.tsa.arima.model import ARIMA
+    from xgboost import XGBRegressor
+    from lstm_engine import extract_lstm_weights
+    from lstm_numpy import LSTM_WINDOW, save_lstm_bundle
+    from slim_models import save_slim_model
+
+    os.makedirs(out, exist_ok=True)
+    X = (df["ds"].astype("int64") // 10**9).to_numpy().reshape(-1, 1)
+    fitted = {
+        "prophet": Prophet(daily_seasonality=True).fit(df),
+        "arima": ARIMA(df["y"], order=(5, 1, 0)).fit(),
+        "xgboost": XGBRegressor(n_estimators=100).fit(X, df["y"]),
+    }
+    paths = {m: save_slim_model(model, os.path.join(out, f"{m}.slim")) for m, model in fitted.items()}
+
+    # Same layout as ml/train_model.fit_lstm, trained for a single epoch
+    y = df["y"].to_numpy()
+    scaled = ((y - y.min()) / (y.max() - y.min())).astype(np.float32)
+    windows = np.lib.stride_tricks.sliding_window_view(scaled[:-1], LSTM_WINDOW)[..., None]
+    tf.keras.utils.set_random_seed(0)
+    lstm = tf.keras.Sequential([
+        tf.keras.Input(shape=(LSTM_WINDOW, 1)),
+        tf.keras.layers.LSTM(50, activation="relu"),
+        tf.keras.layers.Dense(1),
+    ])
+    lstm.compile(optimizer="adam", loss="mse")
+    lstm.fit(windows, scaled[LSTM_WINDOW:], epochs=1, verbose=0)
+    paths["lstm"] = save_lstm_bundle(extract_lstm_weights(lstm), os.path.join(out, "lstm.npz"))
+    return paths
+
+
+def build_fixture(root: str, tickers: int, rows: int) -> List[str]:
+    """
+    Lay out `root` the way the services expect it and return the tickers used.
+    The artifacts are fitted once per family and copied under every ticker:
+    latency depends on the family and artifact size, not on which series it was fitted to.
+    """
+    import shutil
+    from constituents import registry
+    from price_store import PriceStore
+
+    symbols = registry.yahoo_symbols()[:tickers]
+    bars = {t: synthetic_ohlc(rows, seed=i) for i, t in enumerate(symbols)}
+
+    store = PriceStore(os.path.join(root, "prices"), source=SyntheticSource(bars))
+    for t in symbols:
+        store.update(t, force=True)
+
+    model_dir = os.path.join(root, "ml", "models")
+    first = store.frame(symbols[0], period="max", refresh=False)
+    for model, path in fit_artifacts(first, os.path.join(root, "artifacts")).items():
+        os.makedirs(os.path.join(model_dir, model))
+        for t in symbols:
+            shutil.copyfile(path, os.path.join(model_dir, model, t + os.path.splitext(path)[1]))
+        accuracy = {t: round(0.9 + 0.05 * np.sin(i), 4) for i, t in enumerate(symbols)}
+        with open(os.path.join(model_dir, model, "accuracy.json"), "w") as f:
+            json.dump(accuracy, f)
+
+    explore = [{"ticker": t, "current_price": round(float(bars[t]["Close"].iloc[-1]), 2),
+                "predicted_price": round(float(bars[t]["Close"].iloc[-1]) * 1.01, 2),
+                "percent_change": round(float(np.sin(i)), 2)} for i, t in enumerate(symbols)]
+    os.makedirs(os.path.join(model_dir, "analytics"))
+    with open(os.path.join(model_dir, "analytics", "gainers_losers.json"), "w") as f:
+        json.dump({"timestamp": datetime.utcnow().isoformat(), "models_used": MODELS,
+                   "top_gainers": sorted(explore, key=lambda r: -r["percent_change"]),
+                   "top_losers": sorted(explore, key=lambda r: r["percent_change"])}, f)
+    from ranking_index import write_index
+    model_preds = {r["ticker"]: {m: r["current_price"] * (1 + np.sin(i + j) / 10) for j, m in enumerate(MODELS)}
+                   for i, r in enumerate(explore)}
+    write_index(os.path.join(model_dir, "analytics", "ranking_index.slim"), explore, model_preds, MODELS,
+                {t: registry.metadata.get(t.replace("-", "."), {}) for t in symbols}, datetime.utcnow().isoformat())
+
+    snapshot = {"version": 1, "as_of": "9999-12-31", "source": "benchmark",
+                "constituents": [{"symbol": t, "company": registry.metadata.get(t.replace("-", "."), {}).get("company", t),
+                                  "sector": "Benchmark", "sub_industry": "Benchmark"} for t in symbols]}
+    with open(os.path.join(root, "sp500.json"), "w") as f:
+        json.dump(snapshot, f)
+    with open(os.path.join(root, "bars.json"), "w") as f:
+        json.dump({t: {"price": float(b["Close"].iloc[-1]), "volume": int(b["Volume"].iloc[-1])}
+                   for t, b in bars.items()}, f)
+
+    # The services resolve the models dir relative to their own files
+    for src, name in ((BACKEND_DIR, "backend"), (ML_DIR, "ml")):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+        for f in os.listdir(src):
+            if f.endswith((".py", ".json")):
+                os.symlink(os.path.join(src, f), os.path.join(root, name, f))
+    return symbols
+
+
+def write_fundamentals(root: str) -> str:
+    """Fresh fundamentals snapshot, so /metrics answers from memory without revalidating."""
+    from fundamentals import FIELDS, SNAPSHOT_VERSION
+
+    with open(os.path.join(root, "bars.json")) as f:
+        quotes = json.load(f)
+    now = time.time()
+    tickers = {}
+    for i, (t, q) in enumerate(quotes.items()):
+        values = {"name": t, "market_cap": 1e9 * (i + 1), "pe_ratio": 20.0, "eps": 5.0,
+                  "dividend_yield": 0.01, "sector": "Benchmark", "industry": "Benchmark",
+                  "52_week_high": q["price"] * 1.2, "52_week_low": q["price"] * 0.8, **q}
+        tickers[t] = {field: [values[field], now] for field in FIELDS}
+    path = os.path.join(root, "fundamentals.json")
+    with open(path, "w") as f:
+        json.dump({"version": SNAPSHOT_VERSION, "tickers": tickers}, f)
+    return path
+
+
+def scenario_env(root: str) -> dict:
+    return dict(
+        os.environ,
+        PYTHONPATH=os.path.join(root, "backend"),
+        USE_LOCAL_MODELS="true",
+        PRICE_STORE_DIR=os.path.join(root, "prices"),
+        PRICE_REFRESH_SECONDS=str(10**9),
+        CONSTITUENTS_CACHE_PATH=os.path.join(root, "sp500.json"),
+        FUNDAMENTALS_PATH=os.path.join(root, "fundamentals.json"),
+        REQUEST_STATS_PATH=os.path.join(root, "request_counts.json"),
+        METRICS_TEXTFILE_DIR=os.path.join(root, "metrics"),
+        TF_CPP_MIN_LOG_LEVEL="3",
+        # Anything that still reaches for the network fails fast instead of hanging
+        HTTP_PROXY="http://127.0.0.1:9", HTTPS_PROXY="http://127.0.0.1:9", NO_PROXY="",
+    )
+
+
+# === Scenarios (run inside the fresh interpreter) ===
+
+def _client():
+    from fastapi.testclient import TestClient
+    import main
+
+    # No `with`: startup hooks would start the network-backed background refreshes
+    return TestClient(main.app)
+
+
+def _timed_calls(fn, args_list) -> List[float]:
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.url} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def _import_times_ms(stderr: str) -> Dict[str, float]:
+    """Cumulative ms per module from `python -X importtime` output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def run_cold_start(tickers, rounds):
+    runs = {m: [] for m in IMPORT_BUDGET_MS}
+    for _ in range(max(5, rounds)):
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import numpy, pandas, fastapi; import main"],
+                             capture_output=True, text=True, check=True)
+        times = _import_times_ms(out.stderr)
+        for module in runs:
+            runs[module].append(times.get(module, 0.0) / 1000)
+    return {f"import_{m}": (seconds, 0) for m, seconds in runs.items()}
+
+
+def run_load_model(tickers, rounds):
+    import model_loader
+
+    results = {}
+    for model in MODELS:
+        # The first pass reads every artifact from disk; later passes hit the model cache
+        calls = [(t, model) for t in tickers]
+        results[f"{model}_cold"] = (_timed_calls(model_loader.load_model, calls), None)
+        results[f"{model}_warm"] = (_timed_calls(model_loader.load_model, calls * rounds), None)
+    return results
+
+
+def run_predict(tickers, rounds):
+    client = _client()
+    post = lambda t, m: _ok(client.post("/predict", json={"ticker": t, "model": m}))
+    return {m: (_timed_calls(post, [(t, m) for _ in range(rounds) for t in tickers]), None) for m in MODELS}
+
+
+def run_predict_pool(tickers, rounds):
+    # Same requests, forecast in the per-family inference worker processes
+    from model_workers import pool
+
+    pool.start()
+    try:
+        return run_predict(tickers, rounds)
+    finally:
+        pool.stop()
+
+
+def run_compare(tickers, rounds):
+    client = _client()
+    get = lambda t: _ok(client.get(f"/compare/{t}", params={"days": 7}))
+    return {"compare": (_timed_calls(get, [(t,) for _ in range(rounds) for t in tickers]), None)}
+
+
+def run_predict_batch(tickers, rounds):
+    client = _client()
+    first_rows, latencies = [], []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        with client.stream("POST", "/predict/batch", json={"tickers": tickers, "models": MODELS}) as response:
+            _ok(response)
+            for i, line in enumerate(response.iter_lines()):
+                if i == 0:
+                    first_rows.append(time.perf_counter() - start)
+        latencies.append(time.perf_counter() - start)
+    items = len(tickers) * len(MODELS) * rounds
+    return {"batch": (latencies, items), "first_row": (first_rows, 0)}
+
+
+def run_explore(tickers, rounds):
+    client = _client()
+    n = 50 * rounds
+    get = lambda h: _ok(client.get("/explore/top-gainers", params={"limit": 10}, headers=h))
+    etag = get({}).headers["etag"]
+    results = {"top_gainers": (_timed_calls(get, [({},)] * n), None),
+               "not_modified": (_timed_calls(get, [({"If-None-Match": etag},)] * n), None)}
+
+    # Filtered rankings straight from the index, uncached: every query is a different one
+    import model_loader
+    index = model_loader.ranking_cache.data
+    sectors = list(index.sectors()) or [None]
+    queries = [(d, limit, m, sectors[i % len(sectors)]) for i, (d, limit, m) in enumerate(
+        (d, limit, m) for d in ("top_gainers", "top_losers") for limit in (10, 100) for m in index.models)]
+    results["index_query"] = (_timed_calls(index.top, queries * rounds), None)
+    return results
+
+
+def run_metrics(tickers, rounds):
+    client = _client()
+    single = lambda t: _ok(client.get("/metrics", params={"ticker": t}))
+    batch = lambda: _ok(client.get("/metrics", params={"tickers": ",".join(tickers[:100])}))
+    return {"single": (_timed_calls(single, [(t,) for _ in range(rounds) for t in tickers]), None),
+            "batch": (_timed_calls(batch, [()] * rounds * 5), None)}
+
+
+def run_explore_batch(tickers, rounds):
+    import explore_batch
+
+    results = {}
+    # The first run forecasts every (ticker, model); the next one reuses them all
+    for name in ("full", "incremental"):
+        start = time.perf_counter()
+        explore_batch.compute_gainers_losers(run_id=f"bench-{name}")
+        results[name] = ([time.perf_counter() - start], len(tickers) * len(MODELS))
+    return results
+
+
+RUNNERS = {
+    "cold_start": run_cold_start,
+    "load_model": run_load_model,
+    "predict": run_predict,
+    "predict_pool": run_predict_pool,
+    "compare": run_compare,
+    "predict_batch": run_predict_batch,
+    "explore": run_explore,
+    "metrics": run_metrics,
+    "explore_batch": run_explore_batch,
+}
+
+
+def peak_rss_mb(who: str = "self") -> float:
+    if who == "children":
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    # VmHWM (not ru_maxrss, which survives exec from the forking parent)
+    with open("/proc/self/status") as f:
+        line = next(l for l in f if l.startswith("VmHWM:"))
+    return round(int(line.split()[1]) / 1024, 1)
+
+
+def latency_summary(latencies: List[float], items: Optional[int] = None) -> dict:
+    """
+    p50/p99/mean in ms, and items (default: calls) per second of total time.
+    `items=0` marks a latency-only result.
+    """
+    ms = np.asarray(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        "n": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_per_s": round((len(ms) if items is None else items) / total, 3) if total and items != 0 else None,
+    }
+
+
+def child_main(name: str, tickers: List[str], rounds: int) -> None:
+    start = time.perf_counter()
+    results = RUNNERS[name](tickers, rounds)
+    print(json.dumps({
+        "wall_s": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "children_peak_rss_mb": peak_rss_mb("children"),
+        "results": {k: latency_summary(lat, items) for k, (lat, items) in results.items()},
+    }))
+
+
+# === Driver ===
+
+def run_scenario(root: str, name: str, tickers: List[str], rounds: int) -> dict:
+    write_fundamentals(root)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", name,
+           "--tickers-list", ",".join(tickers), "--rounds", str(rounds)]
+    # explore_batch must be imported from the fixture's ml dir to use its models dir
+    env = scenario_env(root)
+    env["PYTHONPATH"] += os.pathsep + os.path.join(root, "ml")
+    out = subprocess.run(cmd, env=env, cwd=root, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"Scenario {name} failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_suite(tickers: int, rows: int, rounds: int, scenarios: List[str]) -> dict:
+    with tempfile.TemporaryDirectory(prefix="shrubb-bench-") as root:
+        start = time.perf_counter()
+        symbols = build_fixture(root, tickers, rows)
+        print(f"🧪 Built fixture for {len(symbols)} tickers in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        results = {}
+        for name in scenarios:
+            results[name] = run_scenario(root, name, symbols, rounds)
+            print(f"⏱️ {name}: {results[name]['wall_s']}s, peak {results[name]['peak_rss_mb']} MB", file=sys.stderr)
+    return {
+        "version": BASELINE_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {"tickers": tickers, "rows": rows, "rounds": rounds},
+        "scenarios": results,
+    }
+
+
+def flatten(baseline: dict) -> Dict[str, float]:
+    """{"predict/prophet/p50_ms": ..., "predict/peak_rss_mb": ...} for every compared value."""
+    flat = {}
+    for scenario, run in baseline["scenarios"].items():
+        flat[f"{scenario}/peak_rss_mb"] = run["peak_rss_mb"]
+        for name, summary in run["results"].items():
+            for key in COMPARED:
+                if summary.get(key) is not None:
+                    flat[f"{scenario}/{name}/{key}"] = summary[key]
+    return flat
+
+
+def over_budget(current: dict) -> List[str]:
+    """Modules whose cold-start import p50 exceeds IMPORT_BUDGET_MS."""
+    results = current["scenarios"].get("cold_start", {}).get("results", {})
+    return [f"{m}: {results[f'import_{m}']['p50_ms']} ms > {budget} ms" for m, budget in IMPORT_BUDGET_MS.items()
+            if f"import_{m}" in results and results[f"import_{m}"]["p50_ms"] > budget]
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.25) -> List[dict]:
+    """
+    One row per value present in both runs, with the relative change and
+    whether it got worse by more than `tolerance`.
+    """
+    old, new = flatten(baseline), flatten(current)
+    rows = []
+    for key in sorted(old.keys() & new.keys()):
+        change = (new[key] - old[key]) / old[key] if old[key] else 0.0
+        worse = -change if key.rsplit("/", 1)[-1] in HIGHER_IS_BETTER else change
+        rows.append({"metric": key, "baseline": old[key], "current": new[key],
+                     "change": round(change, 4), "regressed": worse > tolerance})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=756, help="bars per ticker (3 years)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--out", help="write the baseline JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--current", help="compare this baseline JSON instead of running the suite")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--tickers-list", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args.child, args.tickers_list.split(","), args.rounds)
+        return
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args.tickers, args.rows, args.rounds, args.scenarios.split(","))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+    budget_errors = over_budget(current)
+    for error in budget_errors:
+        print(f"⚠️ Cold-start import budget exceeded: {error}", file=sys.stderr)
+    if not args.compare:
+        if not args.out:
+            print(json.dumps(current, indent=2))
+        return
+
+    with open(args.compare) as f:
+        rows = compare(json.load(f), current, args.tolerance)
+    for row in rows:
+        flag = "❌" if row["regressed"] else "  "
+        print(f"{flag} {row['metric']:<48} {row['baseline']:>12,.3f} → {row['current']:>12,.3f} ({row['change']:+.1%})")
+    regressions = [r for r in rows if r["regressed"]]
+    print(f"{len(regressions)} of {len(rows)} values regressed by more than {args.tolerance:.0%}")
+    sys.exit(1 if regressions or budget_errors else 0)
+
+
+if __name__ == "__main__":
+    main()
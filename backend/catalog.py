@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from instrumentation import cache_event
+
+# Catalog of published models, written by ml/model_unpacker.py to
+# s3://<bucket>/models/catalog.json after every training run:
+#
+#   {"version": 1, "updated_at": ...,
+#    "artifacts": {"models/<model>/<file>": {"sha256", "size", "updated_at"}},
+#    "models": {"<model>": {"<TICKER>": {"artifacts": {".slim": {"key", "size", "sha256"}, ...},
+#                                       "accuracy", "trained_at", "last_ds"}}}}
+#
+# The backend loads it once into in-memory indexes and re-reads it only when its
+# ETag changes, so availability and accuracy lookups never touch disk or S3.
+# Until the unpacker has written one, the backend builds it once from the
+# published artifacts and accuracy files (scan_s3_catalog).
+
+CATALOG_KEY = "models/catalog.json"
+CATALOG_VERSION = 1
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+ARTIFACT_EXTENSIONS = (".pkl", ".slim", ".keras", ".npz")
+
+
+def build_catalog(artifacts: Dict[str, dict], accuracy: Dict[str, Dict[str, float]],
+                  state: Dict[str, Dict[str, dict]]) -> Dict[str, Dict[str, dict]]:
+    """
+    Index published artifacts by model and ticker, joined with each ticker's
+    accuracy and training state.
+    """
+    models: Dict[str, Dict[str, dict]] = {}
+    for key, meta in artifacts.items():
+        parts = key.split("/")
+        if len(parts) != 3:
+            continue
+        _, model, filename = parts
+        ticker, ext = os.path.splitext(filename)
+        if ext not in ARTIFACT_EXTENSIONS:
+            continue
+        entry = models.setdefault(model, {}).setdefault(ticker, {"artifacts": {}})
+        entry["artifacts"][ext] = {"key": key, "size": meta.get("size"), "sha256": meta.get("sha256")}
+
+    for model, tickers in models.items():
+        for ticker, entry in tickers.items():
+            trained = state.get(model, {}).get(ticker, {})
+            entry["accuracy"] = accuracy.get(model, {}).get(ticker)
+            entry["trained_at"] = trained.get("trained_at")
+            entry["last_ds"] = trained.get("last_ds")
+    return models
+
+
+def scan_local_catalog(model_dir: str) -> dict:
+    """Catalog of a local models directory (USE_LOCAL_MODELS), without content hashes."""
+    artifacts, accuracy, state = {}, {}, {}
+    try:
+        model_names = [m for m in os.listdir(model_dir) if os.path.isdir(os.path.join(model_dir, m))]
+    except FileNotFoundError:
+        model_names = []
+    for model in model_names:
+        d = os.path.join(model_dir, model)
+        for filename in os.listdir(d):
+            path = os.path.join(d, filename)
+            if filename.endswith(ARTIFACT_EXTENSIONS):
+                artifacts[f"models/{model}/{filename}"] = {"size": os.path.getsize(path), "sha256": None}
+            elif filename in ("accuracy.json", "training_state.json"):
+                try:
+                    with open(path) as f:
+                        (accuracy if filename == "accuracy.json" else state)[model] = json.load(f)
+                except ValueError:
+                    pass
+    return {"version": CATALOG_VERSION, "models": build_catalog(artifacts, accuracy, state)}
+
+
+def scan_s3_catalog(s3, bucket: str) -> dict:
+    """
+    Catalog of the model files already published to `bucket`, for when
+    catalog.json hasn't been written yet. Sizes come from the listing, hashes
+    are left out.
+    """
+    artifacts, model_files = {}, []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix="models/"):
+        for obj in page.get("Contents", []):
+            parts = obj["Key"].split("/")
+            if len(parts) != 3:
+                continue
+            if parts[2].endswith(ARTIFACT_EXTENSIONS):
+                artifacts[obj["Key"]] = {"size": obj["Size"], "sha256": None}
+            elif parts[2] in ("accuracy.json", "training_state.json"):
+                model_files.append(obj["Key"])
+    accuracy, state = {}, {}
+    for key in model_files:
+        _, model, filename = key.split("/")
+        try:
+            data = json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+        except ValueError:
+            continue
+        (accuracy if filename == "accuracy.json" else state)[model] = data
+    return {"version": CATALOG_VERSION, "models": build_catalog(artifacts, accuracy, state)}
+
+
+class ModelCatalog:
+    """
+    In-memory indexes over the catalog. `fetch(etag)` returns (catalog, etag), or
+    (None, etag) when the catalog hasn't changed since `etag`.
+    """
+
+    def __init__(self, fetch: Callable[[Optional[str]], Tuple[Optional[dict], Optional[str]]]):
+        self.fetch = fetch
+        self.etag: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self._tickers: Dict[str, Dict[str, List[str]]] = {}
+        self._entries: Dict[Tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """Re-read the catalog if it changed. Returns True when the indexes were rebuilt."""
+        try:
+            catalog, etag = self.fetch(self.etag)
+        except Exception as e:
+            print(f"⚠️ Failed to load model catalog: {e}")
+            cache_event("catalog", "refresh_error")
+            self.loaded_at = self.loaded_at or time.time()
+            return False
+        self.loaded_at = time.time()
+        if catalog is None:
+            cache_event("catalog", "revalidated")
+            return False
+        cache_event("catalog", "reloaded")
+
+        entries, tickers = {}, {}
+        for model, by_ticker in catalog.get("models", {}).items():
+            by_ext = {}
+            for ticker, entry in by_ticker.items():
+                entries[(ticker.upper(), model)] = entry
+                for ext in entry.get("artifacts", {}):
+                    by_ext.setdefault(ext, []).append(ticker.upper())
+            tickers[model] = {ext: sorted(ts) for ext, ts in by_ext.items()}
+        with self._lock:
+            self._entries, self._tickers, self.etag = entries, tickers, etag
+        print(f"📚 Loaded model catalog: {len(entries)} ticker/model entries")
+        return True
+
+    def _ensure_loaded(self) -> None:
+        # Only the very first lookup can block, if it beats the background refresh
+        if self.loaded_at is None:
+            self.refresh()
+
+    def entry(self, ticker: str, model: str) -> Optional[dict]:
+        self._ensure_loaded()
+        return self._entries.get((ticker.upper(), model))
+
+    def has(self, ticker: str, model: str, ext: str) -> bool:
+        entry = self.entry(ticker, model)
+        return entry is not None and ext in entry.get("artifacts", {})
+
+    def tickers(self, model: str, ext: str) -> List[str]:
+        self._ensure_loaded()
+        return list(self._tickers.get(model, {}).get(ext, []))
+
+    def accuracy(self, ticker: str, model: str) -> Optional[float]:
+        entry = self.entry(ticker, model)
+        if entry is None or entry.get("accuracy") is None:
+            return None
+        return round(entry["accuracy"], 4)
+
+    def start_background_refresh(self, interval: int = CATALOG_REFRESH_SECONDS) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            while True:
+                self.refresh()
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=loop, name="catalog-refresh", daemon=True)
+        self._thread.start()
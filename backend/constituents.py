@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import time
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+
+# S&P 500 constituent registry shared by the backend and the ml jobs.
+#
+# Loads instantly and offline from the last successful scrape in
+# CONSTITUENTS_CACHE_PATH, or from the seed snapshot bundled next to this file
+# (sp500_snapshot.json) when there is none. Refreshing scrapes Wikipedia and can
+# run in a background thread, so no process has to wait on the network to start.
+# A list shorter than MIN_CONSTITUENTS is never persisted by a refresh and is
+# only used, with a warning, when nothing better is available.
+
+WIKIPEDIA_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sp500_snapshot.json")
+CONSTITUENTS_CACHE_PATH = os.getenv("CONSTITUENTS_CACHE_PATH", "/tmp/shrubb_sp500.json")
+CONSTITUENTS_MAX_AGE_SECONDS = int(os.getenv("CONSTITUENTS_MAX_AGE_SECONDS", str(24 * 3600)))
+MIN_CONSTITUENTS = int(os.getenv("MIN_CONSTITUENTS", "400"))
+SNAPSHOT_VERSION = 1
+
+
+def scrape_constituents() -> dict:
+    """
+    Scrape the S&P 500 companies table from Wikipedia into a snapshot dict.
+    """
+    import pandas as pd
+
+    df = pd.read_html(WIKIPEDIA_URL, header=0)[0]
+    records = [
+        {"symbol": s, "company": c, "sector": sec, "sub_industry": sub}
+        for s, c, sec, sub in zip(df["Symbol"], df["Security"], df["GICS Sector"], df["GICS Sub-Industry"])
+    ]
+    return {
+        "version": SNAPSHOT_VERSION,
+        "as_of": date.today().isoformat(),
+        "source": WIKIPEDIA_URL,
+        "constituents": records,
+    }
+
+
+def _read_snapshot(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION or not snapshot.get("constituents"):
+        return None
+    return snapshot
+
+
+def _plausible(snapshot: dict) -> bool:
+    return len(snapshot["constituents"]) >= MIN_CONSTITUENTS
+
+
+def _write_snapshot(snapshot: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f, indent=1)
+    os.replace(tmp, path)
+
+
+class ConstituentRegistry:
+    """
+    In-memory view of the constituent list. `tickers` and `metadata` are updated
+    in place on refresh, so modules holding references to them see new data.
+    """
+
+    def __init__(self, snapshot_path: str = SNAPSHOT_PATH, cache_path: str = CONSTITUENTS_CACHE_PATH):
+        self.snapshot_path = snapshot_path
+        self.cache_path = cache_path
+        self.tickers: List[str] = []
+        self.metadata: Dict[str, dict] = {}
+        self.as_of: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.load()
+
+    def load(self) -> None:
+        # A scraped cache beats the bundled seed whatever their dates, unless it is implausibly short
+        candidates = [s for s in (_read_snapshot(self.cache_path), _read_snapshot(self.snapshot_path)) if s]
+        if not candidates:
+            return
+        snapshot = next((s for s in candidates if _plausible(s)), candidates[0])
+        if not _plausible(snapshot):
+            print(f"⚠️ Only {len(snapshot['constituents'])} S&P 500 constituents available "
+                  f"(as of {snapshot['as_of']}); refresh the list")
+        self._apply(snapshot)
+
+    def _apply(self, snapshot: dict) -> None:
+        records = snapshot["constituents"]
+        with self._lock:
+            self.tickers[:] = [r["symbol"] for r in records]
+            self.metadata.clear()
+            self.metadata.update({
+                r["symbol"]: {"company": r["company"], "sector": r["sector"], "sub_industry": r["sub_industry"]}
+                for r in records
+            })
+            self.as_of = snapshot["as_of"]
+
+    def yahoo_symbols(self) -> List[str]:
+        """Tickers in Yahoo Finance format (BRK.B -> BRK-B)."""
+        return [t.replace(".", "-") for t in self.tickers]
+
+    def is_stale(self) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self.cache_path) > CONSTITUENTS_MAX_AGE_SECONDS
+        except FileNotFoundError:
+            return True
+
+    def refresh(self) -> bool:
+        """
+        Scrape a fresh list, persist it to the cache and swap it in. Keeps the
+        current list on failure.
+        """
+        try:
+            snapshot = scrape_constituents()
+        except Exception as e:
+            print(f"⚠️ Failed to refresh S&P 500 constituents: {e}")
+            return False
+        if not _plausible(snapshot):
+            print(f"⚠️ Ignoring S&P 500 scrape with only {len(snapshot['constituents'])} constituents")
+            return False
+        _write_snapshot(snapshot, self.cache_path)
+        self._apply(snapshot)
+        print(f"📋 Refreshed S&P 500 constituents: {len(self.tickers)} tickers")
+        return True
+
+    def refresh_if_stale(self) -> bool:
+        return self.refresh() if self.is_stale() else False
+
+    def start_background_refresh(self, interval: int = CONSTITUENTS_MAX_AGE_SECONDS) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            while True:
+                self.refresh_if_stale()
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=loop, name="constituents-refresh", daemon=True)
+        self._thread.start()
+
+
+registry = ConstituentRegistry()
+
+
+if __name__ == "__main__":
+    # Usage: python constituents.py --write-snapshot
+    # Regenerates the bundled snapshot from Wikipedia.
+    if "--write-snapshot" in sys.argv:
+        _write_snapshot(scrape_constituents(), SNAPSHOT_PATH)
+        print(f"✅ Wrote {SNAPSHOT_PATH}")
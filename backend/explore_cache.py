@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from instrumentation import cache_event, timed
+
+# In-process cache of the explore payload (analytics/gainers_losers.json, written
+# by ml/explore_batch.py). The object changes at most once per batch run, so it
+# is revalidated against its ETag (S3) or mtime (local) at most every
+# EXPLORE_REFRESH_SECONDS, in the background once a copy is loaded. Responses
+# are serialized once per (list, limit) and served as bytes until the data
+# changes; a failed refresh keeps the last good copy.
+
+EXPLORE_REFRESH_SECONDS = int(os.getenv("EXPLORE_REFRESH_SECONDS", "60"))
+EMPTY_EXPLORE = {"top_gainers": [], "top_losers": []}
+
+
+class ExploreCache:
+    """
+    `fetch(validator)` returns (payload, validator), or (None, validator) when
+    the object hasn't changed since `validator`.
+    """
+
+    def __init__(self, fetch: Callable[[Optional[str]], Tuple[Optional[dict], Optional[str]]],
+                 interval: int = EXPLORE_REFRESH_SECONDS, name: str = "explore"):
+        self.fetch = fetch
+        self.interval = interval
+        self.name = name
+        self.data: dict = dict(EMPTY_EXPLORE)
+        self.validator: Optional[str] = None
+        self.loaded = False
+        self.checked_at: Optional[float] = None
+        self._bodies: Dict[Tuple[str, int], Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def refresh(self) -> bool:
+        """Revalidate now. Returns True when new data was loaded."""
+        try:
+            with timed(f"{self.name}_refresh"):
+                data, validator = self.fetch(self.validator)
+        except Exception as e:
+            print(f"⚠️ Failed to refresh {self.name} data: {e}")
+            cache_event(self.name, "refresh_error")
+            self.checked_at = time.monotonic()
+            return False
+        self.checked_at = time.monotonic()
+        if data is None:
+            cache_event(self.name, "revalidated")
+            return False
+        cache_event(self.name, "reloaded")
+        with self._lock:
+            self.data, self.validator, self.loaded = data, validator, True
+            self._reset_bodies()
+        return True
+
+    def _reset_bodies(self) -> None:
+        self._bodies = {}
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name=f"{self.name}-refresh", daemon=True).start()
+
+    @property
+    def due(self) -> bool:
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.interval
+
+    def ensure_loaded(self) -> None:
+        """Blocks only until the first load attempt; later revalidations run in the background."""
+        if self.checked_at is None:
+            self.refresh()
+        elif self.due:
+            self._refresh_in_background()
+
+    def body(self, key: str, limit: int) -> Tuple[bytes, str]:
+        """JSON bytes of the first `limit` rows of `key`, and their ETag."""
+        self.ensure_loaded()
+        cached = self._bodies.get((key, limit))
+        cache_event(self.name, "hit" if cached is not None else "miss")
+        if cached is None:
+            with self._lock:
+                body = json.dumps(self.data.get(key, [])[:limit]).encode()
+                cached = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+                self._bodies[(key, limit)] = cached
+        return cached
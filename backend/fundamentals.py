@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import fcntl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from instrumentation import cache_event, timed
+
+# Fundamentals snapshot behind /metrics.
+#
+# Every field has its own TTL: quotes go stale in minutes, ratios in an hour,
+# company details in a week. Lookups answer from memory; a field past its TTL
+# is still served (stale-while-revalidate) for up to FUNDAMENTALS_STALE_SECONDS
+# while a background refresh fetches it again, and only a ticker with nothing
+# servable is fetched inline. Quotes for all due tickers come from one bulk
+# download; the slower per-ticker `info` calls run on a thread pool and only for
+# tickers whose info fields are due. The snapshot is persisted to
+# FUNDAMENTALS_PATH so a restarted worker starts warm.
+#
+# All web workers on a host share that file. The scheduled refresh runs in one
+# of them only: whichever holds the flock on FUNDAMENTALS_PATH.leader (taken
+# over by another worker if the holder exits). The others re-read the snapshot
+# when it changes and leave due fields to the leader. Writes merge with the file
+# under FUNDAMENTALS_PATH.lock, keeping the most recently fetched copy of each
+# field, so concurrent inline fetches don't overwrite each other.
+
+FUNDAMENTALS_PATH = os.getenv("FUNDAMENTALS_PATH", "/tmp/shrubb_fundamentals.json")
+FUNDAMENTALS_REFRESH_SECONDS = int(os.getenv("FUNDAMENTALS_REFRESH_SECONDS", "300"))
+FUNDAMENTALS_STALE_SECONDS = int(os.getenv("FUNDAMENTALS_STALE_SECONDS", str(24 * 3600)))
+FUNDAMENTALS_WORKERS = int(os.getenv("FUNDAMENTALS_WORKERS", "8"))
+FUNDAMENTALS_MAX_BATCH = 100
+SNAPSHOT_VERSION = 1
+
+# field -> (yfinance info key, TTL seconds). Fields with a quote source are
+# refreshed from the bulk quote download instead of `info`.
+FIELDS = {
+    "name": ("longName", 7 * 24 * 3600),
+    "price": ("currentPrice", 300),
+    "market_cap": ("marketCap", 3600),
+    "pe_ratio": ("trailingPE", 3600),
+    "eps": ("trailingEps", 24 * 3600),
+    "volume": ("volume", 300),
+    "dividend_yield": ("dividendYield", 24 * 3600),
+    "sector": ("sector", 7 * 24 * 3600),
+    "industry": ("industry", 7 * 24 * 3600),
+    "52_week_high": ("fiftyTwoWeekHigh", 3600),
+    "52_week_low": ("fiftyTwoWeekLow", 3600),
+}
+QUOTE_FIELDS = ("price", "volume")
+INFO_FIELDS = tuple(f for f in FIELDS if f not in QUOTE_FIELDS)
+
+
+class YFinanceFundamentalsSource:
+    """Default source: bulk quotes via `yf.download`, everything else from `Ticker.info`."""
+
+    def quotes(self, tickers: List[str]) -> Dict[str, dict]:
+        import pandas as pd
+        import yfinance as yf
+
+        df = yf.download(tickers, period="5d", interval="1d", group_by="ticker",
+                         auto_adjust=False, progress=False, threads=True)
+        out = {}
+        for ticker in tickers:
+            if isinstance(df.columns, pd.MultiIndex):
+                if ticker not in df.columns.get_level_values(0):
+                    continue
+                bars = df[ticker]
+            else:
+                bars = df
+            bars = bars.dropna(subset=["Close"])
+            if not bars.empty:
+                out[ticker] = {"price": float(bars["Close"].iloc[-1]), "volume": int(bars["Volume"].iloc[-1])}
+        return out
+
+    def info(self, ticker: str) -> dict:
+        import yfinance as yf
+
+        info = yf.Ticker(ticker).info
+        if not info or not any(info.get(key) is not None for key, _ in FIELDS.values()):
+            raise LookupError(f"No fundamentals for {ticker}")
+        return {field: info.get(key) for field, (key, _) in FIELDS.items()}
+
+
+class FundamentalsStore:
+    """
+    Per-ticker fields with per-field fetch times:
+    {ticker: {field: [value, fetched_at]}}.
+    """
+
+    def __init__(self, path: str = FUNDAMENTALS_PATH, source=None,
+                 stale_seconds: int = FUNDAMENTALS_STALE_SECONDS, workers: int = FUNDAMENTALS_WORKERS):
+        self.path = path
+        self.source = source or YFinanceFundamentalsSource()
+        self.stale_seconds = stale_seconds
+        self.workers = workers
+        self.data: Dict[str, Dict[str, list]] = {}
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._thread: Optional[threading.Thread] = None
+        self._leader_file = None
+        self._mtime: Optional[int] = None
+        self.load()
+
+    # === Persistence ===
+
+    def _read_snapshot(self) -> Dict[str, Dict[str, list]]:
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return snapshot.get("tickers", {}) if snapshot.get("version") == SNAPSHOT_VERSION else {}
+
+    def _merge(self, tickers: Dict[str, Dict[str, list]]) -> None:
+        """Take fields from a snapshot where they were fetched more recently than ours."""
+        with self._lock:
+            for ticker, fields in tickers.items():
+                mine = self.data.setdefault(ticker, {})
+                for field, entry in fields.items():
+                    if field not in mine or entry[1] > mine[field][1]:
+                        mine[field] = entry
+
+    def _snapshot_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> None:
+        self._mtime = self._snapshot_mtime()
+        self._merge(self._read_snapshot())
+
+    def sync(self) -> None:
+        """Merge the shared snapshot if another worker has written it since we last did."""
+        if self._snapshot_mtime() != self._mtime:
+            self.load()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._merge(self._read_snapshot())
+            with self._lock:
+                snapshot = {"version": SNAPSHOT_VERSION, "tickers": {t: dict(f) for t, f in self.data.items()}}
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self.path)
+            self._mtime = self._snapshot_mtime()
+
+    def lead(self) -> bool:
+        """True if this worker runs the scheduled refresh for the host (held until exit)."""
+        if self._leader_file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            leader_file = open(f"{self.path}.leader", "w")
+            try:
+                fcntl.flock(leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                leader_file.close()
+                return False
+            self._leader_file = leader_file
+            print(f"👑 Worker {os.getpid()} refreshes fundamentals for this host")
+        return True
+
+    # === Freshness ===
+
+    def _age(self, ticker: str, field: str, now: float) -> float:
+        entry = self.data.get(ticker, {}).get(field)
+        return now - entry[1] if entry else float("inf")
+
+    def due_fields(self, ticker: str, now: Optional[float] = None) -> List[str]:
+        """Fields past their TTL."""
+        now = now or time.time()
+        return [f for f, (_, ttl) in FIELDS.items() if self._age(ticker, f, now) >= ttl]
+
+    def servable(self, ticker: str, now: Optional[float] = None) -> bool:
+        """True when every field is within TTL + the stale-while-revalidate window."""
+        now = now or time.time()
+        return ticker in self.data and all(self._age(ticker, f, now) < ttl + self.stale_seconds
+                                           for f, (_, ttl) in FIELDS.items())
+
+    # === Refresh ===
+
+    def refresh(self, tickers: Iterable[str]) -> Dict[str, str]:
+        """
+        Fetch the due fields of `tickers`: one bulk quote download, then `info`
+        in parallel for tickers with due info fields. Returns {ticker: error}
+        for tickers whose info couldn't be fetched.
+        """
+        now = time.time()
+        tickers = sorted({t.upper() for t in tickers})
+        due = {t: set(self.due_fields(t, now)) for t in tickers}
+        quote_due = [t for t in tickers if due[t] & set(QUOTE_FIELDS)]
+        info_due = [t for t in tickers if due[t] & set(INFO_FIELDS)]
+        errors: Dict[str, str] = {}
+        updates: Dict[str, dict] = {}
+
+        if quote_due:
+            try:
+                with timed("fundamentals_quotes"):
+                    quotes = self.source.quotes(quote_due)
+                for ticker, values in quotes.items():
+                    updates.setdefault(ticker, {}).update(values)
+            except Exception as e:
+                print(f"⚠️ Bulk quote refresh failed: {e}")
+
+        def fetch_info(ticker: str) -> Tuple[str, Optional[dict], Optional[str]]:
+            try:
+                with timed("fundamentals_info"):
+                    return ticker, self.source.info(ticker), None
+            except Exception as e:
+                return ticker, None, str(e)
+
+        if info_due:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(info_due)))) as pool:
+                for ticker, info, error in pool.map(fetch_info, info_due):
+                    if error:
+                        errors[ticker] = error
+                        continue
+                    values = updates.setdefault(ticker, {})
+                    for field, value in info.items():
+                        # Prefer the bulk quote, which is fresher than info's quote fields
+                        values.setdefault(field, value)
+
+        with self._lock:
+            for ticker, values in updates.items():
+                fields = self.data.setdefault(ticker, {})
+                for field, value in values.items():
+                    if field in FIELDS:
+                        fields[field] = [value, now]
+        if updates:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"⚠️ Failed to save fundamentals snapshot: {e}")
+        return errors
+
+    def _revalidate(self, tickers: List[str]) -> None:
+        if self._thread is not None and not self.lead():
+            return  # the leader's scheduled refresh covers them
+        with self._lock:
+            tickers = [t for t in tickers if t not in self._refreshing]
+            self._refreshing.update(tickers)
+        if not tickers:
+            return
+
+        def run():
+            try:
+                self.refresh(tickers)
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(tickers)
+
+        threading.Thread(target=run, name="fundamentals-revalidate", daemon=True).start()
+
+    # === Lookups ===
+
+    def _values(self, ticker: str) -> dict:
+        fields = self.data.get(ticker, {})
+        return {"ticker": ticker, **{f: fields[f][0] if f in fields else None for f in FIELDS}}
+
+    def get_many(self, tickers: Iterable[str]) -> Tuple[Dict[str, dict], Dict[str, str]]:
+        """
+        ({ticker: metrics}, {ticker: error}). Servable tickers answer from
+        memory and are revalidated in the background when due; the rest are
+        fetched inline in one bulk refresh.
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        self.sync()
+        now = time.time()
+        missing = [t for t in tickers if not self.servable(t, now)]
+        errors = self.refresh(missing) if missing else {}
+        due = [t for t in tickers if t not in missing and self.due_fields(t, now)]
+        cache_event("fundamentals", "miss", len(missing))
+        cache_event("fundamentals", "stale", len(due))
+        cache_event("fundamentals", "hit", len(tickers) - len(missing) - len(due))
+        if due:
+            self._revalidate(due)
+        found = {t: self._values(t) for t in tickers if t in self.data and t not in errors}
+        errors = {t: errors.get(t, "no data") for t in tickers if t not in found}
+        return found, errors
+
+    def get(self, ticker: str) -> dict:
+        found, errors = self.get_many([ticker])
+        if errors:
+            raise LookupError(next(iter(errors.values())))
+        return found[ticker.upper()]
+
+    def start_background_refresh(self, tickers_fn, interval: int = FUNDAMENTALS_REFRESH_SECONDS) -> None:
+        """
+        Refresh the due fields of `tickers_fn()` plus every cached ticker on a
+        schedule if this worker is the host's leader; otherwise pick up the
+        leader's snapshot.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.lead():
+                        self.refresh(set(tickers_fn()) | set(self.data))
+                    else:
+                        self.sync()
+                except Exception as e:
+                    print(f"⚠️ Fundamentals refresh failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="fundamentals-refresh", daemon=True)
+        self._thread.start()
+
+
+fundamentals = FundamentalsStore()
@@ -0,0 +1,192 @@
+import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+
+from model_loader import predict_horizons, predict_lstm_batch, prepare_yfinance_data, price_store, prophet_intervals
+from model_workers import pool
+from instrumentation import metrics, stats_collector, timed
+
+# Prediction work for the async endpoints. Forecasts are CPU-bound and block, so
+# they run on a bounded thread pool instead of the event loop, and concurrent
+# requests for the same (ticker, model, horizons, data-as-of) share one run.
+# With the inference pool running (model_workers.py) the forecasts themselves
+# are sent to the model family's worker process instead.
+
+PREDICTION_WORKERS = int(os.getenv("PREDICTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Batch predictions: tickers loaded at once, and tickers per batched LSTM rollout
+PREDICT_BATCH_CONCURRENCY = int(os.getenv("PREDICT_BATCH_CONCURRENCY", str(2 * PREDICTION_WORKERS)))
+PREDICT_BATCH_LSTM_CHUNK = int(os.getenv("PREDICT_BATCH_LSTM_CHUNK", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=PREDICTION_WORKERS, thread_name_prefix="predict")
+# Price history loads can wait on Yahoo; they get their own threads so they never
+# hold up forecasts on the prediction pool
+_data_executor = ThreadPoolExecutor(max_workers=PREDICT_BATCH_CONCURRENCY, thread_name_prefix="batch-data")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls that share a key into a single computation.
+    All waiters get the same result (or exception).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one client disconnecting doesn't cancel the work for the others
+        return await asyncio.shield(task)
+
+
+predictions = SingleFlight()
+metrics.register_collector("single_flight", stats_collector(
+    "shrubb_prediction_events", "single_flight", lambda: vars(predictions), counters=("calls", "coalesced")))
+metrics.register_collector("inference_pool", stats_collector(
+    "shrubb_inference_pool", "inference_pool", pool.stats, counters=("completed", "failed", "restarts"),
+    gauges=("workers", "pending", "segments", "bytes")))
+
+
+async def run_blocking(fn, *args):
+    """Run a blocking call on the prediction pool, in the caller's context (metrics labels)."""
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, ctx.run, fn, *args)
+
+
+async def predict_horizons_async(ticker: str, model: str, horizons: List[int]) -> Dict[int, float]:
+    """
+    Non-blocking predict_horizons. The result dict is shared between coalesced
+    callers and must not be mutated.
+    """
+    ticker = ticker.upper()
+    horizons = sorted(set(horizons))
+    as_of = price_store.last_date(ticker)
+    key = (ticker, model, tuple(horizons), as_of)
+    return await predictions.do(key, lambda: _forecast(ticker, model, horizons))
+
+
+async def _predict_shared(ticker: str, model: str, horizons: List[int], df) -> Dict[int, float]:
+    # Same key as predict_horizons_async, so batch and single requests share runs
+    key = (ticker, model, tuple(horizons), price_store.last_date(ticker))
+    return await predictions.do(key, lambda: _forecast(ticker, model, horizons, df))
+
+
+async def _forecast(ticker: str, model: str, horizons: List[int], df=None) -> Dict[int, float]:
+    if not pool.running:
+        if df is None:
+            return await run_blocking(predict_horizons, ticker, model, horizons)
+        return await run_blocking(predict_horizons, ticker, model, horizons, df)
+    if df is None:
+        df = await run_blocking(prepare_yfinance_data, ticker)
+    with timed("pool", model):
+        return await asyncio.wrap_future(pool.submit(model, ticker, "predict_horizons", ticker, model, horizons, df))
+
+
+async def _forecast_lstm_batch(tickers: List[str], horizons: List[int], frames) -> Dict[str, Dict[int, float]]:
+    if not pool.running:
+        return await run_blocking(predict_lstm_batch, tickers, horizons, frames)
+    # One rollout per worker process, over the tickers routed to it
+    with timed("pool", "lstm"):
+        parts = await asyncio.gather(*(
+            asyncio.wrap_future(pool.submit("lstm", group[0], "predict_lstm_batch", group, horizons,
+                                            {t: frames[t] for t in group}))
+            for group in pool.split("lstm", tickers).values()))
+    return {t: prices for part in parts for t, prices in part.items()}
+
+
+async def prophet_intervals_async(ticker: str, horizons: List[int]) -> Dict[int, tuple]:
+    ticker = ticker.upper()
+    if not pool.running:
+        return await run_blocking(prophet_intervals, ticker, horizons)
+    return await asyncio.wrap_future(pool.submit("prophet", ticker, "prophet_intervals", ticker, horizons))
+
+
+async def predict_batch(tickers: List[str], models: List[str], horizons: List[int],
+                        concurrency: int = PREDICT_BATCH_CONCURRENCY,
+                        lstm_chunk: int = PREDICT_BATCH_LSTM_CHUNK) -> AsyncIterator[dict]:
+    """
+    Forecast every (ticker, model) pair, yielding {"ticker", "model", "prices"}
+    or {"ticker", "model", "error"} as each one completes. Each ticker's history
+    is loaded once and shared by its models; LSTM forecasts run as batched
+    rollouts over chunks of tickers. At most `concurrency` tickers are loaded
+    at a time, so early tickers finish before late ones start.
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    horizons = sorted(set(horizons))
+    light_models = [m for m in dict.fromkeys(models) if m != "lstm"]
+    loop = asyncio.get_running_loop()
+    frames = {t: loop.create_future() for t in tickers}  # resolves to a frame or the load error
+    queue: asyncio.Queue = asyncio.Queue()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def light(ticker, model, df):
+        try:
+            queue.put_nowait({"ticker": ticker, "model": model,
+                              "prices": await _predict_shared(ticker, model, horizons, df)})
+        except Exception as e:
+            queue.put_nowait({"ticker": ticker, "model": model, "error": str(e)})
+
+    async def ticker_job(ticker):
+        async with limit:
+            try:
+                ctx = contextvars.copy_context()
+                df = await loop.run_in_executor(_data_executor, ctx.run, prepare_yfinance_data, ticker)
+                if df.empty:
+                    raise LookupError("No stock data available")
+            except Exception as e:
+                frames[ticker].set_result(e)
+                for model in light_models:
+                    queue.put_nowait({"ticker": ticker, "model": model, "error": str(e)})
+                return
+            frames[ticker].set_result(df)
+            await asyncio.gather(*(light(ticker, m, df) for m in light_models))
+
+    async def lstm_job(chunk):
+        loaded = {}
+        for ticker in chunk:
+            df = await frames[ticker]
+            if isinstance(df, Exception):
+                queue.put_nowait({"ticker": ticker, "model": "lstm", "error": str(df)})
+            else:
+                loaded[ticker] = df
+        error = "LSTM model unavailable"
+        try:
+            prices = await _forecast_lstm_batch(list(loaded), horizons, loaded) if loaded else {}
+        except Exception as e:
+            prices, error = {}, str(e)
+        for ticker in loaded:
+            if ticker in prices:
+                queue.put_nowait({"ticker": ticker, "model": "lstm", "prices": prices[ticker]})
+            else:
+                queue.put_nowait({"ticker": ticker, "model": "lstm", "error": error})
+
+    done = object()
+    jobs = [asyncio.ensure_future(ticker_job(t)) for t in tickers]
+    if "lstm" in models:
+        jobs += [asyncio.ensure_future(lstm_job(tickers[i:i + lstm_chunk]))
+                 for i in range(0, len(tickers), lstm_chunk)]
+    for job in jobs:
+        job.add_done_callback(lambda _: queue.put_nowait(done))
+
+    try:
+        finished = 0
+        while finished < len(jobs):
+            item = await queue.get()
+            if item is done:
+                finished += 1
+            else:
+                yield item
+    finally:
+        # Client went away: stop scheduling work (runs already on the pool finish)
+        for job in jobs:
+            job.cancel()
@@ -0,0 +1,183 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Low-overhead metrics in the Prometheus text format, without a client library.
+#
+#   shrubb_stage_seconds{stage, model, endpoint}   histogram of hot-path stages
+#   shrubb_request_seconds{endpoint, status}       histogram of whole requests
+#   shrubb_cache_events_total{cache, event}        hit/miss/eviction/... counters
+#   shrubb_batch_stage_seconds{job, stage, model}  histogram of batch job stages
+#   shrubb_batch_items_total{job, item}            batch job outcomes
+#
+# Recording is a dict lookup, a bisect and two additions under a lock. The
+# endpoint label comes from a context variable set by the request middleware,
+# so stages deep in the model code don't need it passed down. Caches that keep
+# their own counters are registered as collectors and read at scrape time.
+# Batch jobs record into the same registry and write it to a .prom file that a
+# node_exporter textfile collector (or a person) can pick up.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TEXTFILE_DIR = os.getenv("METRICS_TEXTFILE_DIR", "/tmp/shrubb_metrics")
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0)
+
+current_endpoint: contextvars.ContextVar = contextvars.ContextVar("endpoint", default="")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Iterable[Tuple[str, str]]) -> str:
+    key = list(key)
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(k)} {v:g}" for k, v in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += seconds
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(_labels(labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {k: (list(counts), total) for k, (counts, total) in self._values.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors: Dict[str, Callable[[], List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str) -> Counter:
+        with self._lock:
+            return self.metrics.setdefault(name, Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = STAGE_BUCKETS) -> Histogram:
+        with self._lock:
+            return self.metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def register_collector(self, name: str, collect: Callable[[], List[str]]) -> None:
+        """`collect()` returns exposition lines; registering a name again replaces it."""
+        with self._lock:
+            self.collectors[name] = collect
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines += metric.render()
+        for name, collect in list(self.collectors.items()):
+            try:
+                lines += collect()
+            except Exception as e:
+                print(f"⚠️ Metrics collector {name} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+        return path
+
+
+metrics = Registry()
+stage_seconds = metrics.histogram("shrubb_stage_seconds", "Time spent in a hot-path stage.")
+request_seconds = metrics.histogram("shrubb_request_seconds", "HTTP request latency.")
+cache_events = metrics.counter("shrubb_cache_events_total", "Cache hits, misses, evictions and refreshes.")
+batch_stage_seconds = metrics.histogram("shrubb_batch_stage_seconds", "Time spent in a batch job stage or task.",
+                                        BATCH_BUCKETS)
+batch_items = metrics.counter("shrubb_batch_items_total", "Items processed by batch jobs, by outcome.")
+
+
+@contextmanager
+def timed(stage: str, model: str = "", histogram: Optional[Histogram] = None, **labels):
+    """Record the duration of the block under `stage`, labeled with the current endpoint."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram or stage_seconds).observe(time.perf_counter() - start, stage=stage, model=model,
+                                             endpoint=current_endpoint.get(), **labels)
+
+
+def cache_event(cache: str, event: str, amount: float = 1.0) -> None:
+    if METRICS_ENABLED:
+        cache_events.inc(amount, cache=cache, event=event)
+
+
+def stats_collector(name: str, cache: str, stats_fn: Callable[[], dict], counters: Iterable[str],
+                    gauges: Iterable[str] = ()) -> Callable[[], List[str]]:
+    """Expose a component's own stats() counters and gauges at scrape time."""
+
+    def collect() -> List[str]:
+        stats = stats_fn()
+        lines = [f"# TYPE {name}_total counter"]
+        lines += [f'{name}_total{{cache="{cache}",event="{k}"}} {stats.get(k, 0):g}' for k in counters]
+        for g in gauges:
+            lines += [f"# TYPE {name}_{g} gauge", f'{name}_{g}{{cache="{cache}"}} {stats.get(g, 0):g}']
+        return lines
+
+    return collect
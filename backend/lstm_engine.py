@@ -0,0 +1,126 @@
+import time
+import weakref
+from functools import lru_cache
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import tensorflow as tf
+
+from lstm_numpy import LSTM_WINDOW, stack_weights
+
+# Batched autoregressive rollout for the LSTM(units) -> Dense(1) models written by
+# ml/train_model.train_lstm. Every ticker has its own model, but they all share one
+# architecture, so their weights are stacked and each sequence gathers its own set.
+# The whole rollout (window encode + feed back, for every step) runs as a single
+# traced graph call instead of one `model.predict` per step per ticker.
+# lstm_numpy runs the same computation without TensorFlow.
+
+
+# Keyed weakly so evicting a model from the model cache also frees its weights
+_weights_cache = weakref.WeakKeyDictionary()
+
+
+def extract_lstm_weights(model) -> Dict[str, np.ndarray]:
+    """
+    Pull the LSTM and Dense weights out of a trained Keras model.
+    """
+    if model in _weights_cache:
+        return _weights_cache[model]
+    lstm = next(layer for layer in model.layers if isinstance(layer, tf.keras.layers.LSTM))
+    dense = next(layer for layer in model.layers if isinstance(layer, tf.keras.layers.Dense))
+    kernel, recurrent_kernel, bias = lstm.get_weights()
+    dense_kernel, dense_bias = dense.get_weights()
+    weights = _weights_cache[model] = {
+        "kernel": kernel.astype(np.float32),                      # (1, 4 * units)
+        "recurrent_kernel": recurrent_kernel.astype(np.float32),  # (units, 4 * units)
+        "bias": bias.astype(np.float32),                          # (4 * units,)
+        "dense_kernel": dense_kernel.astype(np.float32),          # (units, 1)
+        "dense_bias": dense_bias.astype(np.float32),              # (1,)
+        "activation": lstm.get_config().get("activation", "tanh"),
+        "recurrent_activation": lstm.get_config().get("recurrent_activation", "sigmoid"),
+    }
+    return weights
+
+
+@lru_cache(maxsize=4)
+def _rollout_fn(activation: str, recurrent_activation: str, window: int):
+    act = tf.keras.activations.get(activation)
+    rec = tf.keras.activations.get(recurrent_activation)
+    spec = tf.TensorSpec
+
+    def forward(seq, k, U, b, dk, db):
+        n = tf.shape(seq)[0]
+        units = tf.shape(U)[1]
+        h = tf.zeros([n, units])
+        c = tf.zeros([n, units])
+        for t in range(window):
+            z = seq[:, t:t + 1] * k + tf.einsum("nu,nuv->nv", h, U) + b
+            i, f, g, o = tf.split(z, 4, axis=1)
+            c = rec(f) * c + rec(i) * act(g)
+            h = rec(o) * act(c)
+        return tf.reduce_sum(h * dk, axis=1) + db
+
+    @tf.function(input_signature=[
+        spec([None, window], tf.float32),    # windows
+        spec([None], tf.int32),              # model index per window
+        spec([], tf.int32),                  # steps
+        spec([None, None], tf.float32),      # kernel
+        spec([None, None, None], tf.float32),  # recurrent kernel
+        spec([None, None], tf.float32),      # bias
+        spec([None, None], tf.float32),      # dense kernel
+        spec([None], tf.float32),            # dense bias
+    ])
+    def rollout(windows, model_index, steps, kernel, recurrent, bias, dense_kernel, dense_bias):
+        k = tf.gather(kernel, model_index)
+        U = tf.gather(recurrent, model_index)
+        b = tf.gather(bias, model_index)
+        dk = tf.gather(dense_kernel, model_index)
+        db = tf.gather(dense_bias, model_index)
+        out = tf.TensorArray(tf.float32, size=steps)
+        seq = windows
+        for s in tf.range(steps):
+            p = forward(seq, k, U, b, dk, db)
+            out = out.write(s, p)
+            seq = tf.concat([seq[:, 1:], p[:, None]], axis=1)
+        return tf.transpose(out.stack())
+
+    return rollout
+
+
+class LSTMRolloutEngine:
+    """
+    Run autoregressive LSTM forecasts for many (model, window) pairs in one graph call.
+    """
+
+    def __init__(self, models: Sequence):
+        weights = [m if isinstance(m, dict) else extract_lstm_weights(m) for m in models]
+        stacked = stack_weights(weights)
+        self.activation = stacked.pop("activation")
+        self.recurrent_activation = stacked.pop("recurrent_activation")
+        self.weights = {name: tf.constant(value) for name, value in stacked.items()}
+        self.last_throughput = 0.0  # sequences per second for the most recent rollout
+
+    def rollout(self, windows: np.ndarray, steps: int, model_index: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Roll each (N, window) scaled sequence forward `steps` days.
+        `model_index[i]` picks the model for window i (defaults to window i -> model i).
+        Returns an (N, steps) array of scaled predictions.
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        if model_index is None:
+            model_index = np.arange(len(windows))
+        fn = _rollout_fn(self.activation, self.recurrent_activation, windows.shape[1])
+        start = time.perf_counter()
+        out = fn(
+            tf.constant(windows),
+            tf.constant(np.asarray(model_index, dtype=np.int32)),
+            tf.constant(steps, dtype=tf.int32),
+            self.weights["kernel"],
+            self.weights["recurrent_kernel"],
+            self.weights["bias"],
+            self.weights["dense_kernel"],
+            self.weights["dense_bias"],
+        ).numpy()
+        elapsed = time.perf_counter() - start
+        self.last_throughput = len(windows) / elapsed if elapsed > 0 else float("inf")
+        return out
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# TensorFlow-free runtime for the LSTM(units) -> Dense(1) models written by
+# ml/train_model.train_lstm. Models are exported once to a plain `.npz` weight
+# bundle; the backend then runs the forward pass and autoregressive rollout in
+# NumPy, batched across tickers the same way lstm_engine does on TensorFlow.
+
+LSTM_WINDOW = 10
+
+_ACTIVATIONS = {
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "hard_sigmoid": lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0),
+    "linear": lambda x: x,
+}
+
+
+# === Weight bundles ===
+
+def save_lstm_bundle(weights: Dict[str, np.ndarray], path: str) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, **{k: np.asarray(v) for k, v in weights.items()})
+    os.replace(tmp, path)
+    return path
+
+
+def load_lstm_bundle(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        weights = {k: data[k] for k in data.files}
+    for key in ("activation", "recurrent_activation"):
+        weights[key] = str(weights.get(key, "sigmoid" if key == "recurrent_activation" else "tanh"))
+    return weights
+
+
+def export_lstm_bundle(keras_path: str, bundle_path: Optional[str] = None) -> str:
+    """
+    Convert a `.keras` artifact into a `.npz` weight bundle. Needs TensorFlow.
+    """
+    import tensorflow as tf
+    from lstm_engine import extract_lstm_weights
+
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    bundle_path = bundle_path or os.path.splitext(keras_path)[0] + ".npz"
+    return save_lstm_bundle(extract_lstm_weights(model), bundle_path)
+
+
+def stack_weights(weights: Sequence[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Stack per-model weights along a leading model axis. All models must share units and activations.
+    """
+    activations = {(w["activation"], w["recurrent_activation"]) for w in weights}
+    if len(activations) != 1:
+        raise ValueError(f"Cannot batch LSTMs with mixed activations: {activations}")
+    activation, recurrent_activation = activations.pop()
+    return {
+        "kernel": np.stack([w["kernel"][0] for w in weights]),
+        "recurrent_kernel": np.stack([w["recurrent_kernel"] for w in weights]),
+        "bias": np.stack([w["bias"] for w in weights]),
+        "dense_kernel": np.stack([w["dense_kernel"][:, 0] for w in weights]),
+        "dense_bias": np.stack([w["dense_bias"][0] for w in weights]),
+        "activation": activation,
+        "recurrent_activation": recurrent_activation,
+    }
+
+
+# === Forward pass ===
+
+class NumpyLSTMRollout:
+    """
+    Same interface as lstm_engine.LSTMRolloutEngine, without TensorFlow.
+    """
+
+    def __init__(self, weights: Sequence[Dict[str, np.ndarray]]):
+        stacked = stack_weights(weights)
+        self.act = _ACTIVATIONS[stacked.pop("activation")]
+        self.recurrent_act = _ACTIVATIONS[stacked.pop("recurrent_activation")]
+        self.weights = {k: v.astype(np.float32) for k, v in stacked.items()}
+        self.last_throughput = 0.0  # sequences per second for the most recent rollout
+
+    def _forward(self, seq, k, U, b, dk, db):
+        n, units = len(seq), U.shape[1]
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        for t in range(seq.shape[1]):
+            z = seq[:, t:t + 1] * k + np.einsum("nu,nuv->nv", h, U) + b
+            i, f, g, o = np.split(z, 4, axis=1)
+            c = self.recurrent_act(f) * c + self.recurrent_act(i) * self.act(g)
+            h = self.recurrent_act(o) * self.act(c)
+        return np.einsum("nu,nu->n", h, dk) + db
+
+    def rollout(self, windows: np.ndarray, steps: int, model_index: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Roll each (N, window) scaled sequence forward `steps` days. Returns (N, steps).
+        """
+        seq = np.array(windows, dtype=np.float32)
+        if model_index is None:
+            model_index = np.arange(len(seq))
+        model_index = np.asarray(model_index, dtype=np.intp)
+        w = self.weights
+        params = (w["kernel"][model_index], w["recurrent_kernel"][model_index], w["bias"][model_index],
+                  w["dense_kernel"][model_index], w["dense_bias"][model_index])
+
+        start = time.perf_counter()
+        out = np.empty((len(seq), steps), dtype=np.float32)
+        for s in range(steps):
+            p = self._forward(seq, *params)
+            out[:, s] = p
+            seq[:, :-1] = seq[:, 1:]
+            seq[:, -1] = p
+        elapsed = time.perf_counter() - start
+        self.last_throughput = len(seq) / elapsed if elapsed > 0 else float("inf")
+        return out
+
+
+if __name__ == "__main__":
+    # Usage: python lstm_numpy.py <dir-with-.keras-files>
+    # Writes a .npz bundle next to every .keras artifact that doesn't have one yet.
+    model_dir = sys.argv[1]
+    for name in sorted(os.listdir(model_dir)):
+        if name.endswith(".keras"):
+            src = os.path.join(model_dir, name)
+            dst = os.path.splitext(src)[0] + ".npz"
+            if not os.path.exists(dst):
+                export_lstm_bundle(src, dst)
+                print(f"✅ Exported {name} → {os.path.basename(dst)}")
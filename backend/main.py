@@ -1,25 +1,35 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from starlette.routing import Match
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import os
+import json
+import time
+import asyncio
 import traceback
 import logging
-from datetime import datetime
-from functools import lru_cache
 
 import pandas as pd
-import numpy as np
-import yfinance as yf
 
 from model_loader import (
-    predict_price,
     get_accuracy_for_ticker,
     prepare_yfinance_data,
-    list_available_tickers,
-    load_cached_explore_data
+    explore_cache,
+    ranking_cache,
+    model_cache,
+    load_model,
+    catalog,
+    default_hot_tickers,
+    price_store,
 )
-from data import SP500_TICKERS, SP500_METADATA
+from data import SP500_TICKERS
+from constituents import registry
+from inference import predict_batch, predict_horizons_async, prophet_intervals_async, run_blocking
+from model_workers import INFERENCE_POOL, pool
+from prefetch import request_stats, warmup, hot_set
+from fundamentals import fundamentals, FUNDAMENTALS_MAX_BATCH
+from instrumentation import current_endpoint, metrics, request_seconds, METRICS_ENABLED
 
 # Logger setup
 logger = logging.getLogger("uvicorn.error")
@@ -46,44 +56,113 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing. The route template ("/compare/{ticker}") is the endpoint label,
+# and is visible to the stage timers further down through a context variable.
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    if not METRICS_ENABLED:
+        return await call_next(request)
+    endpoint = next((r.path for r in app.router.routes if r.matches(request.scope)[0] == Match.FULL), "unmatched")
+    token = current_endpoint.set(endpoint)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method,
+                                status=str(status))
+        current_endpoint.reset(token)
+
 # Model options
 MODEL_OPTIONS = ["prophet", "arima", "xgboost", "lstm"]
+PREDICTION_DAYS = [1, 2, 7, 10, 30]
+PREDICT_BATCH_MAX_TICKERS = 505
+PREDICT_BATCH_MAX_HORIZON_DAYS = 365
+PREDICT_BATCH_MAX_HORIZONS = 20
 
 class PredictRequest(BaseModel):
     ticker: str
     model: Optional[str] = "prophet"
+    # Prophet only: add sampled uncertainty intervals (lower/upper) to each prediction
+    intervals: bool = False
+
+class BatchPredictRequest(BaseModel):
+    tickers: List[str]
+    models: Optional[List[str]] = None
+    horizons: Optional[List[int]] = None
+
+@app.on_event("startup")
+def start_background_jobs():
+    registry.start_background_refresh()
+    catalog.start_background_refresh()
+    fundamentals.start_background_refresh(registry.yahoo_symbols)
+    # Download and load the hot set before /ready lets traffic in
+    request_stats.pull()
+    pairs = hot_set(request_stats, fallback=default_hot_tickers)
+    if INFERENCE_POOL:
+        # Models live in the family worker processes; warm the ones that will serve them
+        pool.start()
+        warmup.start(pairs, lambda t, m: pool.submit(m, t, "preload_model", t, m).result())
+    else:
+        warmup.start(pairs, load_model)
+
+@app.on_event("shutdown")
+def save_request_stats():
+    try:
+        request_stats.save(share=True)
+    except Exception as e:
+        print(f"⚠️ Failed to save request stats: {e}")
+    pool.stop()
 
 # Health check
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+# Readiness: healthy and done warming the model caches
+@app.get("/ready")
+def readiness_check():
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Model cache hit/miss/eviction counters
+@app.get("/internal/model-cache")
+def model_cache_stats():
+    return model_cache.stats()
+
+# Prometheus text-format metrics: stage timings, request latency, cache counters
+@app.get("/internal/metrics", response_class=PlainTextResponse)
+def internal_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Predict endpoint using unified predict_price
 @app.post("/predict")
-def predict(req: PredictRequest):
+async def predict(req: PredictRequest):
     ticker = req.ticker.upper()
     model_name = req.model.lower()
 
     if model_name not in MODEL_OPTIONS:
         raise HTTPException(status_code=400, detail=f"Unsupported model '{model_name}'")
+    if req.intervals and model_name != "prophet":
+        raise HTTPException(status_code=400, detail="Intervals are only available for the prophet model")
+    # Only constituents count towards the hot set; arbitrary symbols would grow the counter
+    if ticker in SP500_TICKERS:
+        request_stats.record(ticker)
 
     # Prepare data to ensure availability
-    df = prepare_yfinance_data(ticker)
+    df = await run_blocking(prepare_yfinance_data, ticker)
     if df.empty:
         raise HTTPException(status_code=404, detail="No stock data available")
 
-    today = pd.Timestamp.now().normalize()
-    desired_days = [1, 2, 7, 10, 30]
-
     try:
-        predictions = []
-        for d in desired_days:
-            price = predict_price(ticker, model_name, d)
-            predictions.append({
-                "days": d,
-                "date": (today + pd.Timedelta(days=d)).strftime("%Y-%m-%d"),
-                "price": round(price, 2),
-            })
+        prices = await predict_horizons_async(ticker, model_name, PREDICTION_DAYS)
+        predictions = format_predictions(prices, df["ds"].max())
+        if req.intervals:
+            bounds = await prophet_intervals_async(ticker, PREDICTION_DAYS)
+            for p in predictions:
+                p["lower"], p["upper"] = (round(b, 2) for b in bounds[p["days"]])
 
         accuracy = get_accuracy_for_ticker(ticker, model_name) or 0.0
 
@@ -99,43 +178,115 @@ def predict(req: PredictRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-# Stock metrics (unchanged)
-@lru_cache(maxsize=200)
-def fetch_stock_metrics(ticker: str) -> dict:
-    stock = yf.Ticker(ticker)
-    info = stock.info
-    return {
-        "ticker": ticker,
-        "name": info.get("longName"),
-        "price": info.get("currentPrice"),
-        "market_cap": info.get("marketCap"),
-        "pe_ratio": info.get("trailingPE"),
-        "eps": info.get("trailingEps"),
-        "volume": info.get("volume"),
-        "dividend_yield": info.get("dividendYield"),
-        "sector": info.get("sector"),
-        "industry": info.get("industry"),
-        "52_week_high": info.get("fiftyTwoWeekHigh"),
-        "52_week_low": info.get("fiftyTwoWeekLow"),
-    }
+def format_predictions(prices: Dict[int, float], last_bar: Optional[pd.Timestamp]) -> List[Dict]:
+    # Dates count from the day after the last observed bar, like the forecasts themselves
+    today = pd.Timestamp(last_bar).normalize() + pd.Timedelta(days=1) if last_bar is not None \
+        else pd.Timestamp.now().normalize()
+    return [
+        {
+            "days": d,
+            "date": (today + pd.Timedelta(days=d)).strftime("%Y-%m-%d"),
+            "price": round(p, 2),
+        }
+        for d, p in sorted(prices.items())
+    ]
+
+# Batch predictions, streamed as NDJSON: one line per (ticker, model) as soon as
+# it's ready, then a summary line with "done": true
+@app.post("/predict/batch")
+async def predict_batch_endpoint(req: BatchPredictRequest):
+    models = [m.lower() for m in (req.models or MODEL_OPTIONS)]
+    horizons = req.horizons or PREDICTION_DAYS
+    unsupported = [m for m in models if m not in MODEL_OPTIONS]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported model(s) {unsupported}")
+    if not req.tickers or len(req.tickers) > PREDICT_BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"Pass 1 to {PREDICT_BATCH_MAX_TICKERS} tickers")
+    if len(horizons) > PREDICT_BATCH_MAX_HORIZONS:
+        raise HTTPException(status_code=400, detail=f"Pass at most {PREDICT_BATCH_MAX_HORIZONS} horizons")
+    if min(horizons) < 1 or max(horizons) > PREDICT_BATCH_MAX_HORIZON_DAYS:
+        raise HTTPException(status_code=400,
+                            detail=f"Horizons must be between 1 and {PREDICT_BATCH_MAX_HORIZON_DAYS} days")
+
+    async def lines():
+        start = time.perf_counter()
+        results = errors = 0
+        async for row in predict_batch(req.tickers, models, horizons):
+            if "error" in row:
+                errors += 1
+            else:
+                results += 1
+                row = {
+                    "ticker": row["ticker"],
+                    "model": row["model"],
+                    "accuracy": get_accuracy_for_ticker(row["ticker"], row["model"]) or 0.0,
+                    "predictions": format_predictions(row["prices"], price_store.last_date(row["ticker"])),
+                }
+            yield json.dumps(row) + "\n"
+        yield json.dumps({"done": True, "results": results, "errors": errors,
+                          "elapsed_s": round(time.perf_counter() - start, 3)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
+# Stock metrics, from the fundamentals snapshot
 @app.get("/metrics")
-def get_stock_metrics(ticker: str = Query(..., description="Stock ticker symbol")):
+def get_stock_metrics(
+    ticker: Optional[str] = Query(None, description="Stock ticker symbol"),
+    tickers: Optional[str] = Query(None, description="Comma-separated tickers, answered in one call"),
+):
+    if tickers:
+        symbols = [t.strip() for t in tickers.split(",") if t.strip()]
+        if len(symbols) > FUNDAMENTALS_MAX_BATCH:
+            raise HTTPException(status_code=400, detail=f"At most {FUNDAMENTALS_MAX_BATCH} tickers per request")
+        found, errors = fundamentals.get_many(symbols)
+        return {"metrics": list(found.values()), "errors": errors}
+    if not ticker:
+        raise HTTPException(status_code=400, detail="Pass ticker or tickers")
     try:
-        return fetch_stock_metrics(ticker.upper())
+        return fundamentals.get(ticker)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Explore
+# Explore: pre-serialized bodies from the in-process ranking index (any top-N,
+# per model, per sector/sub-industry), or from the explore cache's top lists
+# when no index has been published yet
+async def explore_response(request: Request, key: str, limit: int, model: Optional[str] = None,
+                           sector: Optional[str] = None, sub_industry: Optional[str] = None) -> Response:
+    if ranking_cache.checked_at is None:
+        await run_blocking(ranking_cache.ensure_loaded)
+    if ranking_cache.loaded:
+        try:
+            body, etag = ranking_cache.query(key, limit, model, sector, sub_industry)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif model or sector or sub_industry:
+        raise HTTPException(status_code=503, detail="Ranking index not available yet")
+    else:
+        if explore_cache.checked_at is None:
+            await run_blocking(explore_cache.ensure_loaded)
+        body, etag = explore_cache.body(key, limit)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 @app.get("/explore/top-gainers", response_model=List[Dict])
-async def top_gainers(limit: int = Query(10, ge=1, le=100)):
-    data = load_cached_explore_data()
-    return data.get("top_gainers", [])[:limit]
+async def top_gainers(request: Request, limit: int = Query(10, ge=1, le=100), model: Optional[str] = None,
+                      sector: Optional[str] = None, sub_industry: Optional[str] = None):
+    return await explore_response(request, "top_gainers", limit, model, sector, sub_industry)
 
 @app.get("/explore/top-losers", response_model=List[Dict])
-async def top_losers(limit: int = Query(10, ge=1, le=100)):
-    data = load_cached_explore_data()
-    return data.get("top_losers", [])[:limit]
+async def top_losers(request: Request, limit: int = Query(10, ge=1, le=100), model: Optional[str] = None,
+                     sector: Optional[str] = None, sub_industry: Optional[str] = None):
+    return await explore_response(request, "top_losers", limit, model, sector, sub_industry)
+
+# Sectors and sub-industries that explore rankings can be filtered by
+@app.get("/explore/sectors", response_model=Dict[str, List[str]])
+async def explore_sectors():
+    if ranking_cache.checked_at is None:
+        await run_blocking(ranking_cache.ensure_loaded)
+    if not ranking_cache.loaded:
+        raise HTTPException(status_code=503, detail="Ranking index not available yet")
+    return ranking_cache.data.sectors()
 
 # Compare models DRY
 @app.get("/compare/{ticker}", response_model=Dict[str, Dict])
@@ -146,16 +297,19 @@ async def compare_models(
     t = ticker.upper()
     if t not in SP500_TICKERS:
         raise HTTPException(status_code=404, detail="Ticker not in S&P 500")
+    request_stats.record(t)
 
-    results: Dict[str, Dict] = {}
-    for m in MODEL_OPTIONS:
+    async def compare_one(m: str):
         try:
-            pred = predict_price(t, m, days)
+            pred = (await predict_horizons_async(t, m, [days]))[days]
             acc = get_accuracy_for_ticker(t, m) or 0.0
-            results[m] = {
+            return m, {
                 "next_prediction": round(pred, 2),
                 "accuracy": round(acc, 4),
             }
         except Exception as e:
-            results[m] = {"error": str(e)}
+            return m, {"error": str(e)}
+
+    # All models run concurrently on the prediction pool; the event loop stays free
+    results: Dict[str, Dict] = dict(await asyncio.gather(*(compare_one(m) for m in MODEL_OPTIONS)))
     return results
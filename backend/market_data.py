@@ -0,0 +1,204 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bulk daily-close acquisition for the batch jobs (training, explore, backtest).
+#
+# Tickers are requested MARKET_DATA_CHUNK_SIZE symbols at a time, with at most
+# MARKET_DATA_CONCURRENCY requests in flight. A throttled request halves the
+# number of requests allowed in flight and pauses new ones for an exponentially
+# growing, jittered backoff before it is retried; each successful request lets
+# one more back in, up to the configured limit. Symbols a chunk didn't return,
+# or whose chunk kept failing, are then retried on their own, so one bad symbol
+# can't fail the other symbols of its chunk.
+
+MARKET_DATA_CHUNK_SIZE = int(os.getenv("MARKET_DATA_CHUNK_SIZE", "50"))
+MARKET_DATA_CONCURRENCY = int(os.getenv("MARKET_DATA_CONCURRENCY", "4"))
+MARKET_DATA_RETRIES = int(os.getenv("MARKET_DATA_RETRIES", "3"))
+MARKET_DATA_BACKOFF_SECONDS = float(os.getenv("MARKET_DATA_BACKOFF_SECONDS", "2"))
+MARKET_DATA_MAX_BACKOFF_SECONDS = float(os.getenv("MARKET_DATA_MAX_BACKOFF_SECONDS", "60"))
+
+
+class RateLimited(Exception):
+    """Raised by a provider when the upstream throttled the request."""
+
+
+class YFinanceBulkProvider:
+    """Default provider: one `yf.download` call per chunk of symbols."""
+
+    def download(self, symbols: List[str], start: Optional[pd.Timestamp] = None,
+                 period: str = "3y") -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+        from yfinance.exceptions import YFRateLimitError
+
+        window = {"period": period} if start is None else {"start": start.strftime("%Y-%m-%d")}
+        try:
+            df = yf.download(symbols, interval="1d", group_by="ticker", auto_adjust=False,
+                             progress=False, threads=True, **window)
+        except YFRateLimitError as e:
+            raise RateLimited(str(e)) from e
+
+        out = {}
+        for symbol in symbols:
+            if isinstance(df.columns, pd.MultiIndex):
+                if symbol not in df.columns.get_level_values(0):
+                    continue
+                bars = df[symbol]
+            else:
+                bars = df
+            if "Close" not in bars.columns:
+                continue
+            closes = bars["Close"].dropna()
+            if closes.empty:
+                continue
+            idx = pd.DatetimeIndex(closes.index)
+            if idx.tz is not None:
+                idx = idx.tz_localize(None)
+            out[symbol] = pd.DataFrame({"ds": idx, "y": closes.to_numpy(dtype=np.float64)})
+        if not out and len(symbols) > 1:
+            # yf.download logs per-symbol failures instead of raising, so a
+            # throttled chunk shows up as a chunk with no data at all
+            raise RateLimited(f"No data for any of {len(symbols)} symbols")
+        return out
+
+
+class AdaptiveLimiter:
+    """
+    Bounds requests in flight. Throttling halves the bound and pauses new
+    requests until `resume_at`; every success raises the bound by one.
+    """
+
+    def __init__(self, limit: int, clock=time.monotonic, sleep=time.sleep):
+        self.max_limit = self.limit = max(1, limit)
+        self.in_flight = 0
+        self.peak = 0
+        self.resume_at = 0.0
+        self.clock, self.sleep = clock, sleep
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        while True:
+            wait = self.resume_at - self.clock()
+            if wait > 0:
+                self.sleep(wait)
+            with self._cond:
+                while self.in_flight >= self.limit:
+                    self._cond.wait()
+                if self.resume_at <= self.clock():
+                    self.in_flight += 1
+                    self.peak = max(self.peak, self.in_flight)
+                    return
+
+    def release(self, throttled: bool = False, cooldown: float = 0.0) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.resume_at = max(self.resume_at, self.clock() + cooldown)
+            elif self.limit < self.max_limit:
+                self.limit += 1
+            self._cond.notify_all()
+
+
+class BulkFetcher:
+    """
+    `fetch(tickers)` returns ({ticker: ds/y frame}, {ticker: error}) for every
+    requested ticker.
+    """
+
+    def __init__(self, provider=None, chunk_size: int = MARKET_DATA_CHUNK_SIZE,
+                 concurrency: int = MARKET_DATA_CONCURRENCY, retries: int = MARKET_DATA_RETRIES,
+                 backoff: float = MARKET_DATA_BACKOFF_SECONDS, max_backoff: float = MARKET_DATA_MAX_BACKOFF_SECONDS,
+                 jitter: bool = True, clock=time.monotonic, sleep=time.sleep):
+        self.provider = provider or YFinanceBulkProvider()
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff, self.max_backoff, self.jitter = backoff, max_backoff, jitter
+        self.limiter = AdaptiveLimiter(self.concurrency, clock=clock, sleep=sleep)
+        self.stats = {"requests": 0, "throttled": 0, "symbol_retries": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0) if self.jitter else delay
+
+    def _request(self, symbols: List[str], start, period: str) -> Dict[str, pd.DataFrame]:
+        """One provider call, retried while throttled. Raises once retries run out."""
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            self._count("requests")
+            try:
+                result = self.provider.download(symbols, start=start, period=period)
+            except RateLimited:
+                self._count("throttled")
+                self.limiter.release(throttled=True, cooldown=self._delay(attempt))
+                if attempt == self.retries:
+                    raise
+                continue
+            except Exception:
+                self.limiter.release()
+                raise
+            self.limiter.release()
+            return result
+
+    def fetch(self, tickers: Iterable[str], start: Optional[pd.Timestamp] = None,
+              period: str = "3y") -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        tickers = list(dict.fromkeys(tickers))
+        chunks = [tickers[i:i + self.chunk_size] for i in range(0, len(tickers), self.chunk_size)]
+        frames: Dict[str, pd.DataFrame] = {}
+        errors: Dict[str, str] = {}
+
+        def collect(symbols, future):
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.update({s: str(e) for s in symbols})
+                return
+            for s in symbols:
+                df = result.get(s)
+                if df is not None and not df.empty:
+                    frames[s] = df
+                    errors.pop(s, None)
+                else:
+                    errors.setdefault(s, "no data")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for chunk, future in [(c, pool.submit(self._request, c, start, period)) for c in chunks]:
+                collect(chunk, future)
+            retry = [s for s in tickers if s not in frames] if self.chunk_size > 1 else []
+            if retry:
+                self._count("symbol_retries", len(retry))
+                print(f"🔁 Retrying {len(retry)} symbols on their own")
+            for symbol, future in [(s, pool.submit(self._request, [s], start, period)) for s in retry]:
+                collect([symbol], future)
+        return frames, errors
+
+
+def close_matrix(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Dates x tickers closes, aligned on the union of bar dates (NaN where a ticker has no bar)."""
+    if not frames:
+        return pd.DataFrame(dtype=np.float64)
+    columns = {t: pd.Series(np.asarray(df["y"], dtype=np.float64), index=pd.DatetimeIndex(df["ds"]))
+               for t, df in frames.items()}
+    return pd.concat(columns, axis=1).sort_index()
+
+
+def column_frame(matrix: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """One ticker's `ds`/`y` frame out of a close matrix, without the dates it has no bar for."""
+    if ticker not in matrix.columns:
+        return pd.DataFrame()
+    closes = matrix[ticker].dropna()
+    if closes.empty:
+        return pd.DataFrame()
+    return pd.DataFrame({"ds": closes.index.to_numpy(), "y": closes.to_numpy()})
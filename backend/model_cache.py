@@ -0,0 +1,187 @@
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# In-memory model cache bounded by estimated bytes rather than entry count.
+#
+#   loader(key, version) -> (model, estimated_bytes)
+#   version_fn(key)      -> opaque version token (S3 ETag, file mtime, ...) or None
+#
+# With `versioned_loader=True` the loader returns (model, estimated_bytes,
+# version) instead: a miss then calls loader(key, None) and keeps the version
+# the load itself saw (e.g. the ETag of the GET), so version_fn only runs for
+# background revalidation and a cold load costs one round trip, not two.
+#
+# Entries older than `ttl` keep being served while a background thread checks
+# their version; a changed version is reloaded off the request path and swapped in.
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "version", "checked_at", "hits")
+
+    def __init__(self, value, nbytes: int, version):
+        self.value = value
+        self.nbytes = nbytes
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.hits = 0
+
+
+class ModelCache:
+    def __init__(self, loader: Callable[[Hashable, Any], Tuple[Any, int]], max_bytes: int,
+                 ttl: float = 3600, policy: str = "lru",
+                 version_fn: Optional[Callable[[Hashable], Any]] = None, versioned_loader: bool = False):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unsupported eviction policy: {policy}")
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+        self.version_fn = version_fn or (lambda key: None)
+        self.versioned_loader = versioned_loader
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        # key -> [lock, threads holding or waiting for it]; dropped when the count reaches 0
+        self._key_locks: Dict[Hashable, list] = {}
+        self._revalidating = set()
+        self._background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-cache")
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "reloads": 0, "revalidations": 0, "load_errors": 0}
+
+    # === Public API ===
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._touch(key, entry)
+                if time.monotonic() - entry.checked_at > self.ttl:
+                    self._schedule_revalidate(key)
+                return entry.value
+
+        # Miss: load once per key even if several requests race for it
+        with self._loading(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._touch(key, entry)
+                    return entry.value
+                self._stats["misses"] += 1
+            try:
+                version = None if self.versioned_loader else self.version_fn(key)
+                value, nbytes, version = self._load(key, version)
+            except Exception:
+                with self._lock:
+                    self._stats["load_errors"] += 1
+                raise
+            self._insert(key, _Entry(value, nbytes, version))
+            return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    # === Internals ===
+
+    @contextmanager
+    def _loading(self, key: Hashable):
+        """Per-key load lock, kept only while some thread holds or waits for it."""
+        with self._lock:
+            slot = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._key_locks[key]
+
+    def _load(self, key: Hashable, version) -> Tuple[Any, int, Any]:
+        loaded = self.loader(key, version)
+        if self.versioned_loader:
+            return loaded
+        return loaded[0], loaded[1], version
+
+    def _touch(self, key: Hashable, entry: _Entry) -> None:
+        self._stats["hits"] += 1
+        entry.hits += 1
+        self._entries.move_to_end(key)
+
+    def _insert(self, key: Hashable, entry: _Entry) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+                entry.hits = old.hits
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._evict(keep=key)
+
+    def _evict(self, keep: Hashable) -> None:
+        # Never evict the entry that was just inserted, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            if self.policy == "lru":
+                victim = next(k for k in self._entries if k != keep)
+            else:
+                # Least frequently used; OrderedDict order breaks ties by recency
+                victim = min((k for k in self._entries if k != keep), key=lambda k: self._entries[k].hits)
+            self._bytes -= self._entries.pop(victim).nbytes
+            self._stats["evictions"] += 1
+
+    def _schedule_revalidate(self, key: Hashable) -> None:
+        if key in self._revalidating:
+            return
+        self._revalidating.add(key)
+        self._background.submit(self._revalidate, key)
+
+    def _revalidate(self, key: Hashable) -> None:
+        try:
+            with self._lock:
+                entry = self._entries.get(key)
+                self._stats["revalidations"] += 1
+            if entry is None:
+                return
+            version = self.version_fn(key)
+            if version is None or version == entry.version:
+                entry.checked_at = time.monotonic()
+                return
+            value, nbytes, version = self._load(key, version)
+            self._insert(key, _Entry(value, nbytes, version))
+            with self._lock:
+                self._stats["reloads"] += 1
+            print(f"🔄 Reloaded model {key} (version {version})")
+        except Exception as e:
+            with self._lock:
+                self._stats["load_errors"] += 1
+            print(f"⚠️ Failed to revalidate model {key}: {e}")
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
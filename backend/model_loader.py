@@ -1,35 +1,62 @@
 import os
-import boto3
-import joblib
 import json
+import hashlib
 import tempfile
+import threading
 from functools import lru_cache
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 import pandas as pd
-import yfinance as yf
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-import tensorflow as tf  # Only required if using LSTM
+
+from price_store import PriceStore, PRICE_STORE_DIR
+from lstm_numpy import LSTM_WINDOW, NumpyLSTMRollout, load_lstm_bundle
+from slim_models import SLIM_EXTENSION, SlimProphet, load_slim_model
+from model_cache import ModelCache
+from catalog import CATALOG_KEY, ModelCatalog, scan_local_catalog, scan_s3_catalog
+from explore_cache import ExploreCache
+from ranking_index import RankingCache, RankingIndex
+from instrumentation import cache_event, metrics, stats_collector, timed
 
 # Config
 USE_LOCAL = os.getenv("USE_LOCAL_MODELS", "false").lower() == "true"
-LOCAL_MODEL_DIR = os.path.join(os.path.dirname(__file__), "../ml/models")
+# Where training writes models locally (ml/train_model.py honors the same variable)
+LOCAL_MODEL_DIR = os.getenv("MODEL_OUTPUT_DIR", os.path.join(os.path.dirname(__file__), "../ml/models"))
 S3_BUCKET = "shrubb-ai-ml-models"
 S3_PREFIX = "models"
 S3_CACHE_DIR = "/tmp/shrubb_models"
 EXPLORE_KEY="analytics/gainers_losers.json"
+RANKING_KEY = "analytics/ranking_index.slim"
+REQUEST_COUNTS_KEY = f"{S3_PREFIX}/request_counts.json"
+# "numpy" serves LSTMs from .npz weight bundles; "tensorflow" loads .keras models (imports TF).
+LSTM_RUNTIME = os.getenv("LSTM_RUNTIME", "numpy").lower()
+# "slim" serves Prophet/ARIMA/XGBoost from compact .slim artifacts; "pickle" loads the full .pkl.
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "slim").lower()
+# Loaded models are bounded by estimated memory, not count. Pickled models take a
+# few times their artifact size once unpickled.
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+MODEL_CACHE_TTL_SECONDS = int(os.getenv("MODEL_CACHE_TTL_SECONDS", "3600"))
+MODEL_CACHE_POLICY = os.getenv("MODEL_CACHE_POLICY", "lru")
+MODEL_MEMORY_FACTOR = float(os.getenv("MODEL_MEMORY_FACTOR", "3"))
 os.makedirs(S3_CACHE_DIR, exist_ok=True)
 
-s3 = boto3.client("s3")
+price_store = PriceStore(PRICE_STORE_DIR)
+
+# Heavy dependencies (boto3, joblib, scikit-learn, the model libraries) are imported
+# on first use, so a worker boots without paying for model families it never serves.
+
+@lru_cache(maxsize=1)
+def get_s3():
+    import boto3
+    return boto3.client("s3")
 
 # === Model path utils ===
 
 def get_model_filename(ticker: str, model: str) -> str:
     ticker = ticker.upper()
     if model == "lstm":
-        return f"{ticker}.keras"
+        return f"{ticker}.npz" if LSTM_RUNTIME == "numpy" else f"{ticker}.keras"
     elif model in {"prophet", "arima", "xgboost"}:
-        return f"{ticker}.pkl"
+        return f"{ticker}{SLIM_EXTENSION}" if MODEL_FORMAT == "slim" else f"{ticker}.pkl"
     else:
         raise ValueError(f"Unsupported model type: {model}")
 
@@ -43,160 +70,456 @@ def get_cached_s3_model_path(ticker: str, model: str) -> str:
 
 # === Download logic ===
 
-@lru_cache(maxsize=256)
-def download_model_from_s3(ticker: str, model: str = "prophet") -> str:
+def get_s3_model_key(ticker: str, model: str) -> str:
+    return f"{S3_PREFIX}/{model}/{get_model_filename(ticker, model)}"
+
+
+def get_model_version(ticker: str, model: str) -> Optional[str]:
+    """
+    Version token for the published artifact: S3 ETag, or mtime/size for local models.
+    Returns None when it can't be determined (the cached copy is then kept).
+    """
+    try:
+        if USE_LOCAL:
+            st = os.stat(get_local_model_path(ticker, model))
+            return f"{st.st_mtime_ns}-{st.st_size}"
+        with timed("version", model):
+            head = get_s3().head_object(Bucket=S3_BUCKET, Key=get_s3_model_key(ticker, model))
+        return head["ETag"].strip('"')
+    except Exception:
+        return None
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def download_model_from_s3(ticker: str, model: str = "prophet", etag: Optional[str] = None) -> str:
+    """
+    Return the local copy of a model, downloading it if missing or if its recorded
+    ETag differs from `etag`. Downloads go to a temp file that is checked against
+    the object's MD5 ETag (or length, for multipart uploads) and then renamed into
+    place, so readers never see a partial artifact.
+    """
+    return _download_model(ticker, model, etag)[0]
+
+
+def _download_model(ticker: str, model: str, etag: Optional[str]) -> Tuple[str, Optional[str]]:
+    """download_model_from_s3, also returning the ETag of the local copy (from the GET, or as recorded)."""
     ticker = ticker.upper()
-    filename = get_model_filename(ticker, model)
     local_path = get_cached_s3_model_path(ticker, model)
+    etag_path = f"{local_path}.etag"
     os.makedirs(os.path.dirname(local_path), exist_ok=True)
 
     if os.path.exists(local_path):
-        return local_path
+        try:
+            with open(etag_path) as f:
+                recorded = f.read().strip()
+        except FileNotFoundError:
+            recorded = None
+        if etag is None or recorded == etag:
+            cache_event("model_download", "hit")
+            return local_path, recorded
 
-    s3_key = f"{S3_PREFIX}/{model}/{filename}"
+    cache_event("model_download", "miss")
+    s3_key = get_s3_model_key(ticker, model)
     print(f"⬇️ Downloading s3://{S3_BUCKET}/{s3_key}")
-    s3.download_file(S3_BUCKET, s3_key, local_path)
-
-    return local_path
+    tmp = f"{local_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    md5, size = hashlib.md5(), 0
+    try:
+        with timed("download", model), open(tmp, "wb") as f:
+            obj = get_s3().get_object(Bucket=S3_BUCKET, Key=s3_key)
+            for chunk in obj["Body"].iter_chunks(1 << 20):
+                f.write(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+        remote_etag = obj["ETag"].strip('"')
+        if "-" in remote_etag:
+            # Multipart ETags aren't a content hash; the length is what we can check
+            if size != obj["ContentLength"]:
+                raise IOError(f"Truncated download of {s3_key}: {size} of {obj['ContentLength']} bytes")
+        elif md5.hexdigest() != remote_etag:
+            raise IOError(f"Checksum mismatch for {s3_key}")
+        os.replace(tmp, local_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _write_atomic(etag_path, remote_etag.encode())
+
+    return local_path, remote_etag
 
 # === Model loading ===
 
-@lru_cache(maxsize=256)
-def load_model(ticker: str, model: str = "prophet"):
-    ticker = ticker.upper()
-    path = (
-        get_local_model_path(ticker, model)
-        if USE_LOCAL else
-        download_model_from_s3(ticker, model)
-    )
+def _load_model_artifact(key, version: Optional[str]):
+    """ModelCache loader: (model, bytes, version). A cold load takes the ETag from the GET itself."""
+    ticker, model = key
+    if USE_LOCAL:
+        path, version = get_local_model_path(ticker, model), get_model_version(ticker, model)
+    else:
+        path, version = _download_model(ticker, model, version)
     print(f"📂 Loading model from: {path}")
-    return tf.keras.models.load_model(path) if model == "lstm" else joblib.load(path)
+    with timed("deserialize", model):
+        mdl, nbytes = _read_model(path, model)
+    return mdl, nbytes, version
 
-# === Accuracy lookup ===
 
-def get_accuracy_for_ticker(ticker: str, model: str = "prophet") -> Optional[float]:
-    ticker = ticker.upper()
-    acc_path = os.path.join(
-        LOCAL_MODEL_DIR if USE_LOCAL else S3_CACHE_DIR,
-        model,
-        "accuracy.json"
-    )
-
-    if not os.path.exists(acc_path):
-        if not USE_LOCAL:
-            try:
-                os.makedirs(os.path.dirname(acc_path), exist_ok=True)
-                s3_key = f"{S3_PREFIX}/{model}/accuracy.json"
-                print(f"⬇️ Downloading accuracy file: s3://{S3_BUCKET}/{s3_key}")
-                s3.download_file(S3_BUCKET, s3_key, acc_path)
-            except Exception:
-                return None
-        else:
-            return None
+def _read_model(path: str, model: str):
+    if model == "lstm" and LSTM_RUNTIME == "numpy":
+        bundle = load_lstm_bundle(path)
+        return bundle, sum(v.nbytes for v in bundle.values() if isinstance(v, np.ndarray))
+    if path.endswith(SLIM_EXTENSION):
+        return load_slim_model(path)
+    if model == "lstm":
+        import tensorflow as tf
+        mdl = tf.keras.models.load_model(path)
+    else:
+        import joblib
+        mdl = joblib.load(path)
+    return mdl, int(os.path.getsize(path) * MODEL_MEMORY_FACTOR)
+
+
+model_cache = ModelCache(
+    _load_model_artifact,
+    max_bytes=MODEL_CACHE_MAX_BYTES,
+    ttl=MODEL_CACHE_TTL_SECONDS,
+    policy=MODEL_CACHE_POLICY,
+    version_fn=lambda key: get_model_version(*key),
+    versioned_loader=True,
+)
+
+
+metrics.register_collector("model_cache", stats_collector(
+    "shrubb_model_cache_events", "model", model_cache.stats,
+    counters=("hits", "misses", "evictions", "reloads", "revalidations", "load_errors"),
+    gauges=("entries", "bytes", "max_bytes")))
+
+
+def load_model(ticker: str, model: str = "prophet"):
+    with timed("load_model", model):
+        return model_cache.get((ticker.upper(), model))
+
+
+def preload_model(ticker: str, model: str = "prophet") -> None:
+    """Load into the cache without returning the model (warmup of an inference worker)."""
+    load_model(ticker, model)
+
+
+def lstm_rollout_engine(models: List):
+    """
+    Batched LSTM rollout for the configured runtime. TensorFlow is only imported when asked for.
+    """
+    if LSTM_RUNTIME == "numpy":
+        return NumpyLSTMRollout(models)
+    from lstm_engine import LSTMRolloutEngine
+    return LSTMRolloutEngine(models)
 
+# === Model catalog ===
+
+# Validator of a catalog built from the bucket listing; no published catalog.json matches it
+SCANNED_CATALOG_ETAG = "scanned"
+
+
+def _fetch_catalog(etag: Optional[str]):
+    if USE_LOCAL:
+        return scan_local_catalog(LOCAL_MODEL_DIR), None
+    kwargs = {"IfNoneMatch": etag} if etag else {}
     try:
-        with open(acc_path) as f:
-            data = json.load(f)
-            return round(data.get(ticker, 0.0), 4)
-    except Exception:
-        return None
+        obj = get_s3().get_object(Bucket=S3_BUCKET, Key=CATALOG_KEY, **kwargs)
+    except Exception as e:
+        code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        if code in ("304", "NotModified"):
+            return None, etag
+        if code in ("404", "NoSuchKey"):
+            # Not published yet: index the model files directly, once
+            if etag == SCANNED_CATALOG_ETAG:
+                return None, etag
+            print(f"⚠️ s3://{S3_BUCKET}/{CATALOG_KEY} is missing; building the catalog from the model files")
+            return scan_s3_catalog(get_s3(), S3_BUCKET), SCANNED_CATALOG_ETAG
+        raise
+    return json.loads(obj["Body"].read()), obj["ETag"].strip('"')
+
+
+catalog = ModelCatalog(_fetch_catalog)
+
+# === Accuracy lookup ===
+
+def get_accuracy_for_ticker(ticker: str, model: str = "prophet") -> Optional[float]:
+    return catalog.accuracy(ticker, model)
 
 # === Data prep ===
 
 def prepare_yfinance_data(ticker: str, period: str = "3y", interval: str = "1d") -> pd.DataFrame:
-    df = yf.download(ticker, period=period, interval=interval, auto_adjust=False)
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    if df.empty or "Close" not in df.columns:
-        return pd.DataFrame()
-    df = df[["Close"]].dropna()
-    df["ds"] = df.index
-    return df[["ds", "Close"]].rename(columns={"Close": "y"})
+    """
+    Daily closes for `ticker` as a `ds`/`y` frame, served from the local price store.
+    Only bars newer than the last stored date are fetched from Yahoo Finance.
+    """
+    if interval != "1d":
+        raise ValueError(f"Unsupported interval: {interval}")
+    with timed("data"):
+        return price_store.frame(ticker.upper(), period)
 
 # === Unified prediction interface ===
 
-def predict_price(ticker: str, model: str, days: int) -> float:
+def predict_horizons(ticker: str, model: str, horizons: List[int],
+                     df: Optional[pd.DataFrame] = None) -> Dict[int, float]:
     """
-    Predict price for `ticker` using `model` over `days` horizon.
-    Returns a single float.
+    Predict prices for `ticker` using `model` at every horizon in `horizons` (days).
+    Each model family runs once out to the longest horizon; shorter horizons are
+    read off the same forecast. Pass `df` to reuse already loaded price history.
+    Returns {days: price}.
     """
     ticker = ticker.upper()
+    horizons = sorted(set(horizons))
     mdl = load_model(ticker, model)
 
-    df = prepare_yfinance_data(ticker)
-    today = pd.Timestamp.now().normalize()
+    if df is None:
+        df = prepare_yfinance_data(ticker)
+    with timed("forecast", model):
+        return _forecast(mdl, model, df, horizons)
+
+
+def _forecast(mdl, model: str, df: pd.DataFrame, horizons: List[int]) -> Dict[int, float]:
+    max_days = horizons[-1]
 
     if model == "prophet":
-        future = mdl.make_future_dataframe(periods=days)
-        forecast = mdl.predict(future)
-        future_rows = forecast[forecast["ds"] >= today]
-        target_index = min(days - 1, len(future_rows) - 1)
-        row = future_rows.iloc[target_index]
-        return float(row.yhat)
+        last_ds = mdl.history["ds"].max()
+        last_bar = pd.Timestamp(df["ds"].max()) if not df.empty else None
+        targets = _prophet_target_dates(last_ds, _forecast_day(last_bar, last_ds), horizons)
+        yhat = _prophet_yhat(mdl, pd.DatetimeIndex(list(targets.values())))
+        return {d: float(y) for d, y in zip(targets, yhat)}
 
     if model == "arima":
-        fc = mdl.forecast(steps=days)
-        return float(fc.iloc[days - 1])
+        fc = mdl.forecast(steps=max_days)
+        return {d: float(fc.iloc[d - 1]) for d in horizons}
 
     if model == "xgboost":
         df_ts = df.copy()
         df_ts["timestamp"] = df_ts["ds"].astype("int64") // 10**9
         last_ts = df_ts["timestamp"].max()
-        future_ts = np.array([[last_ts + days * 86400]])
-        return float(mdl.predict(future_ts)[0])
+        future_ts = np.array([[last_ts + d * 86400] for d in horizons])
+        preds = mdl.predict(future_ts)
+        return {d: float(p) for d, p in zip(horizons, preds)}
 
     if model == "lstm":
-        window = 10
-        scaler = MinMaxScaler()
-        scaled = scaler.fit_transform(df[["y"]])
-        seq = scaled[-window:].reshape(1, window, 1)
-        for _ in range(days):
-            p = mdl.predict(seq, verbose=0)[0][0]
-            seq = np.roll(seq, -1)
-            seq[0, -1, 0] = p
-        return float(scaler.inverse_transform([[p]])[0][0])
+        scaler, window = _lstm_window(df)
+        steps = lstm_rollout_engine([mdl]).rollout(window[None, :], max_days)[0]
+        return _lstm_prices(scaler, steps, horizons)
 
     raise ValueError(f"Unsupported model {model}")
+
+
+def _forecast_day(last_bar: Optional[pd.Timestamp], last_ds: pd.Timestamp) -> pd.Timestamp:
+    """
+    The "today" Prophet horizons count from: the day after the last observed
+    bar (or the model's last training day when there is no price history), not
+    the wall clock, so a forecast only changes when its inputs do.
+    """
+    anchor = last_bar if last_bar is not None and not pd.isna(last_bar) else last_ds
+    return pd.Timestamp(anchor).normalize() + pd.Timedelta(days=1)
+
+
+def _prophet_target_dates(last_ds: pd.Timestamp, today: pd.Timestamp,
+                          horizons: List[int]) -> Dict[int, pd.Timestamp]:
+    """
+    The date each horizon is read at: the row a daily `periods=d` forecast would
+    use, counting from `today` (see _forecast_day) when the forecast reaches it,
+    else its last day (e.g. the weekend after a Friday close).
+    """
+    targets = {}
+    for d in horizons:
+        end = last_ds + pd.Timedelta(days=d)
+        if end < today:
+            targets[d] = end
+            continue
+        first = max(1, int(np.ceil((today - last_ds) / pd.Timedelta(days=1))))
+        rows = ([last_ds] if last_ds >= today else []) + [last_ds + pd.Timedelta(days=i) for i in range(first, d + 1)]
+        targets[d] = rows[min(d - 1, len(rows) - 1)]
+    return targets
+
+
+def _prophet_yhat(mdl, dates: pd.DatetimeIndex) -> np.ndarray:
+    """yhat at `dates` only, without re-evaluating the history or sampling intervals."""
+    if isinstance(mdl, SlimProphet):
+        return mdl.predict_yhat(dates)
+    if mdl.extra_regressors:
+        return mdl.predict(pd.DataFrame({"ds": dates}))["yhat"].to_numpy()
+    df = mdl.setup_dataframe(pd.DataFrame({"ds": dates}))
+    trend = mdl.predict_trend(df).to_numpy()
+    components = mdl.predict_seasonal_components(df)
+    return trend * (1 + components["multiplicative_terms"].to_numpy()) + components["additive_terms"].to_numpy()
+
+
+def prophet_intervals(ticker: str, horizons: List[int],
+                      interval_width: Optional[float] = None) -> Dict[int, tuple]:
+    """
+    {days: (lower, upper)} uncertainty interval of the Prophet forecast at each
+    horizon, sampled at the same dates predict_horizons reads.
+    """
+    ticker = ticker.upper()
+    horizons = sorted(set(horizons))
+    mdl = load_model(ticker, "prophet")
+    if not isinstance(mdl, SlimProphet):
+        mdl = SlimProphet.from_model(mdl)
+    targets = _prophet_target_dates(mdl.last_ds, _forecast_day(price_store.last_date(ticker), mdl.last_ds), horizons)
+    with timed("intervals", "prophet"):
+        lower, upper = mdl.predict_interval(pd.DatetimeIndex(list(targets.values())), interval_width)
+    return {d: (float(lo), float(hi)) for d, lo, hi in zip(targets, lower, upper)}
+
+
+def _lstm_window(df: pd.DataFrame):
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler = MinMaxScaler()
+    scaled = scaler.fit_transform(df[["y"]])
+    return scaler, scaled[-LSTM_WINDOW:, 0]
+
+
+def _lstm_prices(scaler, steps: np.ndarray, horizons: List[int]) -> Dict[int, float]:
+    prices = scaler.inverse_transform(np.asarray(steps, dtype=np.float64).reshape(-1, 1))[:, 0]
+    return {d: float(prices[d - 1]) for d in horizons}
+
+
+def predict_lstm_batch(tickers: List[str], horizons: List[int],
+                       frames: Optional[Dict[str, pd.DataFrame]] = None) -> Dict[str, Dict[int, float]]:
+    """
+    LSTM forecasts for many tickers in one batched rollout. `frames` optionally
+    maps ticker -> already loaded price history. Tickers without a model or
+    enough history are left out of the result.
+    """
+    horizons = sorted(set(horizons))
+    frames = frames or {}
+    names, models, scalers, windows = [], [], [], []
+    for ticker in tickers:
+        df = frames.get(ticker)
+        ticker = ticker.upper()
+        try:
+            if df is None:
+                df = prepare_yfinance_data(ticker)
+            if len(df) < LSTM_WINDOW:
+                continue
+            mdl = load_model(ticker, "lstm")
+        except Exception as e:
+            print(f"⚠️ LSTM unavailable for {ticker}: {e}")
+            continue
+        scaler, window = _lstm_window(df)
+        names.append(ticker)
+        models.append(mdl)
+        scalers.append(scaler)
+        windows.append(window)
+
+    if not names:
+        return {}
+    engine = lstm_rollout_engine(models)
+    with timed("forecast", "lstm"):
+        steps = engine.rollout(np.stack(windows), horizons[-1])
+    print(f"⚡ LSTM rollout: {len(names)} sequences x {horizons[-1]} steps at {engine.last_throughput:,.0f} seq/s")
+    return {t: _lstm_prices(sc, st, horizons) for t, sc, st in zip(names, scalers, steps)}
+
+
+def predict_price(ticker: str, model: str, days: int) -> float:
+    """
+    Predict price for `ticker` using `model` over `days` horizon.
+    Returns a single float.
+    """
+    return predict_horizons(ticker, model, [days])[days]
+
 # === List available tickers ===
 
-@lru_cache(maxsize=8)
 def list_available_tickers(model: str = "prophet") -> List[str]:
     """
-    Returns tickers with model files, from LOCAL_MODEL_DIR or S3 under S3_PREFIX/model/.
+    Returns tickers with a published model artifact, from the model catalog.
     """
     model = model.lower()
-    ext = ".keras" if model == "lstm" else ".pkl"
+    ext = os.path.splitext(get_model_filename("_", model))[1]
+    return catalog.tickers(model, ext)
+
+def default_hot_tickers(n: int) -> List[str]:
+    """
+    Tickers to warm before any requests have been counted: the explore top
+    lists, then the rest of the catalog.
+    """
+    data = load_cached_explore_data()
+    tickers = [row["ticker"] for key in ("top_gainers", "top_losers") for row in data.get(key, [])]
+    tickers += list_available_tickers("prophet")
+    return list(dict.fromkeys(t.upper() for t in tickers))[:n]
+
+# === Shared request counts ===
+#
+# Per-ticker request counts (backend/prefetch.py) kept next to the models, so a
+# new task starts with the hot set of the ones before it.
 
+def fetch_request_counts() -> Dict[str, int]:
     if USE_LOCAL:
-        dirpath = os.path.join(LOCAL_MODEL_DIR, model)
-        try:
-            return [os.path.splitext(f)[0] for f in os.listdir(dirpath) if f.endswith(ext)]
-        except FileNotFoundError:
-            return []
-
-    # S3 fallback
-    prefix = f"{S3_PREFIX}/{model}/"
-    tickers = []
-    paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            name = os.path.basename(obj["Key"])
-            if name.endswith(ext):
-                tickers.append(os.path.splitext(name)[0])
-    return tickers
-
-# Explore data precomputed. Only available on S3.
-def load_cached_explore_data():
+        return {}
     try:
-        if USE_LOCAL:
-            explore_data_path = os.path.join(LOCAL_MODEL_DIR,EXPLORE_KEY)
-            print(f"Reading explore data from {explore_data_path}")
-            with open(explore_data_path, 'r') as f:
-                content = json.load(f)
-        else:
-            obj = s3.get_object(Bucket=S3_BUCKET, Key=EXPLORE_KEY)
-            content = json.loads(obj["Body"].read().decode("utf-8"))
-        return content
+        obj = get_s3().get_object(Bucket=S3_BUCKET, Key=REQUEST_COUNTS_KEY)
+    except Exception as e:
+        if getattr(e, "response", {}).get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            return {}
+        raise
+    return json.loads(obj["Body"].read())
+
+
+def publish_request_counts(counts: Dict[str, int]) -> None:
+    if USE_LOCAL:
+        return
+    get_s3().put_object(Bucket=S3_BUCKET, Key=REQUEST_COUNTS_KEY, Body=json.dumps(counts).encode(),
+                        ContentType="application/json")
+
+# === Explore data ===
+#
+# Precomputed by ml/explore_batch.py; read from S3, or from the local models
+# directory with USE_LOCAL_MODELS.
+
+def _fetch_explore(validator: Optional[str]):
+    if USE_LOCAL:
+        path = os.path.join(LOCAL_MODEL_DIR, EXPLORE_KEY)
+        mtime = str(os.stat(path).st_mtime_ns)
+        if mtime == validator:
+            return None, validator
+        with open(path) as f:
+            return json.load(f), mtime
+    kwargs = {"IfNoneMatch": validator} if validator else {}
+    try:
+        obj = get_s3().get_object(Bucket=S3_BUCKET, Key=EXPLORE_KEY, **kwargs)
     except Exception as e:
-        print(f"⚠️ Failed to load cached explore data: {e}")
-        return {"gainers": [], "losers": []}
+        if getattr(e, "response", {}).get("Error", {}).get("Code") in ("304", "NotModified"):
+            return None, validator
+        raise
+    return json.loads(obj["Body"].read()), obj["ETag"].strip('"')
+
+
+explore_cache = ExploreCache(_fetch_explore)
+
+
+def _fetch_ranking_index(validator: Optional[str]):
+    if USE_LOCAL:
+        path = os.path.join(LOCAL_MODEL_DIR, RANKING_KEY)
+        mtime = str(os.stat(path).st_mtime_ns)
+        if mtime == validator:
+            return None, validator
+        return RankingIndex.load(path), mtime
+    kwargs = {"IfNoneMatch": validator} if validator else {}
+    try:
+        obj = get_s3().get_object(Bucket=S3_BUCKET, Key=RANKING_KEY, **kwargs)
+    except Exception as e:
+        if getattr(e, "response", {}).get("Error", {}).get("Code") in ("304", "NotModified"):
+            return None, validator
+        raise
+    # Arrays are memory-mapped, so the index is read from a local copy
+    path = os.path.join(S3_CACHE_DIR, RANKING_KEY)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomic(path, obj["Body"].read())
+    return RankingIndex.load(path), obj["ETag"].strip('"')
+
+
+ranking_cache = RankingCache(_fetch_ranking_index)
+
+
+def load_cached_explore_data() -> dict:
+    explore_cache.ensure_loaded()
+    return explore_cache.data
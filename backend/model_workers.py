@@ -0,0 +1,324 @@
+import os
+import pickle
+import zlib
+import queue
+import threading
+import importlib
+import itertools
+import multiprocessing
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Out-of-process inference (INFERENCE_POOL=true).
+#
+# Forecasts hold the GIL for tens to hundreds of milliseconds (Prophet's pandas
+# work, statsmodels, TensorFlow), so in pool mode they run in dedicated worker
+# processes instead of the web worker. Each model family gets its own processes
+# (INFERENCE_POOL_WORKERS, e.g. "prophet=2,arima=1,xgboost=1,lstm=1") and every
+# ticker is routed to the same process of its family, so a model is loaded into
+# one process of the pool and the web worker loads none. Price histories are
+# handed over as shared-memory arrays (ds as int64 ns, y as float64): the web
+# worker writes a ticker's closes once per new bar, tasks only carry the
+# segment name, and a replaced segment is unlinked once no pending task refers
+# to it. Workers are started with `spawn`, and restarted if they die;
+# tasks that were queued or running on a dead worker fail as soon as the death
+# is noticed (within POOL_POLL_SECONDS), before the replacement is started.
+#
+# The pool belongs to the web worker that starts it, not to the host: with
+# several uvicorn workers each one starts its own processes and loads its own
+# copy of every model it serves, so the gain is per web worker only. Size
+# INFERENCE_POOL_WORKERS per web worker (total processes = WEB_CONCURRENCY *
+# sum of slots) and run one web worker per container in this mode.
+
+INFERENCE_POOL = os.getenv("INFERENCE_POOL", "false").lower() == "true"
+INFERENCE_POOL_WORKERS = os.getenv("INFERENCE_POOL_WORKERS", "prophet=1,arima=1,xgboost=1,lstm=1")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Upper bound on how long a dead worker's tasks wait before they fail
+POOL_POLL_SECONDS = 0.25
+
+
+def parse_workers(spec: str) -> Dict[str, int]:
+    """"prophet=2,arima=1" -> {"prophet": 2, "arima": 1}"""
+    workers = {}
+    for part in spec.split(","):
+        if part.strip():
+            family, _, n = part.partition("=")
+            workers[family.strip()] = max(1, int(n or 1))
+    return workers
+
+
+# === Shared-memory price histories ===
+
+class SharedFrame:
+    """Picklable handle of a ds/y frame held in a shared memory segment."""
+
+    def __init__(self, name: str, rows: int):
+        self.name, self.rows = name, rows
+
+    def __repr__(self):
+        return f"SharedFrame({self.name!r}, rows={self.rows})"
+
+
+def attach_frame(handle: SharedFrame) -> pd.DataFrame:
+    """Read a shared frame back into a DataFrame (in the worker)."""
+    shm = shared_memory.SharedMemory(name=handle.name)
+    try:
+        n = handle.rows
+        ds = np.ndarray((n,), dtype=np.int64, buffer=shm.buf).copy()
+        y = np.ndarray((n,), dtype=np.float64, buffer=shm.buf, offset=8 * n).copy()
+    finally:
+        shm.close()
+    return pd.DataFrame({"ds": ds.view("datetime64[ns]"), "y": y})
+
+
+class SharedPrices:
+    """
+    One segment per key (ticker), rewritten only when its history changes.
+    `publish` hands out a reference that the caller returns with `release`
+    once the task using it has finished; a replaced segment is unlinked when
+    its last reference is released, so running tasks can always attach.
+    """
+
+    def __init__(self):
+        self._segments: Dict[Hashable, Tuple[shared_memory.SharedMemory, SharedFrame, tuple]] = {}
+        self._retired: Dict[str, shared_memory.SharedMemory] = {}
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, key: Hashable, df: pd.DataFrame) -> SharedFrame:
+        ds = pd.DatetimeIndex(df["ds"]).as_unit("ns").asi8
+        y = np.asarray(df["y"], dtype=np.float64)
+        version = (len(ds), int(ds[-1]) if len(ds) else None, float(y[-1]) if len(y) else None)
+        with self._lock:
+            current = self._segments.get(key)
+            if current is not None and current[2] == version:
+                handle = current[1]
+            else:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, 16 * len(ds)))
+                np.ndarray((len(ds),), dtype=np.int64, buffer=shm.buf)[:] = ds
+                np.ndarray((len(y),), dtype=np.float64, buffer=shm.buf, offset=8 * len(ds))[:] = y
+                handle = SharedFrame(shm.name, len(ds))
+                self._segments[key] = (shm, handle, version)
+                if current is not None:
+                    if self._refs.get(current[1].name):
+                        self._retired[current[1].name] = current[0]
+                    else:
+                        self._release(current[0])
+            self._refs[handle.name] = self._refs.get(handle.name, 0) + 1
+            return handle
+
+    def release(self, handle: SharedFrame) -> None:
+        """Return a reference taken by `publish`; unlinks a replaced segment on its last one."""
+        with self._lock:
+            left = self._refs.get(handle.name, 0) - 1
+            if left > 0:
+                self._refs[handle.name] = left
+                return
+            self._refs.pop(handle.name, None)
+            self._release(self._retired.pop(handle.name, None))
+
+    @staticmethod
+    def _release(shm: Optional[shared_memory.SharedMemory]) -> None:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def close(self) -> None:
+        with self._lock:
+            for shm, _, _ in self._segments.values():
+                self._release(shm)
+            for shm in self._retired.values():
+                self._release(shm)
+            self._segments, self._retired, self._refs = {}, {}, {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"segments": len(self._segments) + len(self._retired),
+                    "bytes": sum(s.size for s, _, _ in self._segments.values())}
+
+
+# === Worker processes ===
+
+def _resolve(arg):
+    if isinstance(arg, SharedFrame):
+        return attach_frame(arg)
+    if isinstance(arg, dict):
+        return {k: _resolve(v) for k, v in arg.items()}
+    return arg
+
+
+def _worker_main(module_name: str, requests, results) -> None:
+    module = importlib.import_module(module_name)
+    while True:
+        task = requests.get()
+        if task is None:
+            return
+        task_id, fn, args = task
+        try:
+            out = (task_id, True, getattr(module, fn)(*[_resolve(a) for a in args]))
+            pickle.dumps(out)
+        except Exception as e:
+            try:
+                out = (task_id, False, pickle.loads(pickle.dumps(e)))
+            except Exception:
+                out = (task_id, False, RuntimeError(f"{type(e).__name__}: {e}"))
+        results.put(out)
+
+
+class InferencePool:
+    """
+    `submit(family, key, fn, *args)` runs `module.fn(*args)` on the process of
+    `family` that `key` (a ticker) maps to and returns a concurrent Future.
+    DataFrame arguments, and dicts of them, travel through shared memory.
+    """
+
+    def __init__(self, workers: Optional[Dict[str, int]] = None, module: str = "model_loader"):
+        self.workers = workers if workers is not None else parse_workers(INFERENCE_POOL_WORKERS)
+        self.module = module
+        self.prices = SharedPrices()
+        self.running = False
+        self.restarts = 0
+        self.completed = 0
+        self.failed = 0
+        self._ctx = multiprocessing.get_context("spawn")
+        self._procs: Dict[Tuple[str, int], tuple] = {}
+        self._pending: Dict[int, Tuple[Future, Tuple[str, int], List[SharedFrame]]] = {}
+        self._ids = itertools.count()
+        self._results = None
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._results = self._ctx.Queue()
+        for family, n in self.workers.items():
+            for i in range(n):
+                self._spawn((family, i))
+        self.running = True
+        self._reader = threading.Thread(target=self._read_results, name="inference-pool", daemon=True)
+        self._reader.start()
+        print(f"🧵 Inference pool started: {', '.join(f'{f}={n}' for f, n in self.workers.items())}")
+        if WEB_CONCURRENCY > 1:
+            total = WEB_CONCURRENCY * sum(self.workers.values())
+            print(f"⚠️ WEB_CONCURRENCY={WEB_CONCURRENCY}: every web worker starts its own inference pool "
+                  f"({total} inference processes on this host, each model loaded up to {WEB_CONCURRENCY} times)")
+
+    def _spawn(self, slot: Tuple[str, int], requests=None) -> None:
+        requests = requests if requests is not None else self._ctx.Queue()
+        proc = self._ctx.Process(target=_worker_main, args=(self.module, requests, self._results),
+                                 name=f"inference-{slot[0]}-{slot[1]}", daemon=True)
+        proc.start()
+        self._procs[slot] = (proc, requests)
+
+    def slot(self, family: str, key: str) -> Tuple[str, int]:
+        if family not in self.workers:
+            raise ValueError(f"No inference workers for model '{family}'")
+        return family, zlib.crc32(key.encode()) % self.workers[family]
+
+    def _share(self, key: str, arg, handles: List[SharedFrame]):
+        if isinstance(arg, pd.DataFrame):
+            handles.append(self.prices.publish(key, arg))
+            return handles[-1]
+        if isinstance(arg, dict) and any(isinstance(v, pd.DataFrame) for v in arg.values()):
+            return {k: self._share(k, v, handles) for k, v in arg.items()}
+        return arg
+
+    def submit(self, family: str, key: str, fn: str, *args) -> Future:
+        if not self.running:
+            raise RuntimeError("Inference pool is not running")
+        slot = self.slot(family, key)
+        handles: List[SharedFrame] = []
+        args = tuple(self._share(key, a, handles) for a in args)
+        future: Future = Future()
+        with self._lock:
+            task_id = next(self._ids)
+            self._pending[task_id] = (future, slot, handles)
+            self._procs[slot][1].put((task_id, fn, args))
+        return future
+
+    def _finish(self, entry: tuple, error: Optional[BaseException] = None, value=None) -> None:
+        """Release the task's price segments, then resolve its future."""
+        future, _, handles = entry
+        for handle in handles:
+            self.prices.release(handle)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def _read_results(self) -> None:
+        while self.running:
+            # Checked on every pass, not just when idle: a steady stream of
+            # results from other workers must not hide a dead one.
+            self._check_workers()
+            try:
+                task_id, ok, value = self._results.get(timeout=POOL_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                entry = self._pending.pop(task_id, None)
+            if entry is None:
+                continue
+            if ok:
+                self.completed += 1
+                self._finish(entry, value=value)
+            else:
+                self.failed += 1
+                self._finish(entry, error=value)
+
+    def _check_workers(self) -> None:
+        for slot, (proc, _) in list(self._procs.items()):
+            if proc.is_alive() or not self.running:
+                continue
+            print(f"⚠️ Inference worker {slot[0]}-{slot[1]} exited ({proc.exitcode}); restarting")
+            with self._lock:
+                lost = [tid for tid, entry in self._pending.items() if entry[1] == slot]
+                entries = [self._pending.pop(tid) for tid in lost]
+                # New submissions queue up for the replacement process
+                requests = self._ctx.Queue()
+                self._procs[slot] = (proc, requests)
+                self.restarts += 1
+            for entry in entries:
+                self._finish(entry, error=RuntimeError(f"Inference worker for {slot[0]} exited"))
+            self._spawn(slot, requests)
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        for proc, requests in self._procs.values():
+            requests.put(None)
+        for proc, _ in self._procs.values():
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        if self._reader is not None:
+            self._reader.join(timeout=5)
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for entry in pending:
+            self._finish(entry, error=RuntimeError("Inference pool stopped"))
+        self._procs = {}
+        self.prices.close()
+
+    def stats(self) -> dict:
+        alive = sum(proc.is_alive() for proc, _ in self._procs.values())
+        return {"workers": alive, "pending": len(self._pending), "completed": self.completed,
+                "failed": self.failed, "restarts": self.restarts, **self.prices.stats()}
+
+    def split(self, family: str, keys: List[str]) -> Dict[Tuple[str, int], List[str]]:
+        """Group `keys` by the process they map to, for batched tasks."""
+        groups: Dict[Tuple[str, int], List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.slot(family, key), []).append(key)
+        return groups
+
+
+pool = InferencePool()
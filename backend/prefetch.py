@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from model_loader import fetch_request_counts, publish_request_counts
+
+# Startup warmup of the model caches for the tickers users ask for most.
+#
+# Request counts per ticker are kept in memory, persisted to REQUEST_STATS_PATH
+# and shared through S3 next to the models (models/request_counts.json), so a
+# new task knows what was hot. On startup the hot set (PREFETCH_TICKERS, the
+# PREFETCH_TOP_N most requested tickers, or a fallback list when nothing has been
+# counted yet) is loaded for every PREFETCH_MODELS family on a thread pool, which
+# downloads the artifacts to disk and puts them in the in-memory model cache.
+# /ready reports ready once that finishes, or after PREFETCH_TIMEOUT_SECONDS.
+
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "20"))
+PREFETCH_TICKERS = [t.strip().upper() for t in os.getenv("PREFETCH_TICKERS", "").split(",") if t.strip()]
+PREFETCH_MODELS = [m.strip() for m in os.getenv("PREFETCH_MODELS", "prophet,arima,xgboost,lstm").split(",") if m.strip()]
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "8"))
+PREFETCH_TIMEOUT_SECONDS = float(os.getenv("PREFETCH_TIMEOUT_SECONDS", "240"))
+REQUEST_STATS_PATH = os.getenv("REQUEST_STATS_PATH", "/tmp/shrubb_models/request_counts.json")
+# Tickers kept in the counter; the in-memory one is trimmed back at twice this
+REQUEST_STATS_MAX_TICKERS = int(os.getenv("REQUEST_STATS_MAX_TICKERS", "1000"))
+SAVE_EVERY = 100
+
+
+class RequestStats:
+    """
+    Per-ticker request counter, persisted every SAVE_EVERY requests. Only the
+    `max_tickers` most requested tickers are persisted. `fetch()` and
+    `publish(counts)` read and write the counts shared between tasks; merging
+    keeps the larger count per ticker.
+    """
+
+    def __init__(self, path: str = REQUEST_STATS_PATH, max_tickers: int = REQUEST_STATS_MAX_TICKERS,
+                 fetch: Optional[Callable[[], Dict[str, int]]] = None,
+                 publish: Optional[Callable[[Dict[str, int]], None]] = None):
+        self.path = path
+        self.max_tickers = max_tickers
+        self.fetch = fetch
+        self.publish = publish
+        self.counts: Counter = Counter()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                self.counts.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        self.counts = Counter(dict(self.counts.most_common(self.max_tickers)))
+
+    def pull(self) -> None:
+        """Merge in the shared counts."""
+        if self.fetch is None:
+            return
+        try:
+            shared = self.fetch()
+        except Exception as e:
+            print(f"⚠️ Failed to read shared request stats: {e}")
+            return
+        with self._lock:
+            for ticker, count in shared.items():
+                if count > self.counts[ticker]:
+                    self.counts[ticker] = count
+            self.counts = Counter(dict(self.counts.most_common(self.max_tickers)))
+
+    def save(self, share: bool = False) -> None:
+        """Persist the counts locally and, with `share`, merge them into the shared copy."""
+        if share and self.publish is not None:
+            self.pull()
+        with self._lock:
+            counts = dict(self.counts.most_common(self.max_tickers))
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(counts, f)
+        os.replace(tmp, self.path)
+        if share and self.publish is not None:
+            self.publish(counts)
+
+    def record(self, ticker: str) -> None:
+        with self._lock:
+            self.counts[ticker.upper()] += 1
+            self._unsaved += 1
+            if len(self.counts) > 2 * self.max_tickers:
+                self.counts = Counter(dict(self.counts.most_common(self.max_tickers)))
+            due = self._unsaved >= SAVE_EVERY
+        if due:
+            # Off the request thread: sharing the counts is an S3 round trip
+            threading.Thread(target=self._save_quietly, name="request-stats", daemon=True).start()
+
+    def _save_quietly(self) -> None:
+        try:
+            self.save(share=True)
+        except Exception as e:
+            print(f"⚠️ Failed to save request stats: {e}")
+
+    def top(self, n: int) -> List[str]:
+        with self._lock:
+            return [t for t, _ in self.counts.most_common(n)]
+
+
+def hot_set(stats: RequestStats, n: int = PREFETCH_TOP_N, models: Iterable[str] = PREFETCH_MODELS,
+            fallback: Optional[Callable[[int], List[str]]] = None) -> List[Tuple[str, str]]:
+    """
+    (ticker, model) pairs to warm, hottest first. `fallback(n)` supplies the
+    tickers when nothing has been counted yet.
+    """
+    tickers = PREFETCH_TICKERS or stats.top(n)
+    if not tickers and fallback is not None:
+        try:
+            tickers = fallback(n)[:n]
+        except Exception as e:
+            print(f"⚠️ No fallback hot set: {e}")
+    return [(t, m) for t in tickers for m in models]
+
+
+class Warmup:
+    def __init__(self, timeout: float = PREFETCH_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self.state = "pending"
+        self.total = 0
+        self.loaded = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def run(self, pairs: List[Tuple[str, str]], loader: Callable[[str, str], object],
+            workers: int = PREFETCH_WORKERS) -> None:
+        self.state, self.total, self.started_at = "running", len(pairs), time.monotonic()
+
+        def load(pair):
+            try:
+                loader(*pair)
+                with self._lock:
+                    self.loaded += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"⚠️ Prefetch failed for {pair[0]} ({pair[1]}): {e}")
+
+        # Coldest first, so with an LRU cache the hottest models are the last evicted
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") as pool:
+            list(pool.map(load, reversed(pairs)))
+        self.state, self.finished_at = "done", time.monotonic()
+        print(f"🔥 Prefetched {self.loaded}/{self.total} models in {self.finished_at - self.started_at:.1f}s")
+
+    def start(self, pairs: List[Tuple[str, str]], loader: Callable[[str, str], object]) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run, args=(pairs, loader), name="prefetch", daemon=True)
+        self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        if self.state == "done":
+            return True
+        # A slow or stuck warmup must not keep the worker out of rotation forever
+        return self.started_at is not None and time.monotonic() - self.started_at > self.timeout
+
+    def status(self) -> Dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 2)
+        return {"ready": self.ready, "state": self.state, "total": self.total,
+                "loaded": self.loaded, "failed": self.failed, "elapsed_s": elapsed}
+
+
+request_stats = RequestStats(fetch=fetch_request_counts, publish=publish_request_counts)
+warmup = Warmup()
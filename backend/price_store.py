@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import threading
+import fcntl
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from market_data import BulkFetcher, close_matrix
+
+# On-disk, per-ticker daily close history shared by the backend and the ml jobs.
+#
+# Layout under PRICE_STORE_DIR:
+#   <TICKER>/ds.i8      datetime64[ns] bar dates stored as raw int64
+#   <TICKER>/y.f8       float64 closes
+#   <TICKER>/meta.json  {"rows": committed row count, "checked_at": epoch seconds}
+#
+# Column files are append-only (the last bar may be rewritten in place while the
+# session is still open) and are memory-mapped by readers. Only `rows` entries
+# are ever read, so a crash mid-append never exposes a partial bar. Each map
+# holds a file descriptor, so only the PRICE_STORE_OPEN_TICKERS most recently
+# read tickers keep theirs open.
+#
+# Single tickers are updated through `source`; the batch jobs update the whole
+# universe at once through `fetcher` (chunked multi-symbol requests, see
+# market_data.py) and read it back as one aligned close matrix.
+
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "/tmp/shrubb_prices")
+PRICE_REFRESH_SECONDS = int(os.getenv("PRICE_REFRESH_SECONDS", "900"))
+PRICE_STORE_OPEN_TICKERS = int(os.getenv("PRICE_STORE_OPEN_TICKERS", "128"))
+HISTORY_PERIOD = "3y"
+
+_EMPTY_DS = np.empty(0, dtype="datetime64[ns]")
+_EMPTY_Y = np.empty(0, dtype=np.float64)
+
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """
+    Convert a yfinance-style period ("7d", "6mo", "1y", "max") into a start date.
+    """
+    now = (now or pd.Timestamp.now()).normalize()
+    if period == "max":
+        return None
+    for suffix, unit in (("mo", "months"), ("wk", "weeks"), ("y", "years"), ("d", "days")):
+        if period.endswith(suffix):
+            return now - pd.DateOffset(**{unit: int(period[: -len(suffix)])})
+    raise ValueError(f"Unsupported period: {period}")
+
+
+class YFinanceSource:
+    """Default data source: daily closes from Yahoo Finance."""
+
+    def fetch(self, ticker: str, start: Optional[pd.Timestamp] = None, period: str = HISTORY_PERIOD) -> pd.DataFrame:
+        import yfinance as yf
+
+        if start is None:
+            df = yf.download(ticker, period=period, interval="1d", auto_adjust=False, progress=False)
+        else:
+            df = yf.download(ticker, start=start.strftime("%Y-%m-%d"), interval="1d", auto_adjust=False, progress=False)
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+        if df.empty or "Close" not in df.columns:
+            return pd.DataFrame(columns=["ds", "y"])
+        df = df[["Close"]].dropna()
+        idx = pd.DatetimeIndex(df.index)
+        if idx.tz is not None:
+            idx = idx.tz_localize(None)
+        return pd.DataFrame({"ds": idx, "y": df["Close"].to_numpy(dtype=np.float64)})
+
+
+class PriceStore:
+    """
+    Columnar, memory-mapped daily price history that only fetches new bars.
+    """
+
+    def __init__(self, root: str = PRICE_STORE_DIR, source=None,
+                 refresh_seconds: int = PRICE_REFRESH_SECONDS, history_period: str = HISTORY_PERIOD,
+                 fetcher: Optional[BulkFetcher] = None, max_open: int = PRICE_STORE_OPEN_TICKERS):
+        self.root = root
+        self.source = source or YFinanceSource()
+        self.fetcher = fetcher or BulkFetcher()
+        self.refresh_seconds = refresh_seconds
+        self.history_period = history_period
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.max_open = max_open
+        self._views: "OrderedDict[str, Tuple[int, np.ndarray, np.ndarray]]" = OrderedDict()
+        self._views_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # === Paths & metadata ===
+
+    def _dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker.upper())
+
+    def _meta_path(self, ticker: str) -> str:
+        return os.path.join(self._dir(ticker), "meta.json")
+
+    def _read_meta(self, ticker: str) -> dict:
+        try:
+            with open(self._meta_path(ticker)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"rows": 0, "checked_at": 0.0}
+
+    def _write_meta(self, ticker: str, meta: dict) -> None:
+        path = self._meta_path(ticker)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def _lock(self, ticker: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _write_rows(self, ticker: str, start_row: int, ds: np.ndarray, y: np.ndarray) -> None:
+        for name, values in (("ds.i8", ds.astype("datetime64[ns]").astype(np.int64)),
+                             ("y.f8", y.astype(np.float64))):
+            path = os.path.join(self._dir(ticker), name)
+            with open(path, "ab"):
+                pass
+            with open(path, "r+b") as f:
+                f.seek(start_row * 8)
+                f.write(values.tobytes())
+                f.truncate((start_row + len(values)) * 8)
+
+    # === Public API ===
+
+    def read(self, ticker: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (dates, closes) as read-only memory-mapped arrays. No network I/O.
+        """
+        ticker = ticker.upper()
+        rows = self._read_meta(ticker)["rows"]
+        with self._views_lock:
+            cached = self._views.get(ticker)
+            if cached and cached[0] == rows:
+                self._views.move_to_end(ticker)
+                return cached[1], cached[2]
+        if rows == 0:
+            return _EMPTY_DS, _EMPTY_Y
+        d = self._dir(ticker)
+        ds = np.memmap(os.path.join(d, "ds.i8"), dtype=np.int64, mode="r", shape=(rows,)).view("datetime64[ns]")
+        y = np.memmap(os.path.join(d, "y.f8"), dtype=np.float64, mode="r", shape=(rows,))
+        with self._views_lock:
+            self._views[ticker] = (rows, ds, y)
+            self._views.move_to_end(ticker)
+            # Evicted maps stay valid for callers still holding them and close once released
+            while len(self._views) > self.max_open:
+                self._views.popitem(last=False)
+        return ds, y
+
+    def last_date(self, ticker: str) -> Optional[pd.Timestamp]:
+        ds, _ = self.read(ticker)
+        return pd.Timestamp(ds[-1]) if len(ds) else None
+
+    @contextmanager
+    def _locked(self, ticker: str):
+        # Thread lock within the process, flock across processes
+        with self._lock(ticker):
+            os.makedirs(self._dir(ticker), exist_ok=True)
+            with open(os.path.join(self._dir(ticker), ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _is_fresh(self, meta: dict, now: float) -> bool:
+        return bool(meta["rows"]) and now - meta.get("checked_at", 0.0) < self.refresh_seconds
+
+    def update(self, ticker: str, force: bool = False) -> int:
+        """
+        Fetch bars newer than the last stored date. Returns the number of rows written.
+        Skips the source entirely if it was checked less than `refresh_seconds` ago.
+        """
+        ticker = ticker.upper()
+        with self._locked(ticker):
+            return self._update_locked(ticker, force)
+
+    def _update_locked(self, ticker: str, force: bool) -> int:
+        now = time.time()
+        if not force and self._is_fresh(self._read_meta(ticker), now):
+            return 0
+
+        last = self.last_date(ticker)
+        try:
+            # Re-request the last stored bar too, so a partial intraday close gets finalized.
+            new = self.source.fetch(ticker, start=last, period=self.history_period)
+        except Exception as e:
+            print(f"⚠️ Price fetch failed for {ticker}: {e}")
+            return 0
+        return self._store_locked(ticker, new, now)
+
+    def _store_locked(self, ticker: str, new: pd.DataFrame, now: float) -> int:
+        """Append the bars of `new` after the stored ones and mark the ticker checked at `now`."""
+        rows = self._read_meta(ticker)["rows"]
+        last = self.last_date(ticker) if rows else None
+        written = 0
+        if not new.empty:
+            new = new.sort_values("ds").drop_duplicates("ds", keep="last")
+            ds = pd.to_datetime(new["ds"]).to_numpy(dtype="datetime64[ns]")
+            y = new["y"].to_numpy(dtype=np.float64)
+            start_row = rows
+            if last is not None:
+                keep = ds >= np.datetime64(last, "ns")
+                ds, y = ds[keep], y[keep]
+                if len(ds) and ds[0] == np.datetime64(last, "ns"):
+                    start_row = rows - 1
+            if len(ds):
+                self._write_rows(ticker, start_row, ds, y)
+                rows = start_row + len(ds)
+                written = len(ds)
+
+        self._write_meta(ticker, {"rows": rows, "checked_at": now})
+        return written
+
+    def update_many(self, tickers: Iterable[str], force: bool = False) -> Dict[str, int]:
+        """
+        Bring many tickers up to date through the bulk fetcher, one request
+        batch per distinct last stored date. Returns {ticker: rows written};
+        tickers that couldn't be fetched are left out and stay due.
+        """
+        now = time.time()
+        groups: Dict[Optional[pd.Timestamp], List[str]] = {}
+        for ticker in dict.fromkeys(t.upper() for t in tickers):
+            if force or not self._is_fresh(self._read_meta(ticker), now):
+                groups.setdefault(self.last_date(ticker), []).append(ticker)
+
+        written: Dict[str, int] = {}
+        for start, group in groups.items():
+            frames, errors = self.fetcher.fetch(group, start=start, period=self.history_period)
+            if errors:
+                print(f"⚠️ Price fetch failed for {len(errors)} tickers: {sorted(errors)[:10]}")
+            for ticker in group:
+                if ticker in errors:
+                    continue
+                with self._locked(ticker):
+                    written[ticker] = self._store_locked(ticker, frames[ticker], now)
+        return written
+
+    def frame(self, ticker: str, period: str = HISTORY_PERIOD, refresh: bool = True) -> pd.DataFrame:
+        """
+        Return a `ds`/`y` DataFrame for the requested period, updating from the source first.
+        """
+        if refresh:
+            self.update(ticker)
+        ds, y = self.read(ticker)
+        if not len(ds):
+            return pd.DataFrame()
+        start = period_start(period)
+        lo = 0 if start is None else int(np.searchsorted(ds, np.datetime64(start, "ns")))
+        return pd.DataFrame({"ds": np.array(ds[lo:]), "y": np.array(y[lo:])})
+
+    def close_matrix(self, tickers: Iterable[str], period: str = HISTORY_PERIOD, refresh: bool = True) -> pd.DataFrame:
+        """
+        Dates x tickers closes for the requested period, aligned on bar dates,
+        after one bulk update. Tickers without history are left out.
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        if refresh:
+            self.update_many(tickers)
+        frames = {t: self.frame(t, period, refresh=False) for t in tickers}
+        return close_matrix({t: df for t, df in frames.items() if not df.empty})
+
+    def last_close(self, ticker: str, refresh: bool = True) -> Optional[float]:
+        if refresh:
+            self.update(ticker)
+        _, y = self.read(ticker)
+        return float(y[-1]) if len(y) else None
@@ -0,0 +1,178 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from slim_models import read_artifact, write_artifact
+from explore_cache import ExploreCache, EXPLORE_REFRESH_SECONDS
+from instrumentation import cache_event
+
+# Full-universe explore rankings (analytics/ranking_index.slim, written by
+# ml/explore_batch.py next to gainers_losers.json).
+#
+# The file uses the .slim container (slim_models.py) with one row per ticker:
+#
+#   current_price    float64 [n]
+#   predicted_price  float64 [n, models]   column 0 is the ensemble ("all")
+#   percent_change   float64 [n, models]   NaN where a model has no forecast
+#   sector           int16 [n]             index into meta["sectors"], -1 unknown
+#   sub_industry     int16 [n]             index into meta["sub_industries"]
+#
+# and the tickers, model names and group names in the header. On load every
+# (model, group) ranking is sorted once, so a top-N query is a slice of a
+# precomputed order plus serializing N rows; bodies are cached per query.
+
+RANKING_FAMILY = "ranking"
+RANKING_BODY_CACHE_SIZE = 512
+ENSEMBLE = "all"
+
+
+def write_index(path: str, rows: List[dict], model_preds: Dict[str, Dict[str, float]],
+                models: List[str], metadata: Dict[str, dict], timestamp: str) -> str:
+    """
+    `rows` are the explore result rows (ticker, current_price, predicted_price,
+    percent_change); `model_preds` maps ticker -> {model: predicted price};
+    `metadata` maps ticker -> {sector, sub_industry}.
+    """
+    tickers = [r["ticker"] for r in rows]
+    groups = {field: sorted({metadata.get(t, {}).get(field) for t in tickers} - {None})
+              for field in ("sector", "sub_industry")}
+    n, k = len(rows), len(models) + 1
+    current = np.array([r["current_price"] for r in rows], dtype=np.float64)
+    predicted = np.full((n, k), np.nan)
+    change = np.full((n, k), np.nan)
+    for i, row in enumerate(rows):
+        predicted[i, 0], change[i, 0] = row["predicted_price"], row["percent_change"]
+        for j, model in enumerate(models, start=1):
+            pred = model_preds.get(row["ticker"], {}).get(model)
+            if pred is not None and current[i]:
+                predicted[i, j] = round(pred, 2)
+                change[i, j] = round((pred - current[i]) / current[i] * 100, 2)
+
+    def codes(field):
+        lookup = {name: c for c, name in enumerate(groups[field])}
+        return np.array([lookup.get(metadata.get(t, {}).get(field), -1) for t in tickers], dtype=np.int16)
+
+    meta = {"timestamp": timestamp, "tickers": tickers, "models": [ENSEMBLE] + list(models),
+            "sectors": groups["sector"], "sub_industries": groups["sub_industry"]}
+    arrays = {"current_price": current, "predicted_price": predicted, "percent_change": change,
+              "sector": codes("sector"), "sub_industry": codes("sub_industry")}
+    return write_artifact(path, RANKING_FAMILY, meta, arrays)
+
+
+class RankingIndex:
+    """Sorted views of one ranking file. `top()` returns result rows."""
+
+    def __init__(self, meta: dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.tickers = meta["tickers"]
+        self.models = meta["models"]
+        self.group_names = {"sector": meta["sectors"], "sub_industry": meta["sub_industries"]}
+        self._codes = {field: {name.lower(): c for c, name in enumerate(names)}
+                       for field, names in self.group_names.items()}
+        self.current = np.array(arrays["current_price"])
+        self.predicted = np.array(arrays["predicted_price"])
+        self.change = np.array(arrays["percent_change"])
+        self.groups = {field: np.array(arrays[field]) for field in ("sector", "sub_industry")}
+
+        # (model, field, code) -> row indices in ascending percent change
+        self._orders: Dict[Tuple[str, Optional[str], Optional[int]], np.ndarray] = {}
+        for j, model in enumerate(self.models):
+            col = self.change[:, j]
+            order = np.argsort(col, kind="stable")
+            order = order[~np.isnan(col[order])]
+            self._orders[(model, None, None)] = order
+            for field, codes in self.groups.items():
+                ordered = codes[order]
+                for code in np.unique(ordered[ordered >= 0]):
+                    self._orders[(model, field, int(code))] = order[ordered == code]
+
+    @classmethod
+    def load(cls, path: str) -> "RankingIndex":
+        family, meta, arrays = read_artifact(path)
+        if family != RANKING_FAMILY:
+            raise ValueError(f"Not a ranking index: {path}")
+        return cls(meta, arrays)
+
+    def sectors(self) -> Dict[str, List[str]]:
+        """{sector: [sub-industries with ranked tickers]}"""
+        out: Dict[str, set] = {}
+        for sector, sub in zip(self.groups["sector"], self.groups["sub_industry"]):
+            if sector >= 0:
+                subs = out.setdefault(self.group_names["sector"][sector], set())
+                if sub >= 0:
+                    subs.add(self.group_names["sub_industry"][sub])
+        return {name: sorted(subs) for name, subs in sorted(out.items())}
+
+    def _order(self, model: str, sector: Optional[str], sub_industry: Optional[str]) -> np.ndarray:
+        if model not in self.models:
+            raise ValueError(f"Unsupported model '{model}'")
+        empty = np.empty(0, dtype=np.int64)
+        if sub_industry is not None:
+            code = self._codes["sub_industry"].get(sub_industry.lower())
+            order = self._orders.get((model, "sub_industry", code), empty)
+            if sector is not None:
+                sector_code = self._codes["sector"].get(sector.lower(), -2)
+                order = order[self.groups["sector"][order] == sector_code]
+            return order
+        if sector is not None:
+            return self._orders.get((model, "sector", self._codes["sector"].get(sector.lower())), empty)
+        return self._orders[(model, None, None)]
+
+    def top(self, direction: str, limit: int, model: str = ENSEMBLE, sector: Optional[str] = None,
+            sub_industry: Optional[str] = None) -> List[dict]:
+        """`direction` is "top_gainers" (largest change first) or "top_losers"."""
+        order = self._order(model, sector, sub_industry)
+        rows = order[::-1][:limit] if direction == "top_gainers" else order[:limit]
+        j = self.models.index(model)
+        return [{
+            "ticker": self.tickers[i],
+            "current_price": float(self.current[i]),
+            "predicted_price": float(self.predicted[i, j]),
+            "percent_change": float(self.change[i, j]),
+            "sector": self._group_name("sector", i),
+            "sub_industry": self._group_name("sub_industry", i),
+        } for i in rows.tolist()]
+
+    def _group_name(self, field: str, row: int) -> Optional[str]:
+        code = self.groups[field][row]
+        return self.group_names[field][code] if code >= 0 else None
+
+
+class RankingCache(ExploreCache):
+    """
+    ExploreCache over the ranking index: same background revalidation, with
+    bodies cached per (direction, limit, model, sector, sub-industry).
+    """
+
+    def __init__(self, fetch, interval: int = EXPLORE_REFRESH_SECONDS, max_bodies: int = RANKING_BODY_CACHE_SIZE):
+        super().__init__(fetch, interval, name="ranking")
+        self.data: Optional[RankingIndex] = None
+        self.max_bodies = max_bodies
+        self._bodies = OrderedDict()
+        self._body_lock = threading.Lock()
+
+    def _reset_bodies(self) -> None:
+        self._bodies = OrderedDict()
+
+    def query(self, direction: str, limit: int, model: Optional[str] = None, sector: Optional[str] = None,
+              sub_industry: Optional[str] = None) -> Tuple[bytes, str]:
+        """JSON bytes and ETag of a ranking query. Raises ValueError for an unknown model."""
+        self.ensure_loaded()
+        key = (direction, limit, (model or ENSEMBLE).lower(), sector, sub_industry)
+        with self._body_lock:
+            cached = self._bodies.get(key)
+            if cached is not None:
+                self._bodies.move_to_end(key)
+        cache_event(self.name, "hit" if cached is not None else "miss")
+        if cached is None:
+            body = json.dumps(self.data.top(direction, limit, key[2], sector, sub_industry)).encode()
+            cached = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+            with self._body_lock:
+                self._bodies[key] = cached
+                while len(self._bodies) > self.max_bodies:
+                    self._bodies.popitem(last=False)
+        return cached
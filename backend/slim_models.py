@@ -0,0 +1,353 @@
+import os
+import sys
+import json
+import struct
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Compact inference-only artifacts for the Prophet, ARIMA and XGBoost models.
+#
+# The training pickles carry everything the libraries keep around (Prophet's full
+# training history, ARIMA's data and fit internals); serving only needs the fitted
+# parameters. A .slim file is:
+#
+#   MAGIC | u64 header length | JSON header | arrays, each 64-byte aligned
+#
+# where the header is {"family", "meta", "arrays": {name: {dtype, shape, offset}}}.
+# Arrays are memory-mapped on load, so opening an artifact costs one header read.
+#
+#   prophet  trend (k, m, changepoints, deltas) + Fourier seasonality coefficients
+#   arima    state space system (Z, T, c, d) + predicted state after the last bar
+#   xgboost  the booster serialized as UBJ
+#
+# LSTMs already ship as .npz weight bundles (lstm_numpy.py).
+
+MAGIC = b"SHRUBBM1"
+SLIM_EXTENSION = ".slim"
+_ALIGN = 64
+# Parity required between the source model and its slim copy at conversion time
+_RTOL = 1e-6
+
+
+# === Container ===
+
+def write_artifact(path: str, family: str, meta: dict, arrays: Dict[str, np.ndarray]) -> str:
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    entries, offset = {}, 0
+    for name, a in arrays.items():
+        entries[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset += -(-a.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({"family": family, "meta": meta, "arrays": entries}).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, a in arrays.items():
+            f.seek(data_start + entries[name]["offset"])
+            f.write(a.tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def read_artifact(path: str) -> Tuple[str, dict, Dict[str, np.ndarray]]:
+    """Return (family, meta, arrays) with every array memory-mapped read-only."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a slim model artifact: {path}")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    data_start = -(-(len(MAGIC) + 8 + length) // _ALIGN) * _ALIGN
+    arrays = {}
+    for name, e in header["arrays"].items():
+        shape = tuple(e["shape"])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=e["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=e["dtype"], mode="r", offset=data_start + e["offset"], shape=shape)
+    return header["family"], header["meta"], arrays
+
+
+# === Prophet ===
+
+class SlimProphet:
+    """
+    Point forecasts (yhat) of a fitted Prophet model with linear or flat growth,
+    additive/multiplicative seasonalities and no holidays or extra regressors,
+    plus sampled uncertainty intervals on request. Mirrors the subset of Prophet's API used by model_loader.predict_horizons.
+    """
+
+    family = "prophet"
+
+    def __init__(self, meta: dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.arrays = arrays
+        self.last_ds = pd.Timestamp(meta["last_ds"])
+        # Only the last training date is kept; it anchors the future dataframe.
+        self.history = pd.DataFrame({"ds": [self.last_ds]})
+
+    @classmethod
+    def from_model(cls, m) -> "SlimProphet":
+        if m.growth not in ("linear", "flat"):
+            raise ValueError(f"Unsupported Prophet growth: {m.growth}")
+        if m.holidays is not None or m.country_holidays or m.extra_regressors:
+            raise ValueError("Prophet models with holidays or extra regressors are not supported")
+        if any(s["condition_name"] for s in m.seasonalities.values()):
+            raise ValueError("Conditional seasonalities are not supported")
+
+        period, harmonic, is_sin, multiplicative = [], [], [], []
+        for props in m.seasonalities.values():
+            for i in range(props["fourier_order"]):
+                for sin in (True, False):
+                    period.append(props["period"])
+                    harmonic.append(i + 1)
+                    is_sin.append(sin)
+                    multiplicative.append(props["mode"] == "multiplicative")
+
+        floor = 0.0 if getattr(m, "scaling", "absmax") == "absmax" else float(m.y_min)
+        meta = {
+            "growth": m.growth,
+            "start_ns": int(pd.Timestamp(m.start).value),
+            "t_scale_ns": float(pd.Timedelta(m.t_scale).value),
+            "y_scale": float(m.y_scale),
+            "floor": floor,
+            "k": float(np.nanmean(m.params["k"])),
+            "m": float(np.nanmean(m.params["m"])),
+            "sigma_obs": float(np.nanmean(m.params["sigma_obs"])),
+            "interval_width": float(m.interval_width),
+            "last_ds": str(m.history["ds"].max()),
+        }
+        changepoints_t = np.asarray(m.changepoints_t if m.changepoints_t is not None else [], dtype=np.float64)
+        arrays = {
+            "changepoints_t": changepoints_t,
+            "deltas": np.nanmean(m.params["delta"], axis=0).astype(np.float64).reshape(-1)[: len(changepoints_t)],
+            "beta": np.nanmean(m.params["beta"], axis=0).astype(np.float64).reshape(-1),
+            "season_period": np.asarray(period, dtype=np.float64),
+            "season_harmonic": np.asarray(harmonic, dtype=np.float64),
+            "season_is_sin": np.asarray(is_sin, dtype=bool),
+            "season_multiplicative": np.asarray(multiplicative, dtype=bool),
+        }
+        return cls(meta, arrays)
+
+    def make_future_dataframe(self, periods: int, freq: str = "D", include_history: bool = True) -> pd.DataFrame:
+        dates = pd.date_range(start=self.last_ds, periods=periods + 1, freq=freq)
+        dates = dates[dates > self.last_ds][:periods]
+        if include_history:
+            dates = dates.insert(0, self.last_ds)
+        return pd.DataFrame({"ds": dates})
+
+    def _t(self, ds) -> Tuple[np.ndarray, np.ndarray]:
+        ns = pd.DatetimeIndex(ds).as_unit("ns").asi8.astype(np.float64)
+        return ns, (ns - self.meta["start_ns"]) / self.meta["t_scale_ns"]
+
+    def _trend(self, t: np.ndarray) -> np.ndarray:
+        # In Prophet's scaled units; multiply by y_scale and add the floor for prices
+        meta = self.meta
+        if meta["growth"] != "linear":
+            return np.full_like(t, meta["m"])
+        cp = np.asarray(self.arrays["changepoints_t"])
+        deltas_t = (cp[None, :] <= t[:, None]) * np.asarray(self.arrays["deltas"])
+        return (deltas_t.sum(axis=1) + meta["k"]) * t + (deltas_t * -cp).sum(axis=1) + meta["m"]
+
+    def _seasonality(self, ns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(additive terms in price units, multiplicative terms)."""
+        a = self.arrays
+        if not len(a["beta"]):
+            return np.zeros_like(ns), np.zeros_like(ns)
+        days = ns / 1e9 / 86400
+        arg = 2 * np.pi * days[:, None] * np.asarray(a["season_harmonic"]) / np.asarray(a["season_period"])
+        X = np.where(np.asarray(a["season_is_sin"]), np.sin(arg), np.cos(arg))
+        beta = np.asarray(a["beta"])
+        mult = np.asarray(a["season_multiplicative"])
+        return X[:, ~mult] @ beta[~mult] * self.meta["y_scale"], X[:, mult] @ beta[mult]
+
+    def predict_yhat(self, ds) -> np.ndarray:
+        """yhat at the dates `ds` only; nothing else is evaluated."""
+        ns, t = self._t(ds)
+        trend = self._trend(t) * self.meta["y_scale"] + self.meta["floor"]
+        additive, multiplicative = self._seasonality(ns)
+        return trend * (1 + multiplicative) + additive
+
+    def predict_interval(self, ds, interval_width: Optional[float] = None, samples: int = 1000,
+                         seed: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (yhat_lower, yhat_upper) at the dates `ds`, sampled like Prophet's
+        `sample_predictive_trend`: new changepoints after the history arrive as a
+        Poisson process at the fitted changepoint rate with Laplace rate changes,
+        plus observation noise. All samples are drawn at once.
+        """
+        meta = self.meta
+        if "sigma_obs" not in meta:
+            raise ValueError("This Prophet artifact has no noise estimate; convert the model again for intervals")
+        width = meta.get("interval_width", 0.8) if interval_width is None else interval_width
+        rng = np.random.default_rng(seed)
+        ns, t = self._t(ds)
+        trend = np.tile(self._trend(t), (samples, 1))
+
+        cp = np.asarray(self.arrays["changepoints_t"])
+        T = float(t.max()) if len(t) else 0.0
+        if meta["growth"] == "linear" and T > 1 and len(cp):
+            counts = rng.poisson(len(cp) * (T - 1), samples)
+            n = int(counts.max())
+            if n:
+                at = 1 + rng.random((samples, n)) * (T - 1)
+                scale = np.mean(np.abs(np.asarray(self.arrays["deltas"]))) + 1e-8
+                deltas = rng.laplace(0, scale, (samples, n)) * (np.arange(n) < counts[:, None])
+                # Each rate change shifts the trend by delta * (t - changepoint) from its changepoint on
+                trend += np.einsum("sc,sct->st", deltas, np.clip(t[None, None, :] - at[:, :, None], 0, None))
+
+        additive, multiplicative = self._seasonality(ns)
+        noise = rng.normal(0, meta["sigma_obs"], (samples, len(t))) * meta["y_scale"]
+        yhat = (trend * meta["y_scale"] + meta["floor"]) * (1 + multiplicative) + additive + noise
+        return (np.percentile(yhat, 100 * (1 - width) / 2, axis=0),
+                np.percentile(yhat, 100 * (1 + width) / 2, axis=0))
+
+    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        ds = pd.to_datetime(df["ds"]).reset_index(drop=True)
+        return pd.DataFrame({"ds": ds, "yhat": self.predict_yhat(ds)})
+
+    def check(self, m) -> None:
+        ds = pd.concat([m.history["ds"].tail(5), m.make_future_dataframe(periods=30, include_history=False)["ds"]])
+        expected = m.predict(pd.DataFrame({"ds": ds}))["yhat"].to_numpy()
+        np.testing.assert_allclose(self.predict_yhat(ds), expected, rtol=_RTOL)
+
+
+# === ARIMA ===
+
+class SlimARIMA:
+    """
+    Mean forecasts of a fitted statsmodels ARIMA/SARIMAX results object, from its
+    time-invariant state space system and the predicted state after the last bar.
+    """
+
+    family = "arima"
+
+    def __init__(self, meta: dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.arrays = arrays
+
+    @classmethod
+    def from_model(cls, results) -> "SlimARIMA":
+        ssm = results.filter_results
+        if getattr(results.model, "k_exog", 0):
+            raise ValueError("ARIMA models with exogenous regressors are not supported")
+        for name in ("design", "transition", "state_intercept", "obs_intercept"):
+            if getattr(ssm, name).shape[-1] != 1:
+                raise ValueError(f"Time-varying {name} is not supported")
+        arrays = {
+            "Z": ssm.design[0, :, 0].astype(np.float64),
+            "T": ssm.transition[:, :, 0].astype(np.float64),
+            "c": ssm.state_intercept[:, 0].astype(np.float64),
+            "d": np.asarray(ssm.obs_intercept[0, 0], dtype=np.float64).reshape(1),
+            "state": ssm.predicted_state[:, -1].astype(np.float64),
+        }
+        return cls({"nobs": int(results.nobs)}, arrays)
+
+    def forecast(self, steps: int = 1) -> pd.Series:
+        a = self.arrays
+        Z, T, c = np.asarray(a["Z"]), np.asarray(a["T"]), np.asarray(a["c"])
+        state = np.array(a["state"])
+        out = np.empty(steps)
+        for h in range(steps):
+            out[h] = Z @ state + a["d"][0]
+            state = c + T @ state
+        start = self.meta["nobs"]
+        return pd.Series(out, index=pd.RangeIndex(start, start + steps), name="predicted_mean")
+
+    def check(self, results) -> None:
+        expected = np.asarray(results.forecast(steps=30))
+        np.testing.assert_allclose(self.forecast(30).to_numpy(), expected, rtol=_RTOL)
+
+
+# === XGBoost ===
+
+class SlimXGBoost:
+    """A bare xgboost Booster loaded from UBJ, with XGBRegressor's predict(X)."""
+
+    family = "xgboost"
+
+    def __init__(self, meta: dict, arrays: Dict[str, np.ndarray]):
+        import xgboost as xgb
+
+        self.meta = meta
+        self.arrays = arrays
+        self.booster = xgb.Booster()
+        self.booster.load_model(bytearray(arrays["booster"]))
+
+    @classmethod
+    def from_model(cls, model) -> "SlimXGBoost":
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        raw = np.frombuffer(bytes(booster.save_raw(raw_format="ubj")), dtype=np.uint8)
+        return cls({"n_features": booster.num_features()}, {"booster": raw})
+
+    def predict(self, X) -> np.ndarray:
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float64))
+
+    def check(self, model) -> None:
+        X = np.linspace(1e9, 2e9, 50).reshape(-1, 1)
+        np.testing.assert_allclose(self.predict(X), model.predict(X), rtol=_RTOL)
+
+
+SLIM_CLASSES = {cls.family: cls for cls in (SlimProphet, SlimARIMA, SlimXGBoost)}
+
+
+# === Conversion ===
+
+def model_family(model) -> str:
+    name = type(model).__name__
+    if name == "Prophet":
+        return "prophet"
+    if "ARIMA" in name or "SARIMAX" in name:
+        return "arima"
+    if name.startswith("XGB") or name == "Booster":
+        return "xgboost"
+    raise ValueError(f"No slim format for {name}")
+
+
+def save_slim_model(model, path: str) -> str:
+    """
+    Write the slim artifact for a fitted model after checking that it forecasts
+    the same as the model itself.
+    """
+    family = model_family(model)
+    slim = SLIM_CLASSES[family].from_model(model)
+    slim.check(model)
+    return write_artifact(path, family, slim.meta, slim.arrays)
+
+
+def load_slim_model(path: str):
+    """Return (model, estimated in-memory bytes)."""
+    family, meta, arrays = read_artifact(path)
+    model = SLIM_CLASSES[family](meta, arrays)
+    nbytes = sum(a.nbytes for a in arrays.values())
+    # A loaded booster takes a few times its serialized size
+    return model, nbytes * (4 if family == "xgboost" else 1) + 1024
+
+
+def convert_pickle(src: str, dst: Optional[str] = None) -> str:
+    import joblib
+
+    dst = dst or os.path.splitext(src)[0] + SLIM_EXTENSION
+    return save_slim_model(joblib.load(src), dst)
+
+
+if __name__ == "__main__":
+    # Usage: python slim_models.py <models dir or .pkl files>
+    # Writes a .slim next to every Prophet/ARIMA/XGBoost pickle.
+    paths = []
+    for arg in sys.argv[1:] or [os.path.join(os.path.dirname(__file__), "..", "ml", "models")]:
+        if os.path.isdir(arg):
+            for root, _, files in os.walk(arg):
+                if os.path.basename(root) in SLIM_CLASSES:
+                    paths += [os.path.join(root, f) for f in files if f.endswith(".pkl")]
+        else:
+            paths.append(arg)
+    for src in sorted(paths):
+        try:
+            dst = convert_pickle(src)
+            print(f"✅ {src} ({os.path.getsize(src):,} B) -> {dst} ({os.path.getsize(dst):,} B)")
+        except Exception as e:
+            print(f"❌ Failed to convert {src}: {e}")
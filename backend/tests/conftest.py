@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture
+def make_lstm():
+    """Build a small untrained model with the same layout as ml/train_model.train_lstm."""
+
+    def build(units=8, window=10, seed=0):
+        tf = pytest.importorskip("tensorflow")
+        tf.keras.utils.set_random_seed(seed)
+        model = tf.keras.Sequential([
+            tf.keras.Input(shape=(window, 1)),
+            tf.keras.layers.LSTM(units, activation="relu"),
+            tf.keras.layers.Dense(1),
+        ])
+        return model
+
+    return build
@@ -0,0 +1,39 @@
+from benchmarks.bench_suite import SyntheticSource, compare, latency_summary, over_budget, synthetic_ohlc
+from price_store import PriceStore
+
+
+def test_synthetic_bars_feed_the_price_store(tmp_path):
+    bars = synthetic_ohlc(300, seed=1)
+    assert (bars["High"] >= bars[["Open", "Close"]].max(axis=1)).all()
+    assert (bars["Low"] <= bars[["Open", "Close"]].min(axis=1)).all()
+
+    store = PriceStore(str(tmp_path), source=SyntheticSource({"AAA": bars}))
+    assert store.update("AAA", force=True) == 300
+    assert store.last_close("AAA", refresh=False) == bars["Close"].iloc[-1]
+
+
+def test_summary_and_comparison_against_a_baseline():
+    summary = latency_summary([0.01] * 99 + [1.0])
+    assert summary["n"] == 100 and summary["p50_ms"] == 10.0 and summary["p99_ms"] > 10.0
+    assert latency_summary([0.5, 0.5], items=10)["throughput_per_s"] == 10.0
+    assert latency_summary([0.5], items=0)["throughput_per_s"] is None
+
+    def run(p50, throughput, rss):
+        return {"scenarios": {"predict": {"peak_rss_mb": rss, "results": {
+            "prophet": {"p50_ms": p50, "p99_ms": p50, "throughput_per_s": throughput}}}}}
+
+    rows = {r["metric"]: r for r in compare(run(10.0, 100.0, 200.0), run(20.0, 50.0, 210.0), tolerance=0.25)}
+    assert rows["predict/prophet/p50_ms"]["regressed"] and rows["predict/prophet/p50_ms"]["change"] == 1.0
+    assert rows["predict/prophet/throughput_per_s"]["regressed"]
+    assert not rows["predict/peak_rss_mb"]["regressed"]
+    assert not any(r["regressed"] for r in compare(run(10.0, 100.0, 200.0), run(8.0, 150.0, 200.0)))
+
+
+def test_cold_start_budgets():
+    def run(main_ms):
+        return {"scenarios": {"cold_start": {"results": {
+            "import_main": {"p50_ms": main_ms}, "import_data": {"p50_ms": 10.0}}}}}
+
+    assert over_budget(run(100.0)) == []
+    assert over_budget(run(900.0)) == ["main: 900.0 ms > 400 ms"]
+    assert over_budget({"scenarios": {}}) == []
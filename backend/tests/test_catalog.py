@@ -0,0 +1,138 @@
+import io
+import json
+
+import model_loader
+from catalog import ModelCatalog, scan_local_catalog
+
+CATALOG = {
+    "version": 1,
+    "models": {
+        "arima": {
+            "AAA": {"artifacts": {".slim": {"key": "models/arima/AAA.slim"}, ".pkl": {"key": "models/arima/AAA.pkl"}},
+                    "accuracy": 0.912345, "trained_at": "2024-06-28T22:00:00", "last_ds": "2024-06-28"},
+            "BBB": {"artifacts": {".pkl": {"key": "models/arima/BBB.pkl"}}, "accuracy": None},
+        },
+    },
+}
+
+
+class Fetcher:
+    def __init__(self):
+        self.calls = []
+        self.catalog, self.etag = CATALOG, "v1"
+
+    def __call__(self, etag):
+        self.calls.append(etag)
+        if etag == self.etag:
+            return None, etag
+        return self.catalog, self.etag
+
+
+def test_lookups_are_served_from_memory():
+    fetch = Fetcher()
+    catalog = ModelCatalog(fetch)
+
+    assert catalog.accuracy("aaa", "arima") == 0.9123
+    assert catalog.accuracy("BBB", "arima") is None
+    assert catalog.accuracy("ZZZ", "arima") is None
+    assert catalog.tickers("arima", ".pkl") == ["AAA", "BBB"]
+    assert catalog.tickers("arima", ".slim") == ["AAA"]
+    assert catalog.has("AAA", "arima", ".slim") and not catalog.has("BBB", "arima", ".slim")
+    assert fetch.calls == [None]  # loaded once
+
+
+def test_refresh_rebuilds_only_when_etag_changes():
+    fetch = Fetcher()
+    catalog = ModelCatalog(fetch)
+    assert catalog.refresh()
+    assert not catalog.refresh()
+    assert fetch.calls == [None, "v1"]
+
+    fetch.catalog = {"models": {"arima": {"CCC": {"artifacts": {".slim": {}}, "accuracy": 0.5}}}}
+    fetch.etag = "v2"
+    assert catalog.refresh()
+    assert catalog.tickers("arima", ".slim") == ["CCC"]
+    assert catalog.etag == "v2"
+
+
+def test_failed_fetch_keeps_serving_the_last_catalog():
+    fetch = Fetcher()
+    catalog = ModelCatalog(fetch)
+    catalog.refresh()
+
+    def broken(etag):
+        raise IOError("S3 down")
+
+    catalog.fetch = broken
+    assert not catalog.refresh()
+    assert catalog.accuracy("AAA", "arima") == 0.9123
+
+
+def test_local_models_directory(monkeypatch, tmp_path):
+    (tmp_path / "xgboost").mkdir()
+    (tmp_path / "xgboost" / "AAA.slim").write_bytes(b"x" * 10)
+    (tmp_path / "xgboost" / "AAA.pkl").write_bytes(b"x")
+    (tmp_path / "xgboost" / "accuracy.json").write_text(json.dumps({"AAA": 0.8}))
+
+    scanned = scan_local_catalog(str(tmp_path))
+    assert scanned["models"]["xgboost"]["AAA"]["artifacts"][".slim"]["size"] == 10
+
+    monkeypatch.setattr(model_loader, "catalog", ModelCatalog(lambda etag: (scanned, None)))
+    assert model_loader.get_accuracy_for_ticker("aaa", "xgboost") == 0.8
+    assert model_loader.list_available_tickers("xgboost") == ["AAA"]
+
+
+class MissingKey(Exception):
+    response = {"Error": {"Code": "NoSuchKey"}}
+
+
+class Bucket:
+    """S3 bucket with the model files published but no catalog.json."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.gets = []
+
+    def get_paginator(self, name):
+        bucket = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                keys = sorted(k for k in bucket.objects if k.startswith(Prefix))
+                yield {"Contents": [{"Key": k, "Size": len(bucket.objects[k])} for k in keys[:2]]}
+                yield {"Contents": [{"Key": k, "Size": len(bucket.objects[k])} for k in keys[2:]]}
+
+        return Paginator()
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.gets.append(Key)
+        if Key not in self.objects:
+            raise MissingKey(Key)
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": '"e1"'}
+
+
+def test_missing_catalog_is_built_from_the_model_files_once(monkeypatch):
+    bucket = Bucket({
+        "models/prophet/AAA.slim": b"x" * 7,
+        "models/prophet/BBB.slim": b"x",
+        "models/prophet/accuracy.json": json.dumps({"AAA": 0.876543}).encode(),
+        "models/prophet/training_state.json": json.dumps({"AAA": {"last_ds": "2024-06-28"}}).encode(),
+        "models/request_counts.json": b"{}",
+    })
+    monkeypatch.setattr(model_loader, "get_s3", lambda: bucket)
+    monkeypatch.setattr(model_loader, "USE_LOCAL", False)
+    catalog = ModelCatalog(model_loader._fetch_catalog)
+    monkeypatch.setattr(model_loader, "catalog", catalog)
+
+    assert model_loader.get_accuracy_for_ticker("AAA", "prophet") == 0.8765
+    assert model_loader.list_available_tickers("prophet") == ["AAA", "BBB"]
+    assert catalog.entry("AAA", "prophet")["last_ds"] == "2024-06-28"
+    assert catalog.entry("AAA", "prophet")["artifacts"][".slim"]["size"] == 7
+
+    # Still missing: nothing is rebuilt. Once the unpacker publishes it, the real one is loaded.
+    bucket.gets.clear()
+    assert not catalog.refresh()
+    assert bucket.gets == [model_loader.CATALOG_KEY]
+    bucket.objects[model_loader.CATALOG_KEY] = json.dumps(CATALOG).encode()
+    assert catalog.refresh()
+    assert model_loader.get_accuracy_for_ticker("AAA", "arima") == 0.9123
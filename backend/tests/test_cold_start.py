@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must stay out of a freshly booted worker until a model family is first used.
+# Import-time budgets are tracked by the cold_start benchmark scenario instead.
+DEFERRED_MODULES = ["tensorflow", "prophet", "statsmodels", "xgboost", "sklearn", "boto3", "yfinance", "joblib"]
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+                          cwd=BACKEND_DIR)
+
+
+def test_heavy_dependencies_are_deferred():
+    out = _run(f"import sys, main; print([m for m in {DEFERRED_MODULES!r} if m in sys.modules])")
+    assert out.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,72 @@
+import json
+
+import constituents
+from constituents import ConstituentRegistry, SNAPSHOT_PATH
+
+
+def _snapshot(as_of, symbols):
+    return {
+        "version": constituents.SNAPSHOT_VERSION,
+        "as_of": as_of,
+        "source": "test",
+        "constituents": [
+            {"symbol": s, "company": s, "sector": "Energy", "sub_industry": "Oil"} for s in symbols
+        ],
+    }
+
+
+def test_loads_bundled_snapshot_offline(tmp_path):
+    reg = ConstituentRegistry(cache_path=str(tmp_path / "missing.json"))
+    assert "AAPL" in reg.tickers
+    assert reg.metadata["AAPL"]["sector"] == "Information Technology"
+    assert "BRK-B" in reg.yahoo_symbols()
+
+
+def test_bundled_snapshot_is_plausible():
+    with open(SNAPSHOT_PATH) as f:
+        snapshot = json.load(f)
+    assert constituents._plausible(snapshot)
+    assert len(snapshot["constituents"]) >= constituents.MIN_CONSTITUENTS
+    assert snapshot["as_of"] > "2000-01-01"
+    symbols = [r["symbol"] for r in snapshot["constituents"]]
+    assert len(set(symbols)) == len(symbols)
+
+
+def test_cache_wins_and_refresh_updates_in_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(constituents, "MIN_CONSTITUENTS", 1)
+    cache = tmp_path / "cache.json"
+    cache.write_text(json.dumps(_snapshot("2001-01-01", ["XOM"])))  # older than any seed still wins
+    reg = ConstituentRegistry(cache_path=str(cache))
+    tickers, metadata = reg.tickers, reg.metadata
+    assert tickers == ["XOM"]
+
+    monkeypatch.setattr(constituents, "scrape_constituents", lambda: _snapshot("2999-01-02", ["XOM", "CVX"]))
+    assert reg.refresh()
+    assert tickers == ["XOM", "CVX"] and "CVX" in metadata
+    assert json.loads(cache.read_text())["as_of"] == "2999-01-02"
+
+
+def test_short_lists_are_not_preferred_or_persisted(tmp_path, monkeypatch):
+    monkeypatch.setattr(constituents, "MIN_CONSTITUENTS", 3)
+    cache, seed = tmp_path / "cache.json", tmp_path / "seed.json"
+    cache.write_text(json.dumps(_snapshot("2999-01-01", ["XOM"])))
+    seed.write_text(json.dumps(_snapshot("1970-01-01", ["XOM", "CVX", "COP"])))
+    reg = ConstituentRegistry(snapshot_path=str(seed), cache_path=str(cache))
+    assert reg.tickers == ["XOM", "CVX", "COP"]
+
+    monkeypatch.setattr(constituents, "scrape_constituents", lambda: _snapshot("2999-01-02", ["XOM", "CVX"]))
+    assert not reg.refresh()
+    assert reg.tickers == ["XOM", "CVX", "COP"]
+    assert json.loads(cache.read_text())["as_of"] == "2999-01-01"
+
+
+def test_failed_refresh_keeps_current_list(tmp_path, monkeypatch):
+    reg = ConstituentRegistry(snapshot_path=SNAPSHOT_PATH, cache_path=str(tmp_path / "cache.json"))
+    before = list(reg.tickers)
+
+    def offline():
+        raise OSError("no network")
+
+    monkeypatch.setattr(constituents, "scrape_constituents", offline)
+    assert not reg.refresh_if_stale()
+    assert reg.tickers == before
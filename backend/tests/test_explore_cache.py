@@ -0,0 +1,86 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+import model_loader
+from explore_cache import ExploreCache
+
+PAYLOAD = {"top_gainers": [{"ticker": f"G{i}", "percent_change": 10 - i} for i in range(5)],
+           "top_losers": [{"ticker": "L0", "percent_change": -3}]}
+
+
+class Fetcher:
+    def __init__(self, payload=PAYLOAD):
+        self.payload, self.version, self.calls = payload, "v1", []
+        self.fail = False
+
+    def __call__(self, validator):
+        self.calls.append(validator)
+        if self.fail:
+            raise IOError("S3 down")
+        if validator == self.version:
+            return None, validator
+        return self.payload, self.version
+
+
+def test_hits_reuse_serialized_bodies_without_fetching():
+    fetch = Fetcher()
+    cache = ExploreCache(fetch, interval=3600)
+
+    body, etag = cache.body("top_gainers", 2)
+    assert json.loads(body) == PAYLOAD["top_gainers"][:2]
+    assert cache.body("top_gainers", 2)[0] is body
+    assert cache.body("top_gainers", 3)[1] != etag
+    assert fetch.calls == [None]
+
+
+def test_revalidation_keeps_bodies_until_the_object_changes():
+    fetch = Fetcher()
+    cache = ExploreCache(fetch, interval=3600)
+    body, _ = cache.body("top_losers", 10)
+
+    assert not cache.refresh()
+    assert cache.body("top_losers", 10)[0] is body
+    fetch.payload, fetch.version = {"top_gainers": [], "top_losers": []}, "v2"
+    assert cache.refresh()
+    assert cache.body("top_losers", 10)[0] == b"[]"
+    assert fetch.calls == [None, "v1", "v1"]
+
+
+def test_failed_refresh_keeps_the_last_good_copy():
+    fetch = Fetcher()
+    cache = ExploreCache(fetch, interval=0)
+    cache.refresh()
+    fetch.fail = True
+    assert not cache.refresh()
+    assert cache.data == PAYLOAD
+
+    never = ExploreCache(Fetcher(), interval=3600)
+    never.fetch.fail = True
+    assert never.body("top_gainers", 10)[0] == b"[]"
+    assert set(never.data) == {"top_gainers", "top_losers"}
+
+
+def test_explore_endpoints_serve_cached_bytes_with_etags(monkeypatch, tmp_path):
+    import main
+
+    path = tmp_path / model_loader.EXPLORE_KEY
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps(PAYLOAD))
+    monkeypatch.setattr(model_loader, "USE_LOCAL", True)
+    monkeypatch.setattr(model_loader, "LOCAL_MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "explore_cache", ExploreCache(model_loader._fetch_explore, interval=0))
+    client = TestClient(main.app)
+
+    response = client.get("/explore/top-gainers?limit=3")
+    assert response.status_code == 200
+    assert [r["ticker"] for r in response.json()] == ["G0", "G1", "G2"]
+    etag = response.headers["etag"]
+    assert client.get("/explore/top-gainers?limit=3", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/explore/top-losers").json() == PAYLOAD["top_losers"]
+
+    # Unchanged mtime: nothing is re-read
+    assert model_loader._fetch_explore(main.explore_cache.validator) == (None, main.explore_cache.validator)
+    os.utime(path, ns=(1, 1))
+    assert model_loader._fetch_explore(main.explore_cache.validator)[0] == PAYLOAD
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import fundamentals as fundamentals_module
+from fundamentals import FIELDS, FundamentalsStore
+
+
+class FakeSource:
+    def __init__(self):
+        self.quote_calls, self.info_calls = [], []
+        self.price = 100.0
+
+    def quotes(self, tickers):
+        self.quote_calls.append(sorted(tickers))
+        return {t: {"price": self.price, "volume": 1000} for t in tickers if t != "BAD"}
+
+    def info(self, ticker):
+        self.info_calls.append(ticker)
+        if ticker == "BAD":
+            raise LookupError(f"No fundamentals for {ticker}")
+        return {field: f"{ticker}-{field}" for field in FIELDS}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FundamentalsStore(path=str(tmp_path / "fundamentals.json"), source=FakeSource(), stale_seconds=3600)
+
+
+def age(store, seconds, fields=FIELDS):
+    for entries in store.data.values():
+        for field in fields:
+            entries[field][1] -= seconds
+
+
+def test_misses_are_fetched_in_one_bulk_refresh(store):
+    found, errors = store.get_many(["aaa", "BBB", "BAD"])
+
+    assert store.source.quote_calls == [["AAA", "BAD", "BBB"]]
+    assert sorted(store.source.info_calls) == ["AAA", "BAD", "BBB"]
+    assert found["AAA"]["price"] == 100.0  # from the bulk quote, not info
+    assert found["AAA"]["sector"] == "AAA-sector"
+    assert list(found["BBB"]) == ["ticker"] + list(FIELDS)
+    assert list(errors) == ["BAD"]
+
+    # Fresh: answered from memory
+    store.get_many(["AAA", "BBB"])
+    assert len(store.source.quote_calls) == 1 and len(store.source.info_calls) == 3
+
+
+def test_stale_fields_are_served_while_revalidating(store, monkeypatch):
+    store.get("AAA")
+    age(store, 600, fields=["price", "volume"])  # past the 300s quote TTL
+    store.source.price = 101.0
+    started = []
+    monkeypatch.setattr(store, "_revalidate", lambda tickers: started.append(tickers))
+
+    assert store.get("AAA")["price"] == 100.0
+    assert started == [["AAA"]]
+
+    store.refresh(["AAA"])
+    assert store.source.quote_calls[-1] == ["AAA"]
+    assert store.source.info_calls == ["AAA"]  # info fields weren't due
+    assert store.get("AAA")["price"] == 101.0
+
+
+def test_expired_fields_are_refetched_inline(store):
+    store.get("AAA")
+    age(store, 7 * 24 * 3600 + 3600)
+    store.source.price = 102.0
+    assert store.get("AAA")["price"] == 102.0
+    assert store.source.info_calls == ["AAA", "AAA"]
+
+
+def test_snapshot_survives_restart(store, tmp_path):
+    store.get_many(["AAA", "BBB"])
+    restarted = FundamentalsStore(path=store.path, source=FakeSource())
+    assert restarted.get("BBB")["industry"] == "BBB-industry"
+    assert restarted.source.quote_calls == [] and restarted.source.info_calls == []
+
+
+def test_one_worker_per_host_refreshes_and_the_others_read_its_snapshot(store, monkeypatch):
+    other = FundamentalsStore(path=store.path, source=FakeSource(), stale_seconds=3600)
+    assert store.lead() and store.lead() and not other.lead()
+
+    store.get_many(["AAA"])
+    assert other.get("AAA")["sector"] == "AAA-sector" and other.source.info_calls == []
+    # Inline fetches in either worker are merged into the shared file, not overwritten
+    other.get_many(["BBB"])
+    store.refresh(["AAA"])
+    assert set(FundamentalsStore(path=store.path, source=FakeSource()).data) == {"AAA", "BBB"}
+
+    # A follower with a running schedule leaves due fields to the leader
+    monkeypatch.setattr(other, "_thread", object())
+    age(other, 600, fields=["price", "volume"])
+    other.get("AAA")
+    assert other._refreshing == set() and len(other.source.quote_calls) == 1
+
+    store._leader_file.close()  # leader exits
+    assert other.lead()
+
+
+def test_metrics_endpoint(monkeypatch, store):
+    import main
+
+    monkeypatch.setattr(main, "fundamentals", store)
+    client = TestClient(main.app)
+
+    single = client.get("/metrics?ticker=aaa")
+    assert single.status_code == 200 and single.json()["ticker"] == "AAA"
+
+    batch = client.get("/metrics?tickers=AAA,BBB,BAD").json()
+    assert [m["ticker"] for m in batch["metrics"]] == ["AAA", "BBB"]
+    assert list(batch["errors"]) == ["BAD"]
+
+    bad = client.get("/metrics?ticker=BAD")
+    assert bad.status_code == 500 and "detail" in bad.json()
+    too_many = ",".join(f"T{i}" for i in range(fundamentals_module.FUNDAMENTALS_MAX_BATCH + 1))
+    assert client.get(f"/metrics?tickers={too_many}").status_code == 400
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+
+import pandas as pd
+
+import inference
+from inference import SingleFlight
+
+
+def test_single_flight_coalesces_identical_calls():
+    flights = SingleFlight()
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return {"price": 1.0}
+
+    async def main():
+        return await asyncio.gather(*(flights.do("AAPL", compute) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert len(runs) == 1
+    assert all(r is results[0] for r in results)
+    assert (flights.calls, flights.coalesced) == (10, 9)
+
+
+def test_single_flight_shares_exceptions_and_forgets_key():
+    flights = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("no model")
+
+    async def main():
+        results = await asyncio.gather(flights.do("k", boom), flights.do("k", boom), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert await flights.do("k", lambda: asyncio.sleep(0, result="retried")) == "retried"
+
+    asyncio.run(main())
+
+
+def test_predictions_run_off_the_event_loop(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def slow_predict(ticker, model, horizons):
+        with lock:
+            calls.append((ticker, model))
+        time.sleep(0.3)
+        return {d: 100.0 + d for d in horizons}
+
+    monkeypatch.setattr(inference, "predict_horizons", slow_predict)
+    monkeypatch.setattr(inference.price_store, "last_date", lambda ticker: None)
+
+    async def main():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.ensure_future(heartbeat())
+        results = await asyncio.gather(*(inference.predict_horizons_async("aapl", "arima", [1, 7]) for _ in range(5)))
+        beat.cancel()
+        return ticks, results
+
+    ticks, results = asyncio.run(main())
+    assert calls == [("AAPL", "arima")]
+    assert results[0] == {1: 101.0, 7: 107.0}
+    assert ticks >= 10  # the loop kept running while the forecast blocked a worker thread
+
+
+def fake_batch_backend(monkeypatch, slow=()):
+    loads, lstm_calls = [], []
+
+    def load(ticker):
+        loads.append(ticker)
+        if ticker in slow:
+            time.sleep(0.3)
+        if ticker == "NODATA":
+            return pd.DataFrame()
+        return pd.DataFrame({"ds": pd.bdate_range(end="2024-06-28", periods=20), "y": 100.0})
+
+    def predict(ticker, model, horizons, df):
+        assert len(df) == 20  # the frame loaded for the batch
+        if model == "prophet" and ticker == "NOMODEL":
+            raise FileNotFoundError("no prophet model")
+        return {d: float(d) for d in horizons}
+
+    def lstm(tickers, horizons, frames):
+        lstm_calls.append(list(tickers))
+        assert set(frames) == set(tickers)
+        return {t: {d: -float(d) for d in horizons} for t in tickers if t != "NOMODEL"}
+
+    monkeypatch.setattr(inference, "prepare_yfinance_data", load)
+    monkeypatch.setattr(inference, "predict_horizons", predict)
+    monkeypatch.setattr(inference, "predict_lstm_batch", lstm)
+    monkeypatch.setattr(inference.price_store, "last_date", lambda ticker: None)
+    return loads, lstm_calls
+
+
+def collect(gen):
+    async def main():
+        return [row async for row in gen]
+    return asyncio.run(main())
+
+
+def test_predict_batch_loads_each_ticker_once_and_batches_lstm(monkeypatch):
+    loads, lstm_calls = fake_batch_backend(monkeypatch)
+    tickers = ["aaa", "BBB", "CCC", "NODATA", "NOMODEL", "AAA"]
+    rows = collect(inference.predict_batch(tickers, ["prophet", "arima", "lstm"], [7, 1], lstm_chunk=2))
+
+    assert sorted(loads) == ["AAA", "BBB", "CCC", "NODATA", "NOMODEL"]
+    assert lstm_calls == [["AAA", "BBB"], ["CCC"], ["NOMODEL"]]
+    by_pair = {(r["ticker"], r["model"]): r for r in rows}
+    assert len(rows) == len(by_pair) == 15
+    assert by_pair["AAA", "arima"]["prices"] == {1: 1.0, 7: 7.0}
+    assert by_pair["CCC", "lstm"]["prices"] == {1: -1.0, 7: -7.0}
+    assert by_pair["NODATA", "lstm"]["error"] == "No stock data available"
+    assert by_pair["NOMODEL", "prophet"]["error"] == "no prophet model"
+    assert by_pair["NOMODEL", "lstm"]["error"] == "LSTM model unavailable"
+    assert "prices" in by_pair["NOMODEL", "arima"]
+
+
+def test_predict_batch_streams_rows_as_they_complete(monkeypatch):
+    fake_batch_backend(monkeypatch, slow={"SLOW"})
+
+    async def main():
+        start, arrivals = time.perf_counter(), []
+        async for row in inference.predict_batch(["FAST", "SLOW"], ["arima"], [1], concurrency=2):
+            arrivals.append((row["ticker"], time.perf_counter() - start))
+        return arrivals
+
+    arrivals = asyncio.run(main())
+    assert arrivals[0][0] == "FAST" and arrivals[0][1] < 0.2
+    assert arrivals[1][0] == "SLOW"
+
+
+def test_predict_batch_endpoint_streams_ndjson(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    fake_batch_backend(monkeypatch)
+    monkeypatch.setattr(main, "get_accuracy_for_ticker", lambda ticker, model: 0.9)
+    client = TestClient(main.app)
+
+    response = client.post("/predict/batch", json={"tickers": ["AAA", "NODATA"], "models": ["arima", "lstm"],
+                                                   "horizons": [1, 30]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["done"] and (lines[-1]["results"], lines[-1]["errors"]) == (2, 2)
+    row = next(r for r in lines if r.get("ticker") == "AAA" and r.get("model") == "arima")
+    assert row["accuracy"] == 0.9
+    assert [p["days"] for p in row["predictions"]] == [1, 30]
+
+    assert client.post("/predict/batch", json={"tickers": ["AAA"], "models": ["nope"]}).status_code == 400
+    assert client.post("/predict/batch", json={"tickers": []}).status_code == 400
+    # Every model runs out to the longest horizon, so its length is bounded
+    assert client.post("/predict/batch", json={"tickers": ["AAA"], "horizons": [1, 366]}).status_code == 400
+    assert client.post("/predict/batch", json={"tickers": ["AAA"], "horizons": [0]}).status_code == 400
+    assert client.post("/predict/batch", json={"tickers": ["AAA"], "horizons": list(range(1, 22))}).status_code == 400
+
+
+def test_prediction_dates_count_from_the_last_bar(monkeypatch):
+    import pandas as pd
+    import main
+
+    monkeypatch.setattr(pd.Timestamp, "now", classmethod(lambda cls, tz=None: pd.Timestamp("2024-08-15 13:00")))
+    predictions = main.format_predictions({30: 11.0, 1: 10.004}, pd.Timestamp("2024-06-28"))  # a Friday close
+    assert predictions == [{"days": 1, "date": "2024-06-30", "price": 10.0},
+                           {"days": 30, "date": "2024-07-29", "price": 11.0}]
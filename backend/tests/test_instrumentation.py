@@ -0,0 +1,68 @@
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import inference
+import model_loader
+from instrumentation import Histogram, Registry, current_endpoint, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.7, 3.0):
+        h.observe(seconds, stage="load", model="arima")
+
+    lines = h.render()
+    assert 't_seconds_bucket{model="arima",stage="load",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{model="arima",stage="load",le="1"} 3' in lines
+    assert 't_seconds_bucket{model="arima",stage="load",le="+Inf"} 4' in lines
+    assert 't_seconds_count{model="arima",stage="load"} 4' in lines
+    assert h.count(stage="load", model="arima") == 4
+
+
+def test_registry_renders_metrics_and_collectors(tmp_path):
+    registry = Registry()
+    registry.counter("c_total", "test").inc(2, cache="model", event="hit")
+    registry.register_collector("extra", lambda: ["extra_gauge 7"])
+    registry.register_collector("broken", lambda: 1 / 0)
+
+    text = registry.render()
+    assert 'c_total{cache="model",event="hit"} 2' in text
+    assert "extra_gauge 7" in text
+    assert open(registry.write_textfile(str(tmp_path / "job.prom"))).read() == text
+
+
+def test_timed_labels_stages_with_the_current_endpoint():
+    h = Histogram("s", "test")
+    token = current_endpoint.set("/predict")
+    try:
+        with timed("forecast", "arima", histogram=h):
+            pass
+    finally:
+        current_endpoint.reset(token)
+    assert h.count(stage="forecast", model="arima", endpoint="/predict") == 1
+
+
+def test_internal_metrics_break_down_predict_latency(monkeypatch):
+    import main
+
+    frame = pd.DataFrame({"ds": pd.bdate_range(end="2024-06-28", periods=5), "y": 1.0})
+    monkeypatch.setattr(model_loader.price_store, "frame", lambda ticker, period: frame)
+    monkeypatch.setattr(inference.price_store, "last_date", lambda ticker: None)
+
+    def predict(ticker, model, horizons):
+        with timed("forecast", model):
+            return {d: 100.0 for d in horizons}
+
+    monkeypatch.setattr(inference, "predict_horizons", predict)
+    monkeypatch.setattr(main, "get_accuracy_for_ticker", lambda ticker, model: 0.9)
+    client = TestClient(main.app)
+
+    assert client.post("/predict", json={"ticker": "AAA", "model": "arima"}).status_code == 200
+    text = client.get("/internal/metrics").text
+
+    # Stages run on the prediction pool still carry the endpoint of the request
+    assert 'shrubb_stage_seconds_count{endpoint="/predict",model="",stage="data"}' in text
+    assert 'shrubb_stage_seconds_count{endpoint="/predict",model="arima",stage="forecast"}' in text
+    assert 'shrubb_request_seconds_count{endpoint="/predict",method="POST",status="200"}' in text
+    assert 'shrubb_model_cache_events_total{cache="model",event="hits"}' in text
+    assert 'shrubb_prediction_events_total{cache="single_flight",event="calls"}' in text
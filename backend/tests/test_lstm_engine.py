@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from lstm_engine import LSTMRolloutEngine
+
+STEPS = 30
+
+
+def _predict_loop(model, window, steps):
+    """The original one-step-at-a-time `model.predict` rollout."""
+    seq = window.reshape(1, -1, 1).astype(np.float32)
+    out = []
+    for _ in range(steps):
+        p = model.predict(seq, verbose=0)[0][0]
+        seq = np.roll(seq, -1)
+        seq[0, -1, 0] = p
+        out.append(p)
+    return np.array(out)
+
+
+def test_rollout_matches_model_predict(make_lstm):
+    model = make_lstm()
+    window = np.random.default_rng(1).uniform(0, 1, 10)
+    got = LSTMRolloutEngine([model]).rollout(window[None, :], STEPS)[0]
+    np.testing.assert_allclose(got, _predict_loop(model, window, STEPS), rtol=1e-4, atol=1e-5)
+
+
+def test_batches_windows_across_models(make_lstm):
+    models = [make_lstm(seed=s) for s in range(3)]
+    windows = np.random.default_rng(2).uniform(0, 1, (5, 10))
+    model_index = np.array([0, 1, 2, 0, 2])
+
+    engine = LSTMRolloutEngine(models)
+    got = engine.rollout(windows, STEPS, model_index=model_index)
+
+    assert got.shape == (5, STEPS)
+    assert engine.last_throughput > 0
+    for i, m in enumerate(model_index):
+        np.testing.assert_allclose(got[i], _predict_loop(models[m], windows[i], STEPS), rtol=1e-4, atol=1e-5)
+
+
+def test_rejects_mixed_activations(make_lstm):
+    tf = pytest.importorskip("tensorflow")
+    other = tf.keras.Sequential([
+        tf.keras.Input(shape=(10, 1)),
+        tf.keras.layers.LSTM(8),
+        tf.keras.layers.Dense(1),
+    ])
+    with pytest.raises(ValueError):
+        LSTMRolloutEngine([make_lstm(), other])
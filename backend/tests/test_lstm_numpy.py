@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from lstm_numpy import NumpyLSTMRollout, export_lstm_bundle, load_lstm_bundle
+
+STEPS = 30
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_exported_bundle_matches_keras(tmp_path, make_lstm):
+    models = [make_lstm(seed=s) for s in range(2)]
+    bundles = []
+    for i, model in enumerate(models):
+        keras_path = str(tmp_path / f"T{i}.keras")
+        model.save(keras_path)
+        bundles.append(load_lstm_bundle(export_lstm_bundle(keras_path)))
+
+    windows = np.random.default_rng(3).uniform(0, 1, (2, 10))
+    got = NumpyLSTMRollout(bundles).rollout(windows, STEPS)
+
+    for i, model in enumerate(models):
+        seq = windows[i].reshape(1, 10, 1).astype(np.float32)
+        expected = []
+        for _ in range(STEPS):
+            p = model.predict(seq, verbose=0)[0][0]
+            seq = np.roll(seq, -1)
+            seq[0, -1, 0] = p
+            expected.append(p)
+        np.testing.assert_allclose(got[i], expected, rtol=1e-4, atol=1e-5)
+
+
+def test_model_loader_serves_without_tensorflow():
+    env = dict(os.environ, LSTM_RUNTIME="numpy", PYTHONPATH=BACKEND_DIR)
+    code = "import sys, model_loader; print('tensorflow' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "False"
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from market_data import AdaptiveLimiter, BulkFetcher, RateLimited, close_matrix, column_frame
+from price_store import PriceStore
+
+
+def bars(ticker, start=None, days=30, end="2024-06-28"):
+    ds = pd.bdate_range(end=end, periods=days)
+    df = pd.DataFrame({"ds": ds, "y": np.arange(days, dtype=float) + len(ticker)})
+    return df if start is None else df[df["ds"] >= start]
+
+
+class FakeProvider:
+    """Multi-symbol provider stand-in: records requests, can throttle or drop symbols."""
+
+    def __init__(self, throttle=0, missing=(), broken=(), delay=0.0):
+        self.requests = []
+        self.throttle = throttle
+        self.missing, self.broken = set(missing), set(broken)
+        self.delay = delay
+        self.in_flight = self.peak = 0
+        self._lock = threading.Lock()
+
+    def download(self, symbols, start=None, period="3y"):
+        with self._lock:
+            self.requests.append(list(symbols))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            throttled = self.throttle > 0
+            self.throttle -= throttled
+        try:
+            time.sleep(self.delay)
+            if throttled:
+                raise RateLimited("429 Too Many Requests")
+            if len(symbols) > 1 and self.broken & set(symbols):
+                raise ConnectionError("chunk failed")
+            # Missing symbols only come back when requested on their own
+            return {s: bars(s, start) for s in symbols
+                    if s not in self.broken and (s not in self.missing or len(symbols) == 1)}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def fetcher(provider, **kwargs):
+    clock = FakeClock()
+    kwargs.setdefault("chunk_size", 3)
+    kwargs.setdefault("concurrency", 2)
+    return BulkFetcher(provider, jitter=False, clock=clock, sleep=clock.sleep, **kwargs), clock
+
+
+def test_chunks_requests_and_bounds_concurrency():
+    provider = FakeProvider(delay=0.02)
+    tickers = [f"T{i}" for i in range(10)]
+    bulk, _ = fetcher(provider, chunk_size=3, concurrency=2)
+    frames, errors = bulk.fetch(tickers)
+
+    assert sorted(frames) == sorted(tickers) and errors == {}
+    assert [len(r) for r in provider.requests] == [3, 3, 3, 1]
+    assert provider.peak == 2 and bulk.stats["requests"] == 4
+
+
+def test_backs_off_on_throttling_and_shrinks_concurrency():
+    provider = FakeProvider(throttle=2)
+    bulk, clock = fetcher(provider, chunk_size=5, concurrency=4, backoff=1.0, max_backoff=10.0)
+    frames, errors = bulk.fetch(["AAA", "BBB"])
+
+    assert sorted(frames) == ["AAA", "BBB"] and errors == {}
+    assert bulk.stats["throttled"] == 2 and len(provider.requests) == 3
+    assert clock.slept == [1.0, 2.0]
+    # Halved twice, then one success lets one more request back in
+    assert bulk.limiter.limit == 2
+
+
+def test_limiter_waits_out_the_cooldown():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(2, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+    limiter.release(throttled=True, cooldown=4.0)
+    limiter.acquire()
+    assert clock.slept == [4.0] and limiter.limit == 1
+
+
+def test_missing_and_failing_symbols_are_retried_alone():
+    provider = FakeProvider(missing={"BBB"}, broken={"EEE"})
+    bulk, _ = fetcher(provider, chunk_size=3, retries=1)
+    frames, errors = bulk.fetch(["AAA", "BBB", "CCC", "DDD", "EEE"])
+
+    assert sorted(frames) == ["AAA", "BBB", "CCC", "DDD"]
+    assert list(errors) == ["EEE"]
+    assert ["BBB"] in provider.requests and ["DDD"] in provider.requests and ["EEE"] in provider.requests
+    assert bulk.stats["symbol_retries"] == 3
+
+
+def test_throttled_past_retries_reports_errors():
+    provider = FakeProvider(throttle=100)
+    bulk, _ = fetcher(provider, chunk_size=1, retries=2)
+    frames, errors = bulk.fetch(["AAA"])
+    assert frames == {} and "Too Many Requests" in errors["AAA"]
+    assert len(provider.requests) == 3
+
+
+def test_close_matrix_aligns_dates():
+    a = pd.DataFrame({"ds": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"]), "y": [1.0, 2.0, 3.0]})
+    b = pd.DataFrame({"ds": pd.to_datetime(["2024-01-03", "2024-01-05"]), "y": [10.0, 20.0]})
+    matrix = close_matrix({"A": a, "B": b})
+    assert list(matrix.columns) == ["A", "B"] and len(matrix) == 4
+    assert np.isnan(matrix.loc["2024-01-02", "B"]) and matrix.loc["2024-01-05", "B"] == 20.0
+    frame = column_frame(matrix, "B")
+    assert list(frame["ds"]) == list(b["ds"]) and list(frame["y"]) == [10.0, 20.0]
+    assert column_frame(matrix, "C").empty
+
+
+def test_price_store_bulk_update_and_matrix(tmp_path):
+    provider = FakeProvider(missing={"BBB"}, broken={"ZZZ"})
+    bulk, _ = fetcher(provider, chunk_size=10)
+    store = PriceStore(str(tmp_path), fetcher=bulk, refresh_seconds=3600)
+
+    written = store.update_many(["aaa", "bbb", "zzz"])
+    assert written == {"AAA": 30, "BBB": 30}
+    requests = len(provider.requests)
+    assert store.update_many(["AAA", "BBB"]) == {}  # fresh: no requests
+    assert len(provider.requests) == requests
+
+    matrix = store.close_matrix(["AAA", "BBB", "ZZZ"], period="max", refresh=False)
+    assert list(matrix.columns) == ["AAA", "BBB"] and len(matrix) == 30
+    np.testing.assert_array_equal(matrix["AAA"].to_numpy(), bars("AAA")["y"].to_numpy())
+
+    # A forced refresh asks for the stored last bar onwards, in one batch
+    assert store.update_many(["AAA", "BBB"], force=True) == {"AAA": 1, "BBB": 1}  # last bar re-read
+    assert provider.requests[requests] == ["AAA", "BBB"]
@@ -0,0 +1,127 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from model_cache import ModelCache
+
+
+class FakeArtifacts:
+    """Per-key versions and sizes; records every load."""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.versions = {k: 1 for k in sizes}
+        self.loads = []
+
+    def load(self, key, version):
+        self.loads.append((key, version))
+        return f"{key}@v{version}", self.sizes[key]
+
+    def version(self, key):
+        return self.versions[key]
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_bounded_by_bytes_with_lru_eviction():
+    art = FakeArtifacts({"a": 40, "b": 40, "c": 40})
+    cache = ModelCache(art.load, max_bytes=100, version_fn=art.version)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # b is now least recently used
+    cache.get("c")
+
+    assert "b" not in cache and "a" in cache and "c" in cache
+    stats = cache.stats()
+    assert stats["bytes"] == 80
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+
+
+def test_lfu_keeps_frequently_used_entries():
+    art = FakeArtifacts({"a": 40, "b": 40, "c": 40})
+    cache = ModelCache(art.load, max_bytes=100, policy="lfu", version_fn=art.version)
+    for _ in range(3):
+        cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+    assert "a" in cache and "b" not in cache
+
+
+def test_oversized_entry_is_still_served():
+    art = FakeArtifacts({"big": 500})
+    cache = ModelCache(art.load, max_bytes=100, version_fn=art.version)
+    assert cache.get("big") == "big@v1"
+
+
+def test_expired_entry_reloads_in_background_on_version_change():
+    art = FakeArtifacts({"a": 10})
+    cache = ModelCache(art.load, max_bytes=100, ttl=0, version_fn=art.version)
+    assert cache.get("a") == "a@v1"
+
+    art.versions["a"] = 2
+    assert cache.get("a") == "a@v1"  # stale copy served while revalidating
+    assert _wait_for(lambda: cache.get("a") == "a@v2")
+    assert cache.stats()["reloads"] == 1
+
+
+def test_unchanged_version_is_not_reloaded():
+    art = FakeArtifacts({"a": 10})
+    cache = ModelCache(art.load, max_bytes=100, ttl=0, version_fn=art.version)
+    cache.get("a")
+    cache.get("a")
+    assert _wait_for(lambda: cache.stats()["revalidations"] >= 1)
+    assert len(art.loads) == 1
+
+
+def test_load_errors_propagate_and_are_counted():
+    def broken(key, version):
+        raise FileNotFoundError(key)
+
+    cache = ModelCache(broken, max_bytes=100)
+    with pytest.raises(FileNotFoundError):
+        cache.get("missing")
+    assert cache.stats()["load_errors"] == 1
+
+
+def test_versioned_loader_skips_the_version_check_on_a_miss():
+    art = FakeArtifacts({"a": 10})
+    checks = []
+
+    def version(key):
+        checks.append(key)
+        return art.versions[key]
+
+    def load(key, known):
+        value, nbytes = art.load(key, known)
+        return value, nbytes, art.versions[key]
+
+    cache = ModelCache(load, max_bytes=100, ttl=0, version_fn=version, versioned_loader=True)
+    assert cache.get("a") == "a@vNone" and checks == [] and art.loads == [("a", None)]
+
+    art.versions["a"] = 2
+    cache.get("a")
+    assert _wait_for(lambda: art.loads[-1] == ("a", 2)) and checks
+
+
+def test_concurrent_misses_load_once_and_leave_no_locks_behind():
+    art = FakeArtifacts({k: 1 for k in "abcdefgh"})
+    slow = art.load
+
+    def load(key, version):
+        time.sleep(0.05)
+        return slow(key, version)
+
+    cache = ModelCache(load, max_bytes=100, version_fn=art.version)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert set(pool.map(cache.get, "aaaabbbb" + "cdefgh")) == {f"{k}@v1" for k in "abcdefgh"}
+    assert sorted(k for k, _ in art.loads) == list("abcdefgh")
+    assert cache._key_locks == {}
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_workers import InferencePool, SharedPrices, attach_frame, parse_workers
+
+
+def frame(days=30, end="2024-06-28"):
+    ds = pd.bdate_range(end=end, periods=days)
+    return pd.DataFrame({"ds": ds, "y": np.arange(days, dtype=float) + 0.5})
+
+
+# Task functions run inside the worker processes (this module is their `module`)
+
+def describe(ticker, df):
+    return {"ticker": ticker, "rows": len(df), "last": float(df["y"].iloc[-1]),
+            "ds": str(df["ds"].iloc[-1].date()), "pid": os.getpid()}
+
+
+def describe_many(frames):
+    return {t: len(df) for t, df in frames.items()}
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def crash():
+    os._exit(3)
+
+
+def test_parse_workers():
+    assert parse_workers("prophet=2, arima=1,lstm") == {"prophet": 2, "arima": 1, "lstm": 1}
+
+
+def test_shared_prices_round_trip_and_reference_counting():
+    prices = SharedPrices()
+    try:
+        df = frame()
+        handle = prices.publish("AAA", df)
+        got = attach_frame(handle)
+        assert list(got["ds"]) == list(df["ds"]) and list(got["y"]) == list(df["y"])
+        assert prices.publish("AAA", df.copy()) is handle  # unchanged history: same segment, second reference
+
+        newer = prices.publish("AAA", frame(days=31, end="2024-07-01"))
+        assert newer.name != handle.name and len(attach_frame(newer)) == 31
+        prices.publish("AAA", frame(days=32, end="2024-07-02"))
+        # Replaced twice, but two tasks still hold the first segment
+        assert len(attach_frame(handle)) == 30 and prices.stats()["segments"] == 3
+        prices.release(handle)
+        assert len(attach_frame(handle)) == 30
+        prices.release(handle)
+        with pytest.raises(FileNotFoundError):
+            attach_frame(handle)
+        prices.release(newer)
+        with pytest.raises(FileNotFoundError):
+            attach_frame(newer)
+        assert prices.stats()["segments"] == 1
+    finally:
+        prices.close()
+    assert prices.stats()["segments"] == 0
+
+
+def test_pool_routes_tickers_and_recovers_from_crashes():
+    pool = InferencePool({"prophet": 2, "lstm": 1}, module="test_model_workers")
+    pool.start()
+    try:
+        tickers = [f"T{i}" for i in range(8)]
+        results = {t: pool.submit("prophet", t, "describe", t, frame()).result(timeout=60) for t in tickers}
+        assert all(r["rows"] == 30 and r["last"] == 29.5 and r["ds"] == "2024-06-28" for r in results.values())
+        # A ticker always lands on the same process; the family's two processes share the tickers
+        assert pool.submit("prophet", "T0", "describe", "T0", frame()).result(timeout=60)["pid"] == results["T0"]["pid"]
+        assert len({r["pid"] for r in results.values()}) == 2
+        assert results["T0"]["pid"] != os.getpid()
+
+        frames = {t: frame(days=10 + i) for i, t in enumerate(tickers[:3])}
+        assert pool.submit("lstm", "T0", "describe_many", frames).result(timeout=60) == {"T0": 10, "T1": 11, "T2": 12}
+
+        with pytest.raises(ValueError, match="bad input"):
+            pool.submit("prophet", "T0", "fail", "bad input").result(timeout=60)
+        with pytest.raises(ValueError):
+            pool.submit("arima", "T0", "describe", "T0", frame())
+
+        crashed = pool.submit("lstm", "T0", "crash")
+        queued_behind = pool.submit("lstm", "T0", "describe", "T0", frame())
+        # Results streaming in from another family don't delay noticing the crash
+        busy = [pool.submit("prophet", t, "describe", t, frame()) for t in tickers * 5]
+        with pytest.raises(RuntimeError, match="exited"):
+            crashed.result(timeout=60)
+        with pytest.raises(RuntimeError, match="exited"):
+            queued_behind.result(timeout=60)
+        assert all(f.result(timeout=60)["rows"] == 30 for f in busy)
+        assert pool.submit("lstm", "T0", "describe", "T0", frame()).result(timeout=60)["rows"] == 30
+        # Segments of finished tasks are released: only the current one per ticker remains
+        pool.submit("prophet", "T0", "describe", "T0", frame(days=31, end="2024-07-01")).result(timeout=60)
+        assert pool.prices.stats()["segments"] == len(tickers)
+        stats = pool.stats()
+        assert stats["restarts"] == 1 and stats["workers"] == 3 and stats["failed"] == 1 and stats["pending"] == 0
+    finally:
+        pool.stop()
+    assert pool.stats()["segments"] == 0
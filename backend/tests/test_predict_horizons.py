@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import model_loader
+
+HORIZONS = [1, 2, 7, 10, 30]
+
+
+@pytest.fixture
+def history():
+    ds = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=300)
+    y = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, len(ds)))
+    return pd.DataFrame({"ds": ds, "y": y})
+
+
+def _fit(model, df, make_lstm):
+    if model == "prophet":
+        from prophet import Prophet
+        return Prophet(daily_seasonality=True).fit(df)
+    if model == "arima":
+        from statsmodels.tsa.arima.model import ARIMA
+        return ARIMA(df["y"], order=(5, 1, 0)).fit()
+    if model == "xgboost":
+        from xgboost import XGBRegressor
+        X = (df["ds"].astype("int64") // 10**9).to_numpy().reshape(-1, 1)
+        return XGBRegressor(n_estimators=10).fit(X, df["y"])
+    from lstm_engine import extract_lstm_weights
+    return extract_lstm_weights(make_lstm())
+
+
+@pytest.mark.parametrize("model", ["prophet", "arima", "xgboost", "lstm"])
+def test_single_pass_matches_per_horizon_calls(monkeypatch, history, make_lstm, model):
+    pytest.importorskip({"prophet": "prophet", "arima": "statsmodels", "xgboost": "xgboost"}.get(model, "numpy"))
+    mdl = _fit(model, history, make_lstm)
+    monkeypatch.setattr(model_loader, "load_model", lambda ticker, model: mdl)
+    monkeypatch.setattr(model_loader, "prepare_yfinance_data", lambda ticker: history.copy())
+
+    together = model_loader.predict_horizons("TEST", model, HORIZONS)
+    separate = {d: model_loader.predict_price("TEST", model, d) for d in HORIZONS}
+
+    assert sorted(together) == HORIZONS
+    for d in HORIZONS:
+        assert together[d] == pytest.approx(separate[d], rel=1e-6)
+
+
+
+def test_prophet_horizons_count_from_the_last_bar_not_the_clock(monkeypatch, history):
+    pytest.importorskip("prophet")
+    mdl = _fit("prophet", history, None)
+    last = history["ds"].iloc[-1]
+    forecast = lambda df: model_loader._forecast(mdl, "prophet", df, HORIZONS)
+
+    first = forecast(history)
+    monkeypatch.setattr(pd.Timestamp, "now", classmethod(lambda cls, tz=None: last + pd.Timedelta(days=40)))
+    assert forecast(history) == first
+
+    assert model_loader._forecast_day(last + pd.Timedelta(days=3), last) == last + pd.Timedelta(days=4)
+    assert model_loader._forecast_day(None, last) == last + pd.Timedelta(days=1)
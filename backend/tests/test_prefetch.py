@@ -0,0 +1,177 @@
+import json
+import hashlib
+import io
+import os
+
+import pytest
+
+import model_loader
+from prefetch import RequestStats, Warmup, hot_set
+
+
+class Body(io.BytesIO):
+    def iter_chunks(self, size):
+        while True:
+            chunk = self.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class FakeS3:
+    def __init__(self, data, etag=None, length=None):
+        self.data = data
+        self.etag = etag or hashlib.md5(data).hexdigest()
+        self.length = len(data) if length is None else length
+        self.calls = 0
+
+    def get_object(self, Bucket, Key):
+        self.calls += 1
+        return {"Body": Body(self.data), "ETag": f'"{self.etag}"', "ContentLength": self.length}
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(model_loader, "S3_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_download_is_verified_and_atomic(monkeypatch, cache_dir):
+    s3 = FakeS3(b"model bytes")
+    monkeypatch.setattr(model_loader, "get_s3", lambda: s3)
+
+    path = model_loader.download_model_from_s3("aaa", "arima")
+    with open(path, "rb") as f:
+        assert f.read() == b"model bytes"
+    with open(f"{path}.etag") as f:
+        assert f.read() == s3.etag
+    # Same version: served from disk
+    assert model_loader.download_model_from_s3("AAA", "arima", etag=s3.etag) == path
+    assert s3.calls == 1
+
+
+def test_cold_cache_load_takes_the_version_from_the_get(monkeypatch, cache_dir):
+    s3 = FakeS3(b"model bytes")
+    s3.head_object = lambda Bucket, Key: pytest.fail("cold load must not HEAD")
+    monkeypatch.setattr(model_loader, "get_s3", lambda: s3)
+    monkeypatch.setattr(model_loader, "USE_LOCAL", False)
+    monkeypatch.setattr(model_loader, "_read_model", lambda path, model: (path, 10))
+
+    cache = model_loader.ModelCache(model_loader._load_model_artifact, max_bytes=100, versioned_loader=True,
+                                    version_fn=lambda key: model_loader.get_model_version(*key))
+    cache.get(("AAA", "arima"))
+    assert s3.calls == 1 and cache._entries[("AAA", "arima")].version == s3.etag
+
+
+@pytest.mark.parametrize("s3", [FakeS3(b"corrupt", etag="0" * 32), FakeS3(b"short", etag="abc-2", length=99)])
+def test_bad_download_leaves_nothing_behind(monkeypatch, cache_dir, s3):
+    monkeypatch.setattr(model_loader, "get_s3", lambda: s3)
+    with pytest.raises(IOError):
+        model_loader.download_model_from_s3("AAA", "arima")
+    assert os.listdir(cache_dir / "arima") == []
+
+
+def test_request_stats_persist_and_rank(tmp_path):
+    stats = RequestStats(str(tmp_path / "counts.json"))
+    for ticker in ["aapl", "msft", "aapl", "nvda", "aapl", "msft"]:
+        stats.record(ticker)
+    assert stats.top(2) == ["AAPL", "MSFT"]
+    stats.save()
+
+    reloaded = RequestStats(str(tmp_path / "counts.json"))
+    assert reloaded.top(3) == ["AAPL", "MSFT", "NVDA"]
+    assert hot_set(reloaded, n=1, models=["arima", "lstm"]) == [("AAPL", "arima"), ("AAPL", "lstm")]
+
+
+class MissingKey(Exception):
+    response = {"Error": {"Code": "NoSuchKey"}}
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise MissingKey(Key)
+        return {"Body": Body(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = Body
+
+
+def test_request_stats_are_shared_between_tasks(monkeypatch, tmp_path):
+    bucket = FakeBucket()
+    monkeypatch.setattr(model_loader, "get_s3", lambda: bucket)
+    monkeypatch.setattr(model_loader, "USE_LOCAL", False)
+
+    def task(name):
+        return RequestStats(str(tmp_path / name / "counts.json"), fetch=model_loader.fetch_request_counts,
+                            publish=model_loader.publish_request_counts)
+
+    first = task("a")
+    first.pull()  # nothing shared yet
+    for ticker in ["AAPL", "AAPL", "MSFT"]:
+        first.record(ticker)
+    first.save(share=True)
+    assert json.loads(bucket.objects[model_loader.REQUEST_COUNTS_KEY]) == {"AAPL": 2, "MSFT": 1}
+
+    second = task("b")
+    assert second.top(1) == []
+    second.pull()
+    assert second.top(2) == ["AAPL", "MSFT"]
+    for ticker in ["NVDA"] * 3:
+        second.record(ticker)
+    second.save(share=True)
+    # The larger count per ticker wins, so one task never erases another's
+    assert json.loads(bucket.objects[model_loader.REQUEST_COUNTS_KEY]) == {"NVDA": 3, "AAPL": 2, "MSFT": 1}
+
+
+def test_hot_set_falls_back_when_nothing_was_counted(tmp_path):
+    stats = RequestStats(str(tmp_path / "counts.json"))
+    fallback = lambda n: ["NVDA", "AAPL", "MSFT"]
+    assert hot_set(stats, n=2, models=["arima"], fallback=fallback) == [("NVDA", "arima"), ("AAPL", "arima")]
+    stats.record("TSLA")
+    assert hot_set(stats, n=2, models=["arima"], fallback=fallback) == [("TSLA", "arima")]
+
+
+def test_default_hot_tickers_start_with_the_explore_lists(monkeypatch):
+    explore = {"top_gainers": [{"ticker": "NVDA"}], "top_losers": [{"ticker": "TSLA"}, {"ticker": "AAPL"}]}
+    monkeypatch.setattr(model_loader, "load_cached_explore_data", lambda: explore)
+    monkeypatch.setattr(model_loader, "list_available_tickers", lambda model: ["AAPL", "AMZN", "MSFT"])
+    assert model_loader.default_hot_tickers(4) == ["NVDA", "TSLA", "AAPL", "AMZN"]
+
+
+def test_request_stats_are_capped(tmp_path):
+    stats = RequestStats(str(tmp_path / "counts.json"), max_tickers=2)
+    for ticker in ["AAPL", "AAPL", "MSFT", "MSFT", "NVDA", "X1", "X2"]:
+        stats.record(ticker)
+    assert len(stats.counts) <= 4 and stats.top(2) == ["AAPL", "MSFT"]
+    stats.save()
+    with open(tmp_path / "counts.json") as f:
+        assert json.load(f) == {"AAPL": 2, "MSFT": 2}
+
+
+def test_warmup_gates_readiness():
+    warmup = Warmup(timeout=60)
+    assert not warmup.ready
+
+    loaded = []
+
+    def loader(ticker, model):
+        if ticker == "BAD":
+            raise IOError("missing")
+        loaded.append((ticker, model))
+
+    warmup.run([("AAA", "arima"), ("BAD", "arima"), ("BBB", "lstm")], loader, workers=1)
+    status = warmup.status()
+    assert status["ready"] and status["state"] == "done"
+    assert (status["total"], status["loaded"], status["failed"]) == (3, 2, 1)
+    # Hottest loaded last, so it is the most recently used cache entry
+    assert loaded == [("BBB", "lstm"), ("AAA", "arima")]
+
+
+def test_stuck_warmup_times_out():
+    warmup = Warmup(timeout=0)
+    warmup.state, warmup.started_at = "running", 0.0
+    assert warmup.ready
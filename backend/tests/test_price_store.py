@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_store import PriceStore, period_start
+
+
+class FakeSource:
+    """Serves business-day closes up to `until`, recording each request."""
+
+    def __init__(self, until=None, days=800):
+        until = until or pd.Timestamp.now().normalize()
+        self.bars = pd.DataFrame({"ds": pd.bdate_range(end=until, periods=days)})
+        self.bars["y"] = np.linspace(100.0, 200.0, len(self.bars))
+        self.calls = []
+        self.fail = False
+
+    def fetch(self, ticker, start=None, period="3y"):
+        self.calls.append((ticker, start))
+        if self.fail:
+            raise ConnectionError("provider down")
+        if start is None:
+            return self.bars.copy()
+        return self.bars[self.bars["ds"] >= start].copy()
+
+    def extend(self, sessions):
+        extra = pd.DataFrame({"ds": pd.bdate_range(self.bars["ds"].iloc[-1], periods=sessions + 1)[1:]})
+        extra["y"] = self.bars["y"].iloc[-1] + np.arange(1, sessions + 1)
+        self.bars = pd.concat([self.bars, extra], ignore_index=True)
+
+
+@pytest.fixture
+def source():
+    return FakeSource()
+
+
+@pytest.fixture
+def store(tmp_path, source):
+    return PriceStore(str(tmp_path), source=source, refresh_seconds=0)
+
+
+def test_cold_fill_then_read_without_source(store, source):
+    assert store.update("aapl") == len(source.bars)
+    ds, y = store.read("AAPL")
+    assert isinstance(y, np.memmap)
+    np.testing.assert_array_equal(y, source.bars["y"].to_numpy())
+    assert pd.Timestamp(ds[-1]) == source.bars["ds"].iloc[-1]
+
+
+def test_incremental_update_fetches_only_after_last_bar(store, source):
+    store.update("AAPL")
+    last = store.last_date("AAPL")
+    source.extend(5)
+    assert store.update("AAPL") == 6  # last bar is re-read, plus 5 new sessions
+    assert source.calls[-1] == ("AAPL", last)
+    ds, y = store.read("AAPL")
+    assert len(ds) == len(source.bars)
+    assert np.all(np.diff(ds.astype(np.int64)) > 0)
+
+
+def test_last_bar_is_rewritten_in_place(store, source):
+    store.update("AAPL")
+    rows = len(store.read("AAPL")[1])
+    source.bars.loc[source.bars.index[-1], "y"] = 999.0
+    store.update("AAPL")
+    _, y = store.read("AAPL")
+    assert len(y) == rows
+    assert y[-1] == 999.0
+
+
+def test_refresh_interval_skips_source(tmp_path, source):
+    store = PriceStore(str(tmp_path), source=source, refresh_seconds=3600)
+    store.frame("AAPL")
+    store.frame("AAPL")
+    assert len(source.calls) == 1
+
+
+def test_source_failure_serves_stored_bars(store, source):
+    store.update("AAPL")
+    source.fail = True
+    df = store.frame("AAPL", "max")
+    assert len(df) == len(source.bars)
+    assert list(df.columns) == ["ds", "y"]
+
+
+def test_frame_trims_to_period(store):
+    df = store.frame("AAPL", "1y")
+    assert df["ds"].iloc[0] >= period_start("1y")
+
+
+def test_warm_read_is_fast(store):
+    store.update("AAPL")
+    store.read("AAPL")
+    start = time.perf_counter()
+    for _ in range(1000):
+        store.read("AAPL")
+    assert (time.perf_counter() - start) / 1000 < 1e-3
+
+
+def test_open_maps_are_bounded(tmp_path, source):
+    store = PriceStore(str(tmp_path), source=source, refresh_seconds=0, max_open=2)
+    for ticker in ["AAA", "BBB", "CCC"]:
+        store.update(ticker)
+    held, _ = store.read("AAA")
+    store.read("BBB")
+    store.read("AAA")
+    store.read("CCC")
+    assert list(store._views) == ["AAA", "CCC"]
+    # An evicted map stays readable for whoever still holds it
+    assert store.read("BBB")[0][-1] == held[-1] and list(store._views) == ["CCC", "BBB"]
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import model_loader
+from explore_cache import ExploreCache
+from ranking_index import RankingCache, RankingIndex, write_index
+
+MODELS = ["prophet", "arima"]
+METADATA = {
+    "AAA": {"sector": "Energy", "sub_industry": "Oil & Gas Drilling"},
+    "BBB": {"sector": "Energy", "sub_industry": "Integrated Oil & Gas"},
+    "CCC": {"sector": "Energy", "sub_industry": "Oil & Gas Drilling"},
+    "DDD": {"sector": "Utilities", "sub_industry": "Electric Utilities"},
+    "EEE": {},
+}
+# ticker -> (current price, {model: predicted price})
+FORECASTS = {
+    "AAA": (100.0, {"prophet": 110.0, "arima": 90.0}),
+    "BBB": (50.0, {"prophet": 45.0, "arima": 60.0}),
+    "CCC": (20.0, {"prophet": 19.0, "arima": None}),
+    "DDD": (10.0, {"prophet": 13.0, "arima": 11.5}),
+    "EEE": (40.0, {"prophet": 40.0, "arima": 41.0}),
+}
+
+
+def rows():
+    out = []
+    for ticker, (current, preds) in FORECASTS.items():
+        avg = float(np.mean([p for p in preds.values() if p is not None]))
+        out.append({"ticker": ticker, "current_price": current, "predicted_price": round(avg, 2),
+                    "percent_change": round((avg - current) / current * 100, 2)})
+    return out
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = tmp_path / model_loader.RANKING_KEY
+    preds = {t: p for t, (_, p) in FORECASTS.items()}
+    write_index(str(path), rows(), preds, MODELS, METADATA, "2024-06-28T00:00:00")
+    return path
+
+
+def tickers(ranked):
+    return [r["ticker"] for r in ranked]
+
+
+def test_rankings_by_model_and_group(index_path):
+    index = RankingIndex.load(str(index_path))
+
+    assert tickers(index.top("top_gainers", 10)) == ["DDD", "BBB", "EEE", "AAA", "CCC"]
+    assert tickers(index.top("top_losers", 2)) == ["CCC", "AAA"]
+    # Per model; CCC has no ARIMA forecast
+    assert tickers(index.top("top_gainers", 10, model="arima")) == ["BBB", "DDD", "EEE", "AAA"]
+    best = index.top("top_gainers", 1, model="prophet")[0]
+    assert best == {"ticker": "DDD", "current_price": 10.0, "predicted_price": 13.0, "percent_change": 30.0,
+                    "sector": "Utilities", "sub_industry": "Electric Utilities"}
+
+    assert tickers(index.top("top_losers", 10, sector="energy")) == ["CCC", "AAA", "BBB"]
+    assert tickers(index.top("top_losers", 10, model="arima", sector="Energy")) == ["AAA", "BBB"]
+    assert tickers(index.top("top_gainers", 10, sub_industry="Oil & Gas Drilling")) == ["AAA", "CCC"]
+    assert index.top("top_gainers", 10, sector="Utilities", sub_industry="Oil & Gas Drilling") == []
+    assert index.top("top_gainers", 10, sector="Materials") == []
+    assert index.top("top_gainers", 1)[0]["sector"] == "Utilities"
+    assert index.top("top_gainers", 3)[2]["sector"] is None
+    with pytest.raises(ValueError):
+        index.top("top_gainers", 10, model="lstm")
+
+    assert index.sectors() == {"Energy": ["Integrated Oil & Gas", "Oil & Gas Drilling"],
+                               "Utilities": ["Electric Utilities"]}
+
+
+def test_query_bodies_are_cached_per_query(index_path):
+    cache = RankingCache(lambda validator: (RankingIndex.load(str(index_path)), "v1"), interval=3600, max_bodies=2)
+    body, etag = cache.query("top_gainers", 3)
+    assert tickers(json.loads(body)) == ["DDD", "BBB", "EEE"]
+    assert cache.query("top_gainers", 3, model="ALL")[0] is body
+    cache.query("top_losers", 3)
+    cache.query("top_losers", 3, sector="Energy")
+    assert len(cache._bodies) == 2 and cache.query("top_gainers", 3)[0] is not body
+
+
+def test_explore_endpoints_query_the_index(monkeypatch, tmp_path, index_path):
+    import main
+
+    monkeypatch.setattr(model_loader, "USE_LOCAL", True)
+    monkeypatch.setattr(model_loader, "LOCAL_MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "ranking_cache", RankingCache(model_loader._fetch_ranking_index, interval=3600))
+    client = TestClient(main.app)
+
+    response = client.get("/explore/top-losers", params={"sector": "Energy", "model": "prophet", "limit": 2})
+    assert response.status_code == 200
+    assert tickers(response.json()) == ["BBB", "CCC"]
+    etag = response.headers["etag"]
+    again = client.get("/explore/top-losers", params={"sector": "Energy", "model": "prophet", "limit": 2},
+                       headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert len(client.get("/explore/top-gainers", params={"limit": 100}).json()) == 5
+    assert client.get("/explore/top-gainers", params={"model": "nope"}).status_code == 400
+    assert client.get("/explore/sectors").json()["Utilities"] == ["Electric Utilities"]
+
+
+def test_explore_falls_back_to_top_lists_without_an_index(monkeypatch, tmp_path):
+    import main
+
+    path = tmp_path / model_loader.EXPLORE_KEY
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps({"top_gainers": [{"ticker": "G0", "percent_change": 1.0}], "top_losers": []}))
+    monkeypatch.setattr(model_loader, "USE_LOCAL", True)
+    monkeypatch.setattr(model_loader, "LOCAL_MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "ranking_cache", RankingCache(model_loader._fetch_ranking_index, interval=3600))
+    monkeypatch.setattr(main, "explore_cache", ExploreCache(model_loader._fetch_explore, interval=3600))
+    client = TestClient(main.app)
+
+    assert tickers(client.get("/explore/top-gainers").json()) == ["G0"]
+    assert client.get("/explore/top-gainers", params={"sector": "Energy"}).status_code == 503
+    assert client.get("/explore/sectors").status_code == 503
@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model_loader
+import slim_models
+
+HORIZONS = [1, 2, 7, 10, 30]
+
+
+@pytest.fixture
+def history():
+    ds = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=300)
+    y = 100 + np.cumsum(np.random.default_rng(1).normal(0, 1, len(ds)))
+    return pd.DataFrame({"ds": ds, "y": y})
+
+
+def _fit(model, df):
+    if model == "prophet":
+        from prophet import Prophet
+        return Prophet(daily_seasonality=True).fit(df)
+    if model == "arima":
+        from statsmodels.tsa.arima.model import ARIMA
+        return ARIMA(df["y"], order=(5, 1, 0)).fit()
+    from xgboost import XGBRegressor
+    X = (df["ds"].astype("int64") // 10**9).to_numpy().reshape(-1, 1)
+    return XGBRegressor(n_estimators=20).fit(X, df["y"])
+
+
+def test_container_round_trip_is_memory_mapped(tmp_path):
+    arrays = {"a": np.arange(5, dtype=np.float64), "b": np.eye(3, dtype=np.float32),
+              "c": np.array([True, False]), "empty": np.empty(0)}
+    path = slim_models.write_artifact(str(tmp_path / "x.slim"), "test", {"k": 1}, arrays)
+
+    family, meta, loaded = slim_models.read_artifact(path)
+    assert (family, meta) == ("test", {"k": 1})
+    for name, a in arrays.items():
+        np.testing.assert_array_equal(loaded[name], a)
+        assert loaded[name].dtype == a.dtype
+    assert isinstance(loaded["a"], np.memmap)
+
+    with open(tmp_path / "bad.slim", "wb") as f:
+        f.write(b"not a model")
+    with pytest.raises(ValueError):
+        slim_models.read_artifact(str(tmp_path / "bad.slim"))
+
+
+@pytest.mark.parametrize("model", ["prophet", "arima", "xgboost"])
+def test_slim_artifact_forecasts_match_pickle(monkeypatch, tmp_path, history, model):
+    pytest.importorskip({"prophet": "prophet", "arima": "statsmodels", "xgboost": "xgboost"}[model])
+    import joblib
+
+    fitted = _fit(model, history)
+    pkl = str(tmp_path / f"{model}.pkl")
+    joblib.dump(fitted, pkl)
+    slim_path = slim_models.convert_pickle(pkl)
+    slim, nbytes = slim_models.load_slim_model(slim_path)
+
+    assert os.path.getsize(slim_path) < os.path.getsize(pkl)
+    assert nbytes > 0
+    monkeypatch.setattr(model_loader, "prepare_yfinance_data", lambda ticker: history.copy())
+
+    def predict(mdl):
+        monkeypatch.setattr(model_loader, "load_model", lambda ticker, model: mdl)
+        return model_loader.predict_horizons("TEST", model, HORIZONS)
+
+    expected, got = predict(fitted), predict(slim)
+    for d in HORIZONS:
+        assert got[d] == pytest.approx(expected[d], rel=1e-6)
+
+
+def test_unsupported_models_are_rejected():
+    with pytest.raises(ValueError):
+        slim_models.model_family(object())
+
+
+def _old_prophet_rows(mdl, today, horizons):
+    """The daily future frame predict_horizons used to evaluate, and the row each horizon read."""
+    forecast = mdl.predict(mdl.make_future_dataframe(periods=max(horizons)))
+    last = mdl.history["ds"].max()
+    out = {}
+    for d in horizons:
+        rows = forecast[forecast["ds"] <= last + pd.Timedelta(days=d)]
+        rows = rows[rows["ds"] >= today] if rows["ds"].iloc[-1] >= today else rows.tail(1)
+        out[d] = rows.iloc[min(d - 1, len(rows) - 1)]
+    return out
+
+
+@pytest.mark.parametrize("lag", [0, 3, 45])
+def test_prophet_fast_path_matches_full_predict(history, lag):
+    pytest.importorskip("prophet")
+    fitted = _fit("prophet", history)
+    today = history["ds"].max() + pd.Timedelta(days=lag)
+    expected = _old_prophet_rows(fitted, today, HORIZONS)
+
+    targets = model_loader._prophet_target_dates(fitted.history["ds"].max(), today, HORIZONS)
+    assert targets == {d: row["ds"] for d, row in expected.items()}
+    dates = pd.DatetimeIndex(list(targets.values()))
+    want = np.array([expected[d]["yhat"] for d in HORIZONS])
+    np.testing.assert_allclose(model_loader._prophet_yhat(fitted, dates), want, rtol=1e-9)
+    slim = slim_models.SlimProphet.from_model(fitted)
+    np.testing.assert_allclose(model_loader._prophet_yhat(slim, dates), want, rtol=1e-6)
+
+
+def test_prophet_intervals_match_prophet(history):
+    pytest.importorskip("prophet")
+    from prophet import Prophet
+
+    fitted = Prophet(daily_seasonality=True, uncertainty_samples=4000).fit(history)
+    np.random.seed(0)
+    forecast = fitted.predict(fitted.make_future_dataframe(periods=30, include_history=False), vectorized=False)
+    slim = slim_models.SlimProphet.from_model(fitted)
+    lower, upper = slim.predict_interval(forecast["ds"], samples=4000, seed=0)
+
+    width = (forecast["yhat_upper"] - forecast["yhat_lower"]).to_numpy()
+    assert np.all(np.abs(lower - forecast["yhat_lower"].to_numpy()) < 0.1 * width)
+    assert np.all(np.abs(upper - forecast["yhat_upper"].to_numpy()) < 0.1 * width)
+    assert np.all(lower < slim.predict_yhat(forecast["ds"])) and np.all(slim.predict_yhat(forecast["ds"]) < upper)
+
+    old = slim_models.SlimProphet({k: v for k, v in slim.meta.items() if k != "sigma_obs"}, slim.arrays)
+    with pytest.raises(ValueError):
+        old.predict_interval(forecast["ds"])
@@ -0,0 +1,310 @@
+import os
+import sys
+import time
+import json
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from prophet import Prophet
+from statsmodels.tsa.arima.model import ARIMA
+from xgboost import XGBRegressor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from lstm_numpy import LSTM_WINDOW, NumpyLSTMRollout
+from market_data import column_frame
+from train_model import (MODEL_DIR, CPUS, DATA_WORKERS, TRAIN_LSTM_WORKERS, _stan_init,
+                         _reset_peak_rss, _status_mb, fit_lstm, get_sp500_tickers, lstm_windows,
+                         prepare_yfinance_data, price_store)
+
+# Walk-forward backtesting.
+#
+# Every model is scored out of sample on expanding-window folds: fold k trains on
+# the bars before origin o_k and forecasts bars o_k .. o_k + H - 1. Origins are
+# BACKTEST_STEP bars apart and the last one leaves exactly H bars to score.
+# Refitting every family at every fold is too slow for the whole universe, so
+# each family reuses what it can:
+#
+#   arima    parameters are estimated once, on the first fold's window; a single
+#            Kalman filter pass over the series then gives the predicted state at
+#            every origin, and all folds are projected forward together.
+#   xgboost  features are computed once and sliced per fold (the model is cheap).
+#   prophet  has no state to carry forward, so every fold is a full Stan fit
+#            (warm-started from the previous fold's parameters, which saves
+#            iterations, not fits). Only the last BACKTEST_PROPHET_FOLDS origins
+#            are scored, which bounds it at that many fits per ticker.
+#   lstm     trained once on the first fold's window; the windows ending at every
+#            origin are rolled forward in one batched NumPy rollout, each scaled
+#            with the min/max seen up to its origin like the backend does.
+#
+# Errors are reported per horizon (in bars). Tasks run on the same light/LSTM
+# process pools as training; once BACKTEST_TIME_BUDGET_SECONDS is spent, tasks
+# that haven't started are cancelled and reported as "timeout", and tasks still
+# running after a further BACKTEST_GRACE_SECONDS are reported as "timeout" too
+# and their worker processes are terminated.
+
+BACKTEST_HORIZONS = [int(h) for h in os.getenv("BACKTEST_HORIZONS", "1,2,7,10,30").split(",") if h.strip()]
+BACKTEST_FOLDS = int(os.getenv("BACKTEST_FOLDS", "12"))
+BACKTEST_PROPHET_FOLDS = int(os.getenv("BACKTEST_PROPHET_FOLDS", "3"))
+BACKTEST_STEP = int(os.getenv("BACKTEST_STEP", "21"))
+BACKTEST_MIN_TRAIN = int(os.getenv("BACKTEST_MIN_TRAIN", "250"))
+BACKTEST_MODELS = [m.strip() for m in os.getenv("BACKTEST_MODELS", "prophet,arima,xgboost,lstm").split(",") if m.strip()]
+BACKTEST_LIGHT_WORKERS = int(os.getenv("BACKTEST_LIGHT_WORKERS", str(CPUS)))
+BACKTEST_LSTM_WORKERS = int(os.getenv("BACKTEST_LSTM_WORKERS", str(TRAIN_LSTM_WORKERS)))
+BACKTEST_TIME_BUDGET_SECONDS = float(os.getenv("BACKTEST_TIME_BUDGET_SECONDS", "3600"))
+BACKTEST_GRACE_SECONDS = float(os.getenv("BACKTEST_GRACE_SECONDS", "120"))
+BACKTEST_REPORT_PATH = os.path.join(MODEL_DIR, "reports", "backtest_report.json")
+
+
+def fold_origins(n: int, horizon: int, folds: int = BACKTEST_FOLDS, step: int = BACKTEST_STEP,
+                 min_train: int = BACKTEST_MIN_TRAIN) -> list:
+    """Ascending fold origins for a series of n bars; fewer than `folds` when history is short."""
+    last = n - horizon
+    return [o for o in (last - step * k for k in reversed(range(folds))) if o >= min_train]
+
+
+# === Forecasters ===
+#
+# Each returns an array of shape (len(origins), horizon): row k is the forecast
+# made at origin k, using only bars before it.
+
+def backtest_prophet(df: pd.DataFrame, origins: list, horizon: int) -> np.ndarray:
+    out, init = [], None
+    for o in origins:
+        model = Prophet(daily_seasonality=True)
+        model.fit(df.iloc[:o], **({"init": init} if init else {}))
+        init = _stan_init(model)
+        out.append(model.predict(df[["ds"]].iloc[o:o + horizon])["yhat"].to_numpy())
+    return np.array(out)
+
+
+def backtest_arima(df: pd.DataFrame, origins: list, horizon: int) -> np.ndarray:
+    y = df["y"].to_numpy(dtype=np.float64)
+    fit = ARIMA(y[:origins[0]], order=(5, 1, 0)).fit()
+    # Same parameters over the whole series; the filter is causal, so the state
+    # predicted for bar o only depends on bars before o
+    ssm = fit.apply(y).filter_results
+    Z, T = ssm.design[0, :, 0], ssm.transition[:, :, 0]
+    c, d = ssm.state_intercept[:, 0], ssm.obs_intercept[0, 0]
+    states = ssm.predicted_state[:, origins]
+    out = np.empty((len(origins), horizon))
+    for h in range(horizon):
+        out[:, h] = Z @ states + d
+        states = T @ states + c[:, None]
+    return out
+
+
+def backtest_xgboost(df: pd.DataFrame, origins: list, horizon: int) -> np.ndarray:
+    X = (df["ds"].astype("int64") // 10**9).to_numpy().reshape(-1, 1)
+    y = df["y"].to_numpy()
+    out = []
+    for o in origins:
+        # One thread per fit: the pool already runs one task per core
+        model = XGBRegressor(n_estimators=100, n_jobs=1)
+        model.fit(X[:o], y[:o])
+        out.append(model.predict(X[o:o + horizon]))
+    return np.array(out)
+
+
+def lstm_origin_windows(y: np.ndarray, origins: list, window: int = LSTM_WINDOW):
+    """Scaled windows ending just before each origin, with the (min, max) used to scale them."""
+    lo = np.minimum.accumulate(y)[np.array(origins) - 1]
+    hi = np.maximum.accumulate(y)[np.array(origins) - 1]
+    span = np.where(hi > lo, hi - lo, 1.0)
+    windows = np.stack([y[o - window:o] for o in origins])
+    return (windows - lo[:, None]) / span[:, None], lo, span
+
+
+def backtest_lstm(df: pd.DataFrame, origins: list, horizon: int) -> np.ndarray:
+    from lstm_engine import extract_lstm_weights
+
+    y = df["y"].to_numpy(dtype=np.float64)
+    train = y[:origins[0]]
+    lo, hi = train.min(), train.max()
+    model = fit_lstm(*lstm_windows((train - lo) / ((hi - lo) or 1.0), LSTM_WINDOW))
+
+    windows, lows, spans = lstm_origin_windows(y, origins)
+    engine = NumpyLSTMRollout([extract_lstm_weights(model)])
+    steps = engine.rollout(windows, horizon, model_index=np.zeros(len(origins), dtype=np.intp))
+    return steps * spans[:, None] + lows[:, None]
+
+
+FORECASTERS = {"prophet": backtest_prophet, "arima": backtest_arima,
+               "xgboost": backtest_xgboost, "lstm": backtest_lstm}
+
+
+# === Metrics ===
+
+def horizon_metrics(forecasts: np.ndarray, y: np.ndarray, origins: list, horizons: list) -> dict:
+    """
+    MAPE, MAE and directional hit rate (did the forecast call the move from the
+    last known close correctly) at each horizon, averaged over folds.
+    """
+    horizon = forecasts.shape[1]
+    actual = np.stack([y[o:o + horizon] for o in origins])
+    last = y[np.array(origins) - 1][:, None]
+    errors = np.abs(forecasts - actual)
+    ape = np.where(actual != 0, errors / np.abs(np.where(actual != 0, actual, 1)), np.nan)
+    hits = np.sign(forecasts - last) == np.sign(actual - last)
+    return {str(h): {"mape": round(float(np.nanmean(ape[:, h - 1])), 6),
+                     "mae": round(float(errors[:, h - 1].mean()), 6),
+                     "hit_rate": round(float(hits[:, h - 1].mean()), 4)} for h in horizons}
+
+
+def run_backtest_task(ticker: str, model: str, df: pd.DataFrame, horizons=None,
+                      folds: int = BACKTEST_FOLDS, step: int = BACKTEST_STEP,
+                      min_train: int = BACKTEST_MIN_TRAIN, prophet_folds: int = BACKTEST_PROPHET_FOLDS) -> dict:
+    """Backtest one (ticker, model) inside a pool worker."""
+    _reset_peak_rss()
+    start = time.perf_counter()
+    horizons = sorted(horizons or BACKTEST_HORIZONS)
+    record = {"ticker": ticker, "model": model, "status": "done", "folds": 0,
+              "metrics": None, "error": None}
+    try:
+        df = df.reset_index(drop=True)
+        origins = fold_origins(len(df), horizons[-1], folds, step, min_train)
+        if model == "prophet":
+            origins = origins[-prophet_folds:]
+        if not origins:
+            record["status"] = "skipped"
+        else:
+            forecasts = FORECASTERS[model](df, origins, horizons[-1])
+            record["folds"] = len(origins)
+            record["metrics"] = horizon_metrics(forecasts, df["y"].to_numpy(dtype=np.float64), origins, horizons)
+    except Exception as e:
+        print(f"❌ {model} backtest failed for {ticker}: {e}")
+        record.update(status="failed", error=str(e))
+    record["wall_s"] = round(time.perf_counter() - start, 3)
+    record["peak_rss_mb"] = _status_mb("VmHWM")
+    return record
+
+
+# === Runner ===
+
+def _failed(ticker, model, status, error):
+    return {"ticker": ticker, "model": model, "status": status, "folds": 0, "metrics": None,
+            "error": error, "wall_s": None, "peak_rss_mb": None}
+
+
+def run_backtest(tickers, models=None, fetch=None, light_workers: int = BACKTEST_LIGHT_WORKERS,
+                 lstm_workers: int = BACKTEST_LSTM_WORKERS,
+                 time_budget: float = BACKTEST_TIME_BUDGET_SECONDS, grace: float = BACKTEST_GRACE_SECONDS,
+                 **task_kwargs) -> list:
+    """
+    Fetch each ticker once, then backtest every model on the light and LSTM
+    process pools. Returns one record per (ticker, model).
+    """
+    models = models or BACKTEST_MODELS
+    fetch = fetch or prepare_yfinance_data
+    deadline = time.monotonic() + time_budget
+    ctx = multiprocessing.get_context("spawn")
+    pools = {"light": ProcessPoolExecutor(max_workers=max(1, light_workers), mp_context=ctx),
+             "lstm": ProcessPoolExecutor(max_workers=max(1, lstm_workers), mp_context=ctx)}
+    records, inflight, overdue = [], {}, False
+    try:
+        with ThreadPoolExecutor(max_workers=DATA_WORKERS) as fetcher:
+            for ticker, future in [(t, fetcher.submit(fetch, t)) for t in tickers]:
+                try:
+                    df = future.result()
+                except Exception as e:
+                    df, error = pd.DataFrame(), str(e)
+                else:
+                    error = "no data"
+                if df.empty:
+                    records.extend(_failed(ticker, m, "failed", error) for m in models)
+                    continue
+                for model in models:
+                    pool = pools["lstm" if model == "lstm" else "light"]
+                    inflight[pool.submit(run_backtest_task, ticker, model, df, **task_kwargs)] = (ticker, model)
+
+        grace_deadline = None
+        while inflight:
+            now = time.monotonic()
+            if grace_deadline is None and now >= deadline:
+                for future, (ticker, model) in list(inflight.items()):
+                    # Tasks already running get the grace period; the rest are dropped
+                    if future.cancel():
+                        inflight.pop(future)
+                        records.append(_failed(ticker, model, "timeout", "time budget exhausted"))
+                grace_deadline = now + grace
+            if grace_deadline is not None and now >= grace_deadline:
+                for ticker, model in inflight.values():
+                    records.append(_failed(ticker, model, "timeout", "still running after the grace period"))
+                inflight, overdue = {}, True
+                break
+            remaining = (grace_deadline if grace_deadline is not None else deadline) - now
+            done, _ = wait(list(inflight), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                ticker, model = inflight.pop(future)
+                try:
+                    records.append(future.result())
+                except Exception as e:  # worker crashed
+                    records.append(_failed(ticker, model, "failed", str(e)))
+    finally:
+        for pool in pools.values():
+            if overdue:
+                # Running tasks can't be cancelled; stop their processes so shutdown doesn't wait on them
+                for proc in list((pool._processes or {}).values()):
+                    proc.terminate()
+            pool.shutdown(wait=True, cancel_futures=True)
+    return records
+
+
+def summarize(records, elapsed_s: float) -> dict:
+    """Universe-wide metrics per model and horizon, plus timings."""
+    summary, timings = {}, {}
+    for model in sorted({r["model"] for r in records}):
+        rows = [r for r in records if r["model"] == model]
+        scored = [r for r in rows if r["status"] == "done"]
+        walls = [r["wall_s"] for r in scored]
+        timings[model] = {status: sum(1 for r in rows if r["status"] == status)
+                          for status in ("done", "skipped", "failed", "timeout")}
+        timings[model].update(wall_s=round(sum(walls), 3),
+                              mean_wall_s=round(float(np.mean(walls)), 3) if walls else None,
+                              max_wall_s=max(walls) if walls else None,
+                              peak_rss_mb=max((r["peak_rss_mb"] or 0.0) for r in rows))
+        horizons = sorted({h for r in scored for h in r["metrics"]}, key=int)
+        summary[model] = {}
+        for h in horizons:
+            mape = np.array([r["metrics"][h]["mape"] for r in scored])
+            hits = np.array([r["metrics"][h]["hit_rate"] for r in scored])
+            summary[model][h] = {"tickers": len(scored),
+                                 "mape_mean": round(float(np.nanmean(mape)), 6),
+                                 "mape_median": round(float(np.nanmedian(mape)), 6),
+                                 "hit_rate_mean": round(float(hits.mean()), 4)}
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {"horizons": BACKTEST_HORIZONS, "folds": BACKTEST_FOLDS,
+                   "prophet_folds": BACKTEST_PROPHET_FOLDS, "step": BACKTEST_STEP,
+                   "min_train": BACKTEST_MIN_TRAIN, "time_budget_s": BACKTEST_TIME_BUDGET_SECONDS,
+                   "grace_s": BACKTEST_GRACE_SECONDS},
+        "elapsed_s": round(elapsed_s, 3),
+        "summary": summary,
+        "timings": timings,
+        "tasks": records,
+    }
+
+
+def backtest_all(tickers=None):
+    # BACKTEST_TICKERS=AAPL,MSFT restricts a run to a few tickers
+    tickers = tickers or [t for t in os.getenv("BACKTEST_TICKERS", "").split(",") if t] or get_sp500_tickers()
+    print(f"📈 Backtesting {len(tickers)} tickers x {len(BACKTEST_MODELS)} models")
+    start = time.perf_counter()
+    closes = price_store.close_matrix(tickers)
+    records = run_backtest(tickers, fetch=lambda t: column_frame(closes, t.upper()))
+    report = summarize(records, time.perf_counter() - start)
+
+    os.makedirs(os.path.dirname(BACKTEST_REPORT_PATH), exist_ok=True)
+    with open(BACKTEST_REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    for model, by_horizon in report["summary"].items():
+        mapes = ", ".join(f"{h}d {m['mape_median']:.2%}" for h, m in by_horizon.items())
+        print(f"📊 {model}: median MAPE {mapes} ({report['timings'][model]['wall_s']:.0f}s)")
+    print(f"⏱️ Backtested in {report['elapsed_s']:.1f}s")
+    print(f"📝 Saved backtest report → {BACKTEST_REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    backtest_all()
@@ -1,17 +1,24 @@
-import pandas as pd
-import numpy as np
-from prophet import Prophet
-from sklearn.preprocessing import MinMaxScaler
-import xgboost as xgb
-from tensorflow import keras
-import joblib
 import os
-import boto3
+import sys
+import json
+import heapq
+import time
 import tempfile
-import yfinance as yf
-from train_model import get_sp500_tickers
+import multiprocessing
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
-import json
+from typing import Dict, Tuple
+
+import boto3
+
+# Forecasts come from the backend's model_loader so explore and /predict agree.
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from model_loader import predict_horizons, predict_lstm_batch, price_store, get_model_version, LSTM_RUNTIME
+from constituents import registry
+from market_data import column_frame
+from ranking_index import write_index
+from instrumentation import METRICS_TEXTFILE_DIR, batch_items, batch_stage_seconds, metrics, timed
 
 USE_LOCAL = os.getenv("USE_LOCAL_MODELS", "false").lower() == "true"
 if USE_LOCAL:
@@ -25,161 +32,386 @@ TOP_N = 5
 MODEL_NAMES = ["prophet", "arima", "xgboost", "lstm"]
 BUCKET = "shrubb-ai-ml-models"
 DEST_KEY = "analytics/gainers_losers.json"
-SP500_TICKERS = get_sp500_tickers()
-
-s3 = boto3.client("s3")
-
-def prepare_yfinance_data(ticker: str):
-    df = yf.download(ticker, period="1y", interval="1d")
-    df = df.reset_index()[["Date", "Close"]].rename(columns={"Date": "ds", "Close": "y"})
-    df["ds"] = pd.to_datetime(df["ds"])
-    return df
-
-
-def download_model(ticker: str, model: str) -> str:
-    ext = ".keras" if model == "lstm" else ".pkl"
-    key = f"models/{model}/{ticker}{ext}"
-    local_path = os.path.join(MODEL_DIR, model, f"{ticker}{ext}")
-
-    os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-    if not os.path.exists(local_path):
-        print(f"⬇️ Downloading model from s3://{BUCKET}/{key}")
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            s3.download_file(BUCKET, key, tmp.name)
-            os.rename(tmp.name, local_path)
-
-    return local_path
-
-
-def load_model(ticker: str, model: str):
-    path = download_model(ticker, model)
-
-    if model == "prophet":
-        return joblib.load(path)
-    elif model == "arima":
-        return joblib.load(path)
-    elif model == "xgboost":
-        return joblib.load(path)
-    elif model == "lstm":
-        return keras.models.load_model(path, compile=False)
-    else:
-        raise ValueError(f"Unsupported model {model}")
-
-
-def predict_price(ticker: str, model: str, days: int) -> float:
-    ticker = ticker.upper()
-    mdl = load_model(ticker, model)
-    df = prepare_yfinance_data(ticker)
-    today = pd.Timestamp.now().normalize()
-
-    if model == "prophet":
-        future = mdl.make_future_dataframe(periods=days)
-        forecast = mdl.predict(future)
-        future_rows = forecast[forecast["ds"] >= today]
-        target_index = min(days - 1, len(future_rows) - 1)
-        return float(future_rows.iloc[target_index]["yhat"])
-
-    elif model == "arima":
-        forecast = mdl.forecast(steps=days)
-        return float(forecast.iloc[days - 1])
-
-    elif model == "xgboost":
-        df_ts = df.copy()
-        df_ts["timestamp"] = df_ts["ds"].astype("int64") // 10**9
-        last_ts = df_ts["timestamp"].max()
-        future_ts = np.array([[last_ts + days * 86400]])
-        return float(mdl.predict(future_ts)[0])
-
-    elif model == "lstm":
-        window = 10
-        scaler = MinMaxScaler()
-        scaled = scaler.fit_transform(df[["y"]])
-        seq = scaled[-window:].reshape(1, window, 1)
-
-        for _ in range(days):
-            p = mdl.predict(seq, verbose=0)[0][0]
-            seq = np.roll(seq, -1)
-            seq[0, -1, 0] = p
-
-        return float(scaler.inverse_transform([[p]])[0][0])
-
-    else:
-        raise ValueError(f"Unsupported model {model}")
-    
-
-def get_current_price(ticker: str) -> float:
+# Every ticker's row and per-model forecasts, for the backend's ranking queries
+INDEX_KEY = "analytics/ranking_index.slim"
+STATE_KEY = "analytics/explore_state.json"
+FULL_REFRESH = os.getenv("EXPLORE_FULL_REFRESH", "false").lower() == "true"
+
+# Pipeline sizing. Price data comes from one bulk refresh (see market_data.py);
+# DATA_WORKERS only sizes the artifact version lookups. Prophet and ARIMA hold the GIL
+# so they get processes; XGBoost predicts release it, so threads are enough.
+# LSTM runs as one batched rollout (in its own process when TensorFlow is used).
+CPUS = os.cpu_count() or 1
+DATA_WORKERS = int(os.getenv("EXPLORE_DATA_WORKERS", "8"))
+FAMILY_POOLS = {
+    "prophet": ("process", int(os.getenv("EXPLORE_PROPHET_WORKERS", str(CPUS)))),
+    "arima": ("process", int(os.getenv("EXPLORE_ARIMA_WORKERS", str(CPUS)))),
+    "xgboost": ("thread", int(os.getenv("EXPLORE_XGBOOST_WORKERS", "4"))),
+}
+# Checkpoints are written locally and, outside USE_LOCAL, mirrored to S3 under
+# CHECKPOINT_PREFIX every CHECKPOINT_UPLOAD_EVERY records, since the runner's
+# disk doesn't outlive a failed job
+CHECKPOINT_DIR = os.getenv("EXPLORE_CHECKPOINT_DIR", os.path.join(
+    MODEL_DIR if USE_LOCAL else tempfile.gettempdir(), "analytics", "checkpoints"))
+CHECKPOINT_PREFIX = "analytics/checkpoints"
+CHECKPOINT_UPLOAD_EVERY = int(os.getenv("EXPLORE_CHECKPOINT_UPLOAD_EVERY", "100"))
+
+
+# === Checkpointing ===
+
+class Checkpoint:
+    """
+    Append-only JSONL record of finished (ticker, model) forecasts for one run.
+    A crashed run started again with the same run id skips everything recorded.
+    With `remote` (the default outside USE_LOCAL) the file is mirrored to S3,
+    so the rerun can resume on a different machine.
+    """
+
+    def __init__(self, run_id: str, directory: str = None, remote: bool = None):
+        directory = directory or CHECKPOINT_DIR
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"explore-{run_id}.jsonl")
+        self.key = f"{CHECKPOINT_PREFIX}/explore-{run_id}.jsonl"
+        self.remote = not USE_LOCAL if remote is None else remote
+        self._file = None
+        self._unsynced = 0
+
+    def load(self) -> Dict[Tuple[str, str], dict]:
+        if self.remote and not os.path.exists(self.path):
+            try:
+                body = boto3.client("s3").get_object(Bucket=BUCKET, Key=self.key)["Body"].read()
+                with open(self.path, "wb") as f:
+                    f.write(body)
+            except Exception:
+                pass  # no checkpoint for this run yet
+        done = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    done[(rec["ticker"], rec["model"])] = rec
+        except FileNotFoundError:
+            pass
+        return done
+
+    def record(self, ticker: str, model: str, pred=None, error: str = None) -> dict:
+        if self._file is None:
+            self._file = open(self.path, "a")
+        rec = {"ticker": ticker, "model": model, "pred": pred, "error": error}
+        self._file.write(json.dumps(rec) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= CHECKPOINT_UPLOAD_EVERY:
+            self.sync()
+        return rec
+
+    def sync(self) -> None:
+        """Upload the local file to S3 (remote checkpoints only)."""
+        if not self.remote or not self._unsynced or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                boto3.client("s3").put_object(Bucket=BUCKET, Key=self.key, Body=f.read(),
+                                              ContentType="application/x-ndjson")
+            self._unsynced = 0
+        except Exception as e:
+            print(f"⚠️ Failed to upload checkpoint: {e}")
+
+    def remove(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if self.remote:
+            try:
+                boto3.client("s3").delete_object(Bucket=BUCKET, Key=self.key)
+            except Exception as e:
+                print(f"⚠️ Failed to delete checkpoint: {e}")
+
+
+# === Incremental state ===
+#
+# The previous run's forecasts and result rows are kept in STATE_KEY (in S3 next
+# to the index, or under MODEL_DIR with USE_LOCAL) together with the
+# fingerprint of their inputs: [last bar date, artifact version, horizon].
+# A (ticker, model) forecast is only recomputed when its fingerprint changed.
+
+def _read_json(key: str):
     try:
-        data = yf.download(ticker, period="7d", interval="1d")
-        return data["Close"][ticker][-1] if not data.empty else None
-    except Exception as e:
-        print(f"⚠️ Failed to get current price for {ticker}: {e}")
+        if USE_LOCAL:
+            with open(os.path.join(MODEL_DIR, key)) as f:
+                return json.load(f)
+        body = boto3.client("s3").get_object(Bucket=BUCKET, Key=key)["Body"].read()
+        return json.loads(body)
+    except Exception:
         return None
 
 
-def compute_gainers_losers():
-    results = []
+def _write_json(key: str, payload: dict) -> str:
+    if not USE_LOCAL:
+        boto3.client("s3").put_object(
+            Bucket=BUCKET,
+            Key=key,
+            Body=json.dumps(payload),
+            ContentType="application/json"
+        )
+        return f"s3://{BUCKET}/{key}"
+    path = os.path.join(MODEL_DIR, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def load_state() -> dict:
+    state = _read_json(STATE_KEY) or {}
+    return {"forecasts": state.get("forecasts", {}), "results": state.get("results", {})}
+
+
+def fingerprint_stage(frames) -> Dict[Tuple[str, str], list]:
+    """
+    Fingerprint every (ticker, model) input. Version lookups are one HEAD request
+    each, so they share the data pool.
+    """
+    pairs = [(ticker, model) for ticker in frames for model in MODEL_NAMES]
+    with ThreadPoolExecutor(max_workers=DATA_WORKERS) as pool:
+        versions = list(pool.map(lambda pair: get_model_version(*pair), pairs))
+    return {
+        (ticker, model): [str(frames[ticker]["ds"].iloc[-1].date()), version, LOOKAHEAD_DAYS]
+        for (ticker, model), version in zip(pairs, versions)
+    }
 
-    for ticker in SP500_TICKERS:
-        try:
-            current_price = get_current_price(ticker)
-            if not current_price:
+
+def reuse_unchanged(state: dict, prints, done: Dict[Tuple[str, str], dict]) -> int:
+    """
+    Seed `done` with last run's forecasts whose fingerprint still matches.
+    Failed forecasts are never reused, so transient errors get retried, and
+    neither are ones whose model version couldn't be read.
+    """
+    reused = 0
+    for (ticker, model), fp in prints.items():
+        prev = state["forecasts"].get(ticker, {}).get(model)
+        if (ticker, model) in done or not prev or prev.get("pred") is None or fp[1] is None \
+                or prev["fingerprint"] != fp:
+            continue
+        done[(ticker, model)] = {"ticker": ticker, "model": model, "pred": prev["pred"], "error": None}
+        reused += 1
+    return reused
+
+
+def next_state(state: dict, tickers, prints, done, results: Dict[str, dict]) -> dict:
+    universe = set(tickers)
+    forecasts = {t: f for t, f in state["forecasts"].items() if t in universe}
+    for (ticker, model), fp in prints.items():
+        rec = done.get((ticker, model), {})
+        forecasts.setdefault(ticker, {})[model] = {
+            "fingerprint": fp, "pred": rec.get("pred"), "error": rec.get("error"),
+        }
+    return {"timestamp": datetime.utcnow().isoformat(), "forecasts": forecasts, "results": results}
+
+
+# === Stages ===
+
+def fetch_stage(tickers):
+    """
+    Bring every ticker's history up to date in one bulk refresh and load it as
+    one aligned close matrix. Returns (frames, current_prices).
+    """
+    closes = price_store.close_matrix(tickers)
+    frames, prices = {}, {}
+    for ticker in tickers:
+        df = column_frame(closes, ticker.upper())
+        if df.empty:
+            print(f"⚠️ No price data for {ticker}")
+            continue
+        frames[ticker] = df
+        prices[ticker] = float(df["y"].iloc[-1])
+    print(f"📥 Loaded price history for {len(frames)}/{len(tickers)} tickers")
+    return frames, prices
+
+
+def _predict_one(ticker, model, df):
+    return predict_horizons(ticker, model, [LOOKAHEAD_DAYS], df=df)[LOOKAHEAD_DAYS]
+
+
+def _lstm_stage(frames):
+    tickers = list(frames)
+    if LSTM_RUNTIME != "tensorflow":
+        return predict_lstm_batch(tickers, [LOOKAHEAD_DAYS], frames=frames)
+    # Keep TensorFlow out of the parent and the other family pools
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(predict_lstm_batch, tickers, [LOOKAHEAD_DAYS], frames).result()
+
+
+def model_stage(frames, checkpoint: Checkpoint, done: Dict[Tuple[str, str], dict]):
+    """
+    Fan each model family out over its own pool, checkpointing every result.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    pools, futures = {}, {}
+    start, finished = time.perf_counter(), {}
+    try:
+        for model, (kind, workers) in FAMILY_POOLS.items():
+            todo = [t for t in frames if (t, model) not in done]
+            if not todo:
                 continue
+            pools[model] = (ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+                            if kind == "process" else ThreadPoolExecutor(max_workers=workers))
+            for ticker in todo:
+                futures[pools[model].submit(_predict_one, ticker, model, frames[ticker])] = (ticker, model)
+
+        lstm_todo = {t: df for t, df in frames.items() if (t, "lstm") not in done}
+        if lstm_todo:
+            lstm_preds = _lstm_stage(lstm_todo)
+            for ticker in lstm_todo:
+                pred = lstm_preds.get(ticker.upper(), {}).get(LOOKAHEAD_DAYS)
+                done[(ticker, "lstm")] = checkpoint.record(
+                    ticker, "lstm", pred=pred, error=None if pred is not None else "unavailable")
+            finished["lstm"] = time.perf_counter()
+
+        for future in as_completed(futures):
+            ticker, model = futures[future]
+            try:
+                done[(ticker, model)] = checkpoint.record(ticker, model, pred=future.result())
+            except Exception as e:
+                print(f"⚠️ Model {model} failed for {ticker}: {e}")
+                done[(ticker, model)] = checkpoint.record(ticker, model, error=str(e))
+            finished[model] = time.perf_counter()
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+        checkpoint.sync()
+    # Per family: time until its last forecast came back (families overlap)
+    for model, at in finished.items():
+        batch_stage_seconds.observe(at - start, stage="models_family", model=model, endpoint="", job="explore")
+    return done
+
+
+def aggregate(prices: Dict[str, float], done: Dict[Tuple[str, str], dict]):
+    preds = {}
+    for (ticker, _), rec in done.items():
+        if rec.get("pred") is not None:
+            preds.setdefault(ticker, []).append(rec["pred"])
 
-            preds = []
-            for model in MODEL_NAMES:
-                try:
-                    pred = predict_price(ticker, model, LOOKAHEAD_DAYS)
-                    preds.append(pred)
-                except Exception as e:
-                    print(f"⚠️ Model {model} failed for {ticker}: {e}")
-                    continue
+    results = []
+    for ticker, current_price in prices.items():
+        if not current_price or ticker not in preds:
+            continue
+        avg_pred = sum(preds[ticker]) / len(preds[ticker])
+        percent_change = ((avg_pred - current_price) / current_price) * 100
+        results.append({
+            "ticker": ticker,
+            "current_price": round(current_price, 2),
+            "predicted_price": round(avg_pred, 2),
+            "percent_change": round(percent_change, 2),
+        })
+    return results
+
+
+def publish(output: dict) -> None:
+    try:
+        print(f"📈 Published gainers and losers to {_write_json(DEST_KEY, output)}")
+    except Exception as e:
+        if not USE_LOCAL:
+            raise
+        print(f"❌ Failed to save gainers_losers.json: {e}")
 
-            if not preds:
-                continue
 
-            avg_pred = sum(preds) / len(preds)
-            percent_change = ((avg_pred - current_price) / current_price) * 100
+def publish_index(results: Dict[str, dict], state: dict, timestamp: str) -> None:
+    rows = list(results.values())
+    model_preds = {t: {m: f.get("pred") for m, f in models.items()} for t, models in state["forecasts"].items()}
+    metadata = {t: registry.metadata.get(t.replace("-", "."), {}) for t in results}
+    try:
+        if USE_LOCAL:
+            dest = write_index(os.path.join(MODEL_DIR, INDEX_KEY), rows, model_preds, MODEL_NAMES, metadata, timestamp)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = write_index(os.path.join(tmp, "index.slim"), rows, model_preds, MODEL_NAMES, metadata, timestamp)
+                with open(path, "rb") as f:
+                    boto3.client("s3").put_object(Bucket=BUCKET, Key=INDEX_KEY, Body=f.read(),
+                                                  ContentType="application/octet-stream")
+            dest = f"s3://{BUCKET}/{INDEX_KEY}"
+        print(f"📇 Published ranking index for {len(rows)} tickers to {dest}")
+    except Exception as e:
+        if not USE_LOCAL:
+            raise
+        print(f"❌ Failed to save the ranking index: {e}")
+
 
-            results.append({
-                "ticker": ticker,
-                "current_price": round(current_price, 2),
-                "predicted_price": round(avg_pred, 2),
-                "percent_change": round(percent_change, 2),
-            })
+def merge_results(previous: Dict[str, dict], tickers, frames, fresh) -> Dict[str, dict]:
+    """
+    Fold this run's rows into the previous full result set. Tickers whose data
+    couldn't be fetched keep their last row; tickers that left the index are dropped.
+    """
+    universe = set(tickers)
+    merged = {t: row for t, row in previous.items() if t in universe and t not in frames}
+    merged.update({row["ticker"]: row for row in fresh})
+    return merged
 
-        except Exception as e:
-            print(f"⚠️ Error processing {ticker}: {e}")
 
-    gainers = sorted(results, key=lambda x: x["percent_change"], reverse=True)[:TOP_N]
-    losers = sorted(results, key=lambda x: x["percent_change"])[:TOP_N]
+def _stage(name: str):
+    return timed(name, histogram=batch_stage_seconds, job="explore")
 
+
+def _write_metrics() -> None:
+    try:
+        path = metrics.write_textfile(os.path.join(METRICS_TEXTFILE_DIR, "explore_batch.prom"))
+        print(f"📝 Saved metrics → {path}")
+    except OSError as e:
+        print(f"⚠️ Failed to write metrics: {e}")
+
+
+def compute_gainers_losers(run_id: str = None):
+    run_id = run_id or os.getenv("EXPLORE_RUN_ID") or datetime.utcnow().strftime("%Y-%m-%d")
+    registry.refresh_if_stale()
+    tickers = registry.yahoo_symbols()
+
+    checkpoint = Checkpoint(run_id)
+    done = checkpoint.load()
+    if done:
+        print(f"♻️ Resuming run {run_id}: {len(done)} forecasts already checkpointed")
+
+    state = {"forecasts": {}, "results": {}} if FULL_REFRESH else load_state()
+    with _stage("fetch"):
+        frames, prices = fetch_stage(tickers)
+    with _stage("fingerprint"):
+        prints = fingerprint_stage(frames)
+        reused = reuse_unchanged(state, prints, done)
+    print(f"🧮 Reusing {reused}/{len(prints)} forecasts with unchanged inputs")
+    batch_items.inc(reused, job="explore", item="forecast_reused")
+    batch_items.inc(sum(1 for key in prints if key not in done), job="explore", item="forecast_computed")
+
+    with _stage("models"):
+        done = model_stage(frames, checkpoint, done)
+    batch_items.inc(sum(1 for rec in done.values() if rec.get("error")), job="explore", item="forecast_failed")
+    # Current prices move intraday even when the forecasts don't, so every
+    # fetched ticker's row is rebuilt; it's cheap next to the forecasts.
+    with _stage("aggregate"):
+        results = merge_results(state["results"], tickers, frames, aggregate(prices, done))
+
+    change = itemgetter("percent_change")
     output = {
         "timestamp": datetime.utcnow().isoformat(),
         "models_used": MODEL_NAMES,
-        "top_gainers": gainers,
-        "top_losers": losers,
+        "top_gainers": heapq.nlargest(TOP_N, results.values(), key=change),
+        "top_losers": heapq.nsmallest(TOP_N, results.values(), key=change),
     }
-
-    if not USE_LOCAL:
-
-        s3.put_object(
-            Bucket=BUCKET,
-            Key=DEST_KEY,
-            Body=json.dumps(output),
-            ContentType="application/json"
-        )
-    else:
-        try:
-            path = os.path.join(MODEL_DIR, DEST_KEY)
-            with open(path, "w") as f:
-                json.dump(output, f, indent=2)
-            print(f"📈 Saved gainers losers for {output}")
-        except Exception as e:
-            print(f"❌ Failed to save gainers_losers.json: {e}")
-
-    print(f"✅ Uploaded analytics to s3://{BUCKET}/{DEST_KEY}")
+    with _stage("publish"):
+        publish(output)
+        state = next_state(state, tickers, prints, done, results)
+        publish_index(results, state, output["timestamp"])
+        _write_json(STATE_KEY, state)
+    checkpoint.remove()
+    _write_metrics()
+    return output
 
 
 if __name__ == "__main__":
-    compute_gainers_losers()
\ No newline at end of file
+    compute_gainers_losers()
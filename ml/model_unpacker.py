@@ -1,59 +1,171 @@
 # sagemaker_model_unpacker.py
-# Extracts model.tar.gz from SageMaker output and uploads individual models by type to S3
+# Streams model.tar.gz from SageMaker output and publishes individual models by type to S3
 
-import boto3
+import hashlib
 import os
+import sys
 import tarfile
-import tempfile
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# The catalog format is shared with the backend, which reads it
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from catalog import CATALOG_KEY, CATALOG_VERSION, ARTIFACT_EXTENSIONS, build_catalog
 
 BUCKET = "shrubb-ai-ml-models"
 JOB_NAME = os.getenv("SM_JOB_NAME")  # e.g., stock-analyzer-20240623
 SOURCE_KEY = f"models/{JOB_NAME}/output/model.tar.gz"
 DEST_PREFIX = "models"  # Base path in S3
+# models/catalog.json records sha256/size of every published artifact, so
+# unchanged models aren't re-uploaded, plus per-ticker accuracy and training dates.
+UPLOAD_WORKERS = int(os.getenv("UNPACK_UPLOAD_WORKERS", "16"))
+MAX_INFLIGHT_BYTES = int(os.getenv("UNPACK_MAX_INFLIGHT_BYTES", str(256 * 1024 * 1024)))
 
-s3 = boto3.client("s3")
+# Files published per model directory besides the artifacts
+MODEL_FILES = {"accuracy.json", "training_state.json"}
 
-def extract_and_upload():
-    with tempfile.TemporaryDirectory() as tmp:
-        tar_path = os.path.join(tmp, "model.tar.gz")
-        extract_dir = os.path.join(tmp, "extracted")
-        os.makedirs(extract_dir, exist_ok=True)
-
-        print(f"⬇️ Downloading s3://{BUCKET}/{SOURCE_KEY}")
-        s3.download_file(BUCKET, SOURCE_KEY, tar_path)
-
-        print("📦 Extracting model.tar.gz")
-        with tarfile.open(tar_path, "r:gz") as tar:
-            tar.extractall(path=extract_dir)
-        
-        for model_name in os.listdir(extract_dir):
-            model_dir = os.path.join(extract_dir, model_name)
-            if not os.path.isdir(model_dir):
-                continue
-        
-            print(f"📁 Processing model: {model_name}")
-
-
-            for file in os.listdir(model_dir):
-                local_path = os.path.join(model_dir, file)
-
-                # Upload models by filename convention
-                if file.endswith((".pkl", ".keras")):
+
+def get_s3():
+    import boto3
+    return boto3.client("s3")
+
+
+class ByteBudget:
+    """
+    Caps the bytes read from the archive and not yet uploaded. A single file larger than
+    the budget is still let through once nothing else is in flight.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int) -> None:
+        with self._cond:
+            while self.in_flight and self.in_flight + n > self.limit:
+                self._cond.wait()
+            self.in_flight += n
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, n: int) -> None:
+        with self._cond:
+            self.in_flight -= n
+            self._cond.notify_all()
+
+
+def load_catalog(s3, bucket: str = BUCKET) -> dict:
+    try:
+        body = s3.get_object(Bucket=bucket, Key=CATALOG_KEY)["Body"].read()
+        catalog = json.loads(body)
+    except Exception:
+        return {"artifacts": {}, "models": {}}
+    catalog.setdefault("artifacts", {})
+    catalog.setdefault("models", {})
+    return catalog
+
+
+def _previous_model_files(catalog: dict):
+    """accuracy/training-state dicts recovered from the previous catalog."""
+    accuracy, state = {}, {}
+    for model, tickers in catalog.get("models", {}).items():
+        for ticker, entry in tickers.items():
+            if entry.get("accuracy") is not None:
+                accuracy.setdefault(model, {})[ticker] = entry["accuracy"]
+            if entry.get("trained_at") or entry.get("last_ds"):
+                state.setdefault(model, {})[ticker] = {"trained_at": entry.get("trained_at"),
+                                                      "last_ds": entry.get("last_ds")}
+    return accuracy, state
+
+
+def _dest_key(member_name: str):
+    """models/<model>/<file> for files directly inside a model directory, else None."""
+    parts = [p for p in os.path.normpath(member_name).split(os.sep) if p not in ("", ".")]
+    if len(parts) != 2:
+        return None
+    model_name, file = parts
+    if not (file.endswith(ARTIFACT_EXTENSIONS) or file in MODEL_FILES):
+        return None
+    return f"{DEST_PREFIX}/{model_name}/{file}"
+
+
+def publish_stream(fileobj, s3, bucket: str = BUCKET, workers: int = UPLOAD_WORKERS,
+                   max_inflight_bytes: int = MAX_INFLIGHT_BYTES) -> dict:
+    """
+    Read a model.tar.gz stream member by member and upload every artifact whose
+    content hash differs from the published catalog. The catalog is written
+    last, with only the uploads that succeeded. Returns counts.
+    """
+    catalog = load_catalog(s3, bucket)
+    published = catalog["artifacts"]
+    accuracy, state = _previous_model_files(catalog)
+    budget = ByteBudget(max_inflight_bytes)
+    lock = threading.Lock()
+    stats = {"uploaded": 0, "unchanged": 0, "failed": 0, "bytes_uploaded": 0}
+
+    def upload(key: str, data: bytes, digest: str, size: int):
+        try:
+            s3.put_object(Bucket=bucket, Key=key, Body=data)
+            print(f"⬆️ Uploaded s3://{bucket}/{key}")
+            with lock:
+                published[key] = {"sha256": digest, "size": len(data),
+                                  "updated_at": datetime.utcnow().isoformat()}
+                stats["uploaded"] += 1
+                stats["bytes_uploaded"] += len(data)
+        except Exception as e:
+            print(f"⚠️ Skipping {key}: {e}")
+            with lock:
+                stats["failed"] += 1
+        finally:
+            budget.release(size)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # "r|gz" reads the archive strictly forward, without seeking or extracting to disk
+        with tarfile.open(fileobj=fileobj, mode="r|gz") as tar:
+            for member in tar:
+                key = _dest_key(member.name) if member.isfile() else None
+                if key is None:
+                    continue
+                # Reserve the member's bytes before reading it, so they count while held in memory
+                budget.acquire(member.size)
+                try:
+                    data = tar.extractfile(member).read()
+                except BaseException:
+                    budget.release(member.size)
+                    raise
+                model_name, file = key.split("/")[1:]
+                if file in MODEL_FILES:
                     try:
-                        s3_key = f"{DEST_PREFIX}/{model_name}/{file}"
-                        print(f"⬆️ Uploading {file} to s3://{BUCKET}/{s3_key}")
-                        s3.upload_file(local_path, BUCKET, s3_key)
-                    except Exception as e:
-                        print(f"⚠️ Skipping {file}: {e}")
+                        (accuracy if file == "accuracy.json" else state)[model_name] = json.loads(data)
+                    except ValueError:
+                        print(f"⚠️ Unreadable {member.name}")
+                digest = hashlib.sha256(data).hexdigest()
+                if published.get(key, {}).get("sha256") == digest:
+                    budget.release(member.size)
+                    stats["unchanged"] += 1
+                    continue
+                pool.submit(upload, key, data, digest, member.size)
+
+    catalog["version"] = CATALOG_VERSION
+    catalog["updated_at"] = datetime.utcnow().isoformat()
+    catalog["models"] = build_catalog(published, accuracy, state)
+    s3.put_object(Bucket=bucket, Key=CATALOG_KEY, Body=json.dumps(catalog),
+                  ContentType="application/json")
+    stats["peak_inflight_bytes"] = budget.peak
+    return stats
 
-                # Also upload any accuracy.json files found
-                elif file == "accuracy.json":
-                    s3_key = f"{DEST_PREFIX}/{model_name}/accuracy.json"
-                    print(f"📤 Uploading per-ticker accuracy for {model_name} to s3://{BUCKET}/{s3_key}")
-                    s3.upload_file(local_path, BUCKET, s3_key)
 
-        print("✅ Done extracting and uploading model files.")
+def extract_and_upload():
+    s3 = get_s3()
+    print(f"⬇️ Streaming s3://{BUCKET}/{SOURCE_KEY}")
+    body = s3.get_object(Bucket=BUCKET, Key=SOURCE_KEY)["Body"]
+    stats = publish_stream(body, s3)
+    print(f"✅ Published model files: {stats['uploaded']} uploaded "
+          f"({stats['bytes_uploaded']:,} B), {stats['unchanged']} unchanged, {stats['failed']} failed")
+
 
 if __name__ == "__main__":
-    extract_and_upload()
\ No newline at end of file
+    extract_and_upload()
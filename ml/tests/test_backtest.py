@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+import backtest
+
+
+def frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"ds": pd.bdate_range(end="2024-06-28", periods=rows),
+                         "y": 100 + np.cumsum(rng.normal(0, 1, rows))})
+
+
+def test_fold_origins_leave_the_horizon_and_respect_min_train():
+    assert backtest.fold_origins(400, 30, folds=4, step=20, min_train=250) == [310, 330, 350, 370]
+    assert backtest.fold_origins(300, 30, folds=4, step=20, min_train=250) == [250, 270]
+    assert backtest.fold_origins(200, 30, folds=4, step=20, min_train=250) == []
+
+
+def test_arima_filtered_forecasts_match_extending_the_first_fit():
+    df = frame(400)
+    y = df["y"].to_numpy()
+    origins = backtest.fold_origins(len(df), 10, folds=3, step=20, min_train=250)
+    forecasts = backtest.backtest_arima(df, origins, 10)
+
+    fit = ARIMA(y[:origins[0]], order=(5, 1, 0)).fit()
+    for k, o in enumerate(origins):
+        expected = fit.append(y[origins[0]:o]).forecast(10) if k else fit.forecast(10)
+        np.testing.assert_allclose(forecasts[k], expected)
+
+
+def test_forecasts_only_see_bars_before_their_origin():
+    df = frame(400)
+    origins = backtest.fold_origins(len(df), 10, folds=3, step=20, min_train=250)
+    leaked = df.copy()
+    leaked.loc[origins[1]:, "y"] += 50
+
+    for forecaster in (backtest.backtest_arima, backtest.backtest_xgboost):
+        clean, dirty = forecaster(df, origins, 10), forecaster(leaked, origins, 10)
+        np.testing.assert_allclose(clean[:2], dirty[:2])
+
+    windows, lows, spans = backtest.lstm_origin_windows(df["y"].to_numpy(), origins)
+    windows2, lows2, spans2 = backtest.lstm_origin_windows(leaked["y"].to_numpy(), origins)
+    np.testing.assert_allclose(windows[:2], windows2[:2])
+    assert windows.min() >= 0 and windows.max() <= 1
+
+
+def test_prophet_scores_only_its_most_recent_folds(monkeypatch):
+    seen = []
+
+    def fake_prophet(df, origins, horizon):
+        seen.append(origins)
+        return np.stack([df["y"].to_numpy()[o - 1:o - 1 + horizon] for o in origins])
+
+    monkeypatch.setitem(backtest.FORECASTERS, "prophet", fake_prophet)
+    record = backtest.run_backtest_task("AAA", "prophet", frame(400), horizons=[1, 5], folds=5, step=20,
+                                        prophet_folds=2)
+    assert seen == [[375, 395]] and record["folds"] == 2 and record["status"] == "done"
+
+
+def test_horizon_metrics():
+    y = np.array([100.0, 100, 110, 120])
+    forecasts = np.array([[105.0, 100]])
+    metrics = backtest.horizon_metrics(forecasts, y, [2], [1, 2])
+    assert metrics["1"] == {"mape": round(5 / 110, 6), "mae": 5.0, "hit_rate": 1.0}
+    assert metrics["2"] == {"mape": round(20 / 120, 6), "mae": 20.0, "hit_rate": 0.0}
+
+
+def test_run_backtest_reports_every_ticker_and_model():
+    frames = {"AAA": frame(400), "BBB": frame(400, seed=1), "SHORT": frame(120)}
+
+    def fetch(ticker):
+        return frames.get(ticker, pd.DataFrame())
+
+    records = backtest.run_backtest(["AAA", "BBB", "SHORT", "EMPTY"], models=["arima", "xgboost"], fetch=fetch,
+                                    light_workers=2, lstm_workers=1, horizons=[1, 5], folds=3, step=20)
+    status = {(r["ticker"], r["model"]): r["status"] for r in records}
+    assert len(status) == 8
+    assert {status[t, m] for t in ["AAA", "BBB"] for m in ["arima", "xgboost"]} == {"done"}
+    assert status["SHORT", "arima"] == "skipped" and status["EMPTY", "xgboost"] == "failed"
+
+    report = backtest.summarize(records, elapsed_s=1.0)
+    assert set(report["summary"]["arima"]) == {"1", "5"}
+    assert report["summary"]["arima"]["5"]["tickers"] == 2
+    assert report["timings"]["xgboost"]["done"] == 2 and report["timings"]["xgboost"]["wall_s"] > 0
+
+
+def test_time_budget_cancels_tasks_that_have_not_started():
+    records = backtest.run_backtest([f"T{i}" for i in range(6)], models=["arima"], fetch=lambda t: frame(400),
+                                    light_workers=1, time_budget=0, horizons=[1], folds=2, step=20)
+    statuses = [r["status"] for r in records]
+    assert len(statuses) == 6 and "timeout" in statuses
+    assert set(statuses) <= {"done", "timeout"}
+
+
+def test_tasks_running_past_the_grace_period_time_out():
+    start = time.monotonic()
+    records = backtest.run_backtest([f"T{i}" for i in range(3)], models=["arima"], fetch=lambda t: frame(400),
+                                    light_workers=1, time_budget=0, grace=0, horizons=[1], folds=2, step=20)
+    assert [r["status"] for r in records] == ["timeout"] * 3
+    assert time.monotonic() - start < 30
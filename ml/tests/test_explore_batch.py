@@ -0,0 +1,172 @@
+import io
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import explore_batch
+from ranking_index import RankingIndex
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+class FakeRegistry:
+    metadata = {"AAA": {"sector": "Energy", "sub_industry": "Oil & Gas Drilling"},
+                "BBB": {"sector": "Utilities", "sub_industry": "Electric Utilities"}}
+
+    def refresh_if_stale(self):
+        return False
+
+    def yahoo_symbols(self):
+        return list(TICKERS)
+
+
+class FakeStore:
+    def __init__(self):
+        self.calls = []
+        self.end = "2024-06-28"
+
+    def close_matrix(self, tickers, period="3y"):
+        self.calls.extend(tickers)
+        return pd.DataFrame(100.0, index=pd.bdate_range(end=self.end, periods=50), columns=list(tickers))
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    calls = []
+    lock = threading.Lock()
+    versions = {}
+    store = FakeStore()
+
+    def predict(ticker, model, horizons, df=None):
+        assert df is not None  # models reuse the frame loaded by the fetch stage
+        with lock:
+            calls.append((ticker, model))
+        if (ticker, model) == ("CCC", "arima"):
+            raise RuntimeError("no model")
+        return {horizons[0]: 110.0 if ticker == "AAA" else 90.0}
+
+    def lstm_batch(tickers, horizons, frames=None):
+        with lock:
+            calls.extend((t, "lstm") for t in tickers)
+        return {t: {horizons[0]: 100.0} for t in tickers}
+
+    monkeypatch.setattr(explore_batch, "registry", FakeRegistry())
+    monkeypatch.setattr(explore_batch, "price_store", store)
+    monkeypatch.setattr(explore_batch, "predict_horizons", predict)
+    monkeypatch.setattr(explore_batch, "predict_lstm_batch", lstm_batch)
+    monkeypatch.setattr(explore_batch, "get_model_version", lambda t, m: versions.get((t, m), "v1"))
+    monkeypatch.setattr(explore_batch, "LSTM_RUNTIME", "numpy")
+    monkeypatch.setattr(explore_batch, "FAMILY_POOLS", {m: ("thread", 2) for m in ["prophet", "arima", "xgboost"]})
+    monkeypatch.setattr(explore_batch, "USE_LOCAL", True)
+    monkeypatch.setattr(explore_batch, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(explore_batch, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    return calls, versions, store, tmp_path
+
+
+def test_fetches_once_per_ticker_and_ranks(pipeline):
+    calls, _, store, tmp_path = pipeline
+    out = explore_batch.compute_gainers_losers(run_id="t1")
+
+    assert sorted(store.calls) == TICKERS
+    assert len(calls) == len(TICKERS) * 4
+    assert out["top_gainers"][0]["ticker"] == "AAA"
+    assert out["top_losers"][0]["ticker"] in {"BBB", "CCC"}
+    published = json.loads((tmp_path / explore_batch.DEST_KEY).read_text())
+    assert published["top_gainers"] == out["top_gainers"]
+
+    index = RankingIndex.load(str(tmp_path / explore_batch.INDEX_KEY))
+    assert index.top("top_gainers", 1) == [{**out["top_gainers"][0], "sector": "Energy",
+                                             "sub_industry": "Oil & Gas Drilling"}]
+    assert [r["ticker"] for r in index.top("top_losers", 5, model="arima")] == ["BBB", "AAA"]  # CCC's ARIMA failed
+    assert [r["ticker"] for r in index.top("top_losers", 5, sector="Utilities")] == ["BBB"]
+    assert not list((tmp_path / "checkpoints").iterdir())  # checkpoint removed after publishing
+
+
+def test_resumes_from_checkpoint(pipeline):
+    calls, _, _, tmp_path = pipeline
+    (tmp_path / "checkpoints").mkdir()
+    with open(tmp_path / "checkpoints" / "explore-t2.jsonl", "w") as f:
+        for model in ["prophet", "arima", "xgboost", "lstm"]:
+            f.write(json.dumps({"ticker": "AAA", "model": model, "pred": 120.0, "error": None}) + "\n")
+        f.write('{"ticker": "BBB", "mod')  # torn line from the crash
+
+    out = explore_batch.compute_gainers_losers(run_id="t2")
+
+    assert not [c for c in calls if c[0] == "AAA"]
+    assert len(calls) == 2 * 4
+    assert out["top_gainers"][0] == {
+        "ticker": "AAA", "current_price": 100.0, "predicted_price": 120.0, "percent_change": 20.0,
+    }
+
+
+def test_only_changed_inputs_are_recomputed(pipeline):
+    calls, versions, store, _ = pipeline
+    first = explore_batch.compute_gainers_losers(run_id="a")
+
+    calls.clear()
+    assert explore_batch.compute_gainers_losers(run_id="b")["top_gainers"] == first["top_gainers"]
+    # The failed CCC/arima forecast is retried; everything else is reused
+    assert calls == [("CCC", "arima")]
+
+    calls.clear()
+    versions[("BBB", "xgboost")] = "v2"
+    explore_batch.compute_gainers_losers(run_id="c")
+    assert sorted(calls) == [("BBB", "xgboost"), ("CCC", "arima")]
+
+    calls.clear()
+    versions[("AAA", "prophet")] = None  # version lookup failed: never trusted, even twice in a row
+    for run_id in ("c1", "c2"):
+        explore_batch.compute_gainers_losers(run_id=run_id)
+    assert sorted(calls) == [("AAA", "prophet")] * 2 + [("CCC", "arima")] * 2
+
+    calls.clear()
+    store.end = "2024-07-01"
+    explore_batch.compute_gainers_losers(run_id="d")
+    assert len(calls) == len(TICKERS) * 4
+
+
+def test_merge_keeps_rows_for_unfetched_tickers():
+    previous = {"AAA": {"ticker": "AAA", "percent_change": 1.0},
+                "BBB": {"ticker": "BBB", "percent_change": 2.0},
+                "OLD": {"ticker": "OLD", "percent_change": 3.0}}
+    fresh = [{"ticker": "AAA", "percent_change": 5.0}]
+    merged = explore_batch.merge_results(previous, ["AAA", "BBB", "CCC"], {"AAA": None, "CCC": None}, fresh)
+    assert merged == {"AAA": fresh[0], "BBB": previous["BBB"]}
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = Body
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+def test_checkpoint_is_mirrored_to_s3_and_resumes_elsewhere(monkeypatch, tmp_path):
+    s3 = FakeS3()
+    monkeypatch.setattr(explore_batch.boto3, "client", lambda name: s3)
+    monkeypatch.setattr(explore_batch, "CHECKPOINT_UPLOAD_EVERY", 2)
+
+    first = explore_batch.Checkpoint("r1", directory=str(tmp_path / "runner1"), remote=True)
+    first.record("AAA", "arima", pred=1.0)
+    assert s3.objects == {}
+    first.record("BBB", "arima", pred=2.0)
+    first.record("CCC", "arima", error="boom")
+    assert len(s3.objects[first.key].splitlines()) == 2
+    first.sync()
+
+    # A rerun on a fresh machine picks up everything recorded
+    second = explore_batch.Checkpoint("r1", directory=str(tmp_path / "runner2"), remote=True)
+    assert set(second.load()) == {("AAA", "arima"), ("BBB", "arima"), ("CCC", "arima")}
+    second.remove()
+    assert s3.objects == {} and not os.path.exists(second.path)
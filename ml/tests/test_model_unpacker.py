@@ -0,0 +1,156 @@
+import io
+import json
+import tarfile
+import threading
+
+import model_unpacker
+
+
+class FakeS3:
+    """In-memory stand-in for the S3 client calls the unpacker makes."""
+
+    def __init__(self, fail_keys=()):
+        self.objects = {}
+        self.puts = []
+        self.fail_keys = set(fail_keys)
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise KeyError(Key)
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        if Key in self.fail_keys:
+            raise IOError("boom")
+        with self._lock:
+            self.objects[(Bucket, Key)] = Body.encode() if isinstance(Body, str) else bytes(Body)
+            self.puts.append(Key)
+
+
+class ForwardOnly(io.RawIOBase):
+    """A non-seekable stream, like an S3 response body."""
+
+    def __init__(self, data):
+        self._buf = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._buf.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def tarball(files):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+FILES = {
+    "prophet/AAA.pkl": b"p" * 1000,
+    "prophet/AAA.slim": b"s" * 100,
+    "lstm/AAA.npz": b"n" * 3000,
+    "prophet/accuracy.json": b'{"AAA": 0.9}',
+    "reports/training_report.json": b"{}",
+    "analytics/checkpoints/x.jsonl": b"",
+    "prophet/notes.txt": b"ignored",
+}
+
+
+def publish(s3, files, **kwargs):
+    return model_unpacker.publish_stream(ForwardOnly(tarball(files)), s3, bucket="b", **kwargs)
+
+
+def test_streams_and_skips_unchanged_artifacts():
+    s3 = FakeS3()
+    stats = publish(s3, FILES, max_inflight_bytes=3500)
+
+    keys = {"models/prophet/AAA.pkl", "models/prophet/AAA.slim", "models/lstm/AAA.npz",
+            "models/prophet/accuracy.json"}
+    assert stats["uploaded"] == 4 and stats["unchanged"] == 0
+    assert stats["peak_inflight_bytes"] <= 3500
+    assert {k for (_, k) in s3.objects} == keys | {model_unpacker.CATALOG_KEY}
+    assert s3.objects[("b", "models/lstm/AAA.npz")] == FILES["lstm/AAA.npz"]
+    assert s3.puts[-1] == model_unpacker.CATALOG_KEY
+
+    s3.puts.clear()
+    changed = {**FILES, "prophet/AAA.slim": b"t" * 100}
+    stats = publish(s3, changed)
+    assert (stats["uploaded"], stats["unchanged"]) == (1, 3)
+    assert s3.puts == ["models/prophet/AAA.slim", model_unpacker.CATALOG_KEY]
+
+
+def test_failed_uploads_stay_out_of_the_catalog():
+    s3 = FakeS3(fail_keys={"models/lstm/AAA.npz"})
+    stats = publish(s3, FILES)
+
+    assert stats["failed"] == 1
+    catalog = json.loads(s3.objects[("b", model_unpacker.CATALOG_KEY)])
+    assert "models/lstm/AAA.npz" not in catalog["artifacts"]
+    assert catalog["artifacts"]["models/prophet/AAA.pkl"]["size"] == 1000
+
+    # Retried on the next run
+    s3.fail_keys.clear()
+    assert publish(s3, FILES)["uploaded"] == 1
+
+
+def test_members_are_budgeted_before_they_are_read(monkeypatch):
+    events = []
+
+    class Budget(model_unpacker.ByteBudget):
+        def acquire(self, n):
+            super().acquire(n)
+            events.append(("acquire", n))
+
+    extractfile = tarfile.TarFile.extractfile
+
+    def logged_extractfile(self, member):
+        f = extractfile(self, member)
+        read = f.read
+        f.read = lambda *args: events.append(("read", member.size)) or read(*args)
+        return f
+
+    monkeypatch.setattr(model_unpacker, "ByteBudget", Budget)
+    monkeypatch.setattr(tarfile.TarFile, "extractfile", logged_extractfile)
+    s3 = FakeS3()
+    publish(s3, FILES, max_inflight_bytes=1500)
+    reads = [i for i, (kind, _) in enumerate(events) if kind == "read"]
+    assert len(reads) == 4
+    assert all(events[i - 1] == ("acquire", events[i][1]) for i in reads)
+
+    # Unchanged members give their bytes back without an upload
+    stats = publish(s3, FILES)
+    assert stats["unchanged"] == 4 and stats["peak_inflight_bytes"] == 3000
+
+
+def test_byte_budget_lets_oversized_files_through_alone():
+    budget = model_unpacker.ByteBudget(10)
+    budget.acquire(50)
+    assert budget.in_flight == 50
+    budget.release(50)
+    budget.acquire(4)
+    budget.acquire(6)
+    assert budget.peak == 50 and budget.in_flight == 10
+
+
+def test_catalog_indexes_models_with_accuracy_and_training_state():
+    s3 = FakeS3()
+    files = {**FILES, "prophet/training_state.json": b'{"AAA": {"trained_at": "2024-06-28T22:00:00", "last_ds": "2024-06-28"}}'}
+    publish(s3, files)
+    # A later run without the accuracy/state files keeps what was published
+    publish(s3, {"prophet/BBB.slim": b"b"})
+
+    catalog = json.loads(s3.objects[("b", model_unpacker.CATALOG_KEY)])
+    aaa = catalog["models"]["prophet"]["AAA"]
+    assert set(aaa["artifacts"]) == {".pkl", ".slim"}
+    assert aaa["artifacts"][".slim"]["key"] == "models/prophet/AAA.slim"
+    assert (aaa["accuracy"], aaa["last_ds"]) == (0.9, "2024-06-28")
+    assert catalog["models"]["prophet"]["BBB"]["accuracy"] is None
+    assert catalog["models"]["lstm"]["AAA"]["artifacts"][".npz"]["size"] == 3000
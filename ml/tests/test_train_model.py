@@ -0,0 +1,141 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import train_model
+
+
+def frame(rows, end="2024-06-28"):
+    rng = np.random.default_rng(rows)
+    return pd.DataFrame({"ds": pd.bdate_range(end=end, periods=rows),
+                         "y": 100 + np.cumsum(rng.normal(0, 1, rows))})
+
+
+@pytest.fixture
+def model_dir(monkeypatch, tmp_path):
+    # Pool workers are spawned and re-read the environment
+    monkeypatch.setenv("USE_LOCAL_MODELS", "true")
+    monkeypatch.setenv("MODEL_OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(train_model, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(train_model, "METRICS_PATH", str(tmp_path / "reports" / "training.prom"))
+    monkeypatch.setattr(train_model, "accuracy_tracker", train_model.defaultdict(dict))
+    return tmp_path
+
+
+def test_scheduler_trains_each_fetched_ticker_once_and_reports(model_dir):
+    fetched = []
+
+    def fetch(ticker):
+        fetched.append(ticker)
+        return frame(60) if ticker != "EMPTY" else pd.DataFrame()
+
+    # No free memory: tasks must still run, one at a time
+    scheduler = train_model.TrainingScheduler(light_workers=2, lstm_workers=1, memory_fn=lambda: 0)
+    records = scheduler.run(["AAA", "EMPTY"], fetch=fetch)
+
+    assert sorted(fetched) == ["AAA", "EMPTY"]
+    by_model = {r["model"]: r for r in records if r["ticker"] == "AAA"}
+    assert set(by_model) == {"prophet", "arima", "xgboost", "lstm"}
+    assert by_model["prophet"]["status"] == "trained"
+    # Too little history for the others
+    assert {by_model[m]["status"] for m in ["arima", "xgboost", "lstm"]} == {"skipped"}
+    assert all(r["wall_s"] is not None and r["peak_rss_mb"] > 0 for r in by_model.values())
+    assert (model_dir / "prophet" / "AAA.pkl").exists()
+    assert [r["status"] for r in records if r["ticker"] == "EMPTY"] == ["failed"]
+
+    report = scheduler.report()
+    assert report["summary"]["prophet"]["trained"] == 1
+    assert scheduler.estimates["prophet"] >= by_model["prophet"]["peak_rss_mb"]
+
+    train_model.save_accuracy(records)
+    accuracy = json.loads((model_dir / "prophet" / "accuracy.json").read_text())
+    assert accuracy == {"AAA": by_model["prophet"]["accuracy"]}
+
+    train_model.record_training_metrics(records, 12.0)
+    text = (model_dir / "reports" / "training.prom").read_text()
+    assert 'shrubb_batch_items_total{item="prophet_trained",job="training"} 1' in text
+    assert 'shrubb_batch_stage_seconds_count{endpoint="",job="training",model="prophet",stage="train_full"} 1' in text
+
+
+def test_admission_respects_memory_and_pool_sizes():
+    class Pool:
+        def __init__(self):
+            self.submitted = []
+
+        def submit(self, fn, ticker, model, df, entry):
+            self.submitted.append((ticker, model))
+            return object()
+
+    scheduler = train_model.TrainingScheduler(light_workers=4, lstm_workers=1, reserve_mb=100,
+                                              memory_fn=lambda: 100 + 2 * train_model.MEMORY_ESTIMATES_MB["prophet"])
+    pools = {"light": Pool(), "lstm": Pool()}
+    pending = {"light": train_model.deque(("T%d" % i, "prophet", None) for i in range(6)),
+               "lstm": train_model.deque([("T0", "lstm", None)])}
+    inflight = {}
+    scheduler._admit(pools, pending, inflight)
+
+    # Budget fits two Prophet fits; the LSTM needs more than what's left
+    assert len(pools["light"].submitted) == 2
+    assert pools["lstm"].submitted == []
+
+    scheduler.memory_fn = lambda: float("inf")
+    scheduler._admit(pools, pending, inflight)
+    assert len(pools["light"].submitted) == 4
+    assert pools["lstm"].submitted == [("T0", "lstm")]
+
+
+def test_plan_training_cutoffs(model_dir, monkeypatch):
+    df = frame(150)
+    (model_dir / "arima").mkdir()
+    (model_dir / "arima" / "AAA.pkl").touch()
+    last = str(df["ds"].iloc[-1].date())
+    three_back = str(df["ds"].iloc[-4].date())
+
+    assert train_model.plan_training("arima", "AAA", df, None) == ("full", None)
+    assert train_model.plan_training("arima", "BBB", df, {"last_ds": three_back, "full_fit_ds": three_back}) \
+        == ("full", None)  # no previous artifact
+    assert train_model.plan_training("arima", "AAA", df, {"last_ds": last, "full_fit_ds": last}) == (None, None)
+    assert train_model.plan_training("arima", "AAA", df, {"last_ds": three_back, "full_fit_ds": three_back}) \
+        == ("incremental", (str(model_dir / "arima" / "AAA.pkl"), 3))
+
+    # Prophet is refit whenever it is behind, without fetching the previous artifact
+    with monkeypatch.context() as m:
+        m.setattr(train_model, "previous_artifact", lambda *a: pytest.fail("prophet needs no artifact"))
+        assert train_model.plan_training("prophet", "AAA", df, {"last_ds": three_back, "full_fit_ds": three_back}) \
+            == ("full", None)
+        assert train_model.plan_training("prophet", "AAA", df, {"last_ds": last, "full_fit_ds": last}) == (None, None)
+
+    old_fit = str(df["ds"].iloc[0].date())
+    assert train_model.plan_training("arima", "AAA", df, {"last_ds": three_back, "full_fit_ds": old_fit})[0] == "full"
+    monkeypatch.setattr(train_model, "TRAIN_MAX_INCREMENTAL_ROWS", 2)
+    assert train_model.plan_training("arima", "AAA", df, {"last_ds": three_back, "full_fit_ds": three_back})[0] == "full"
+    monkeypatch.setattr(train_model, "TRAIN_MODE", "full")
+    assert train_model.plan_training("arima", "AAA", df, {"last_ds": last, "full_fit_ds": last})[0] == "full"
+
+
+def test_incremental_updates_extend_existing_models(model_dir):
+    df = frame(160)
+    old = df.iloc[:-5].reset_index(drop=True)
+
+    first = {m: train_model.run_training_task("AAA", m, old) for m in ["arima", "xgboost"]}
+    assert all(r["mode"] == "full" for r in first.values())
+    arima_before = train_model.joblib.load(model_dir / "arima" / "AAA.pkl")
+
+    second = {m: train_model.run_training_task("AAA", m, df, first[m]["state"]) for m in ["arima", "xgboost"]}
+    for r in second.values():
+        assert (r["status"], r["mode"]) == ("trained", "incremental")
+        assert r["state"].pop("trained_at")
+        assert r["state"] == {"last_ds": str(df["ds"].iloc[-1].date()),
+                              "full_fit_ds": first[r["model"]]["state"]["full_fit_ds"], "updates": 1}
+
+    arima = train_model.joblib.load(model_dir / "arima" / "AAA.pkl")
+    assert arima.nobs == arima_before.nobs + 5
+    np.testing.assert_allclose(arima.params, arima_before.params)  # extended, not refit
+
+    xgb = train_model.joblib.load(model_dir / "xgboost" / "AAA.pkl")
+    assert xgb.get_booster().num_boosted_rounds() == 100 + train_model.XGB_INCREMENTAL_ROUNDS
+
+    # Nothing new since the update
+    assert train_model.run_training_task("AAA", "arima", df, second["arima"]["state"])["status"] == "skipped"
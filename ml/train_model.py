@@ -1,26 +1,31 @@
 import os
+import sys
+import time
 import joblib
-import yfinance as yf
+import multiprocessing
 import pandas as pd
 from prophet import Prophet
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-import requests
-from bs4 import BeautifulSoup
-from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
 
 from statsmodels.tsa.arima.model import ARIMA
 from xgboost import XGBRegressor
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense
-from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import mean_absolute_percentage_error
-from collections import defaultdict
+from collections import defaultdict, deque
 import json
 import numpy as np
 import warnings
 import gc
 
+# Shared data-layer modules (price store, ...) live alongside the backend service.
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from price_store import PriceStore, PRICE_STORE_DIR
+from market_data import column_frame
+from constituents import registry
+from lstm_numpy import save_lstm_bundle, export_lstm_bundle
+from slim_models import save_slim_model, convert_pickle
+from instrumentation import batch_items, batch_stage_seconds, metrics
 
 warnings.filterwarnings("ignore")
 
@@ -33,74 +38,126 @@ else:
 
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+# Scheduler sizing. Prophet/ARIMA/XGBoost share the light pool; LSTM gets its own
+# smaller pool because TensorFlow already spreads one fit over several cores.
+# Tasks are only admitted while the projected memory stays above the reserve,
+# using the largest peak RSS seen so far for that model (seeded below).
+CPUS = os.cpu_count() or 1
+DATA_WORKERS = int(os.getenv("TRAIN_DATA_WORKERS", "8"))
+TRAIN_LIGHT_WORKERS = int(os.getenv("TRAIN_LIGHT_WORKERS", str(CPUS)))
+TRAIN_LSTM_WORKERS = int(os.getenv("TRAIN_LSTM_WORKERS", str(max(1, CPUS // 4))))
+TRAIN_MEMORY_RESERVE_MB = int(os.getenv("TRAIN_MEMORY_RESERVE_MB", "512"))
+MEMORY_ESTIMATES_MB = {"prophet": 400, "arima": 250, "xgboost": 250, "lstm": 900}
+LIGHT_MODELS = ["prophet", "arima", "xgboost"]
+REPORT_PATH = os.path.join(MODEL_DIR, "reports", "training_report.json")
+METRICS_PATH = os.path.join(MODEL_DIR, "reports", "training.prom")
+
+# Incremental training. Existing ARIMA, XGBoost and LSTM models are updated
+# with the bars that arrived since they were last trained, until the cutoff
+# below forces a full refit. Prophet has no incremental update, so a Prophet
+# model that is behind is always refit on the full history.
+# TRAIN_MODE=full refits everything.
+TRAIN_MODE = os.getenv("TRAIN_MODE", "incremental").lower()
+TRAIN_REFIT_AFTER_DAYS = int(os.getenv("TRAIN_REFIT_AFTER_DAYS", "30"))
+TRAIN_MAX_INCREMENTAL_ROWS = int(os.getenv("TRAIN_MAX_INCREMENTAL_ROWS", "20"))
+XGB_INCREMENTAL_ROUNDS = int(os.getenv("XGB_INCREMENTAL_ROUNDS", "10"))
+INCREMENTAL_MODELS = {"arima", "xgboost", "lstm"}
+LSTM_FINE_TUNE_EPOCHS = int(os.getenv("LSTM_FINE_TUNE_EPOCHS", "3"))
+ARTIFACT_EXTENSIONS = {"prophet": ".pkl", "arima": ".pkl", "xgboost": ".pkl", "lstm": ".keras"}
+S3_BUCKET = "shrubb-ai-ml-models"
+PREVIOUS_MODEL_DIR = os.getenv("PREVIOUS_MODEL_DIR", "/tmp/previous_models")
+
 # Dictionary to track accuracy scores
 accuracy_tracker = defaultdict(dict)
 
+price_store = PriceStore(PRICE_STORE_DIR)
+
 def get_sp500_tickers():
-    url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, "html.parser")
-    table = soup.find("table", {"id": "constituents"})
-    tickers = pd.read_html(str(table))[0]["Symbol"].tolist()
-    return [t.replace(".", "-") for t in tickers]
+    registry.refresh_if_stale()
+    return registry.yahoo_symbols()
 
 def prepare_yfinance_data(ticker: str, period: str = "3y", interval: str = "1d") -> pd.DataFrame:
-    df = yf.download(ticker, period=period, interval=interval, auto_adjust=False)
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    if df.empty or "Close" not in df.columns:
-        return pd.DataFrame()
-    df = df[["Close"]].dropna()
-    df["ds"] = df.index
-    df = df[["ds", "Close"]].rename(columns={"Close": "y"})
-    return df
+    if interval != "1d":
+        raise ValueError(f"Unsupported interval: {interval}")
+    return price_store.frame(ticker, period)
 
 def save_model(model, path, is_keras=False):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     if is_keras:
         model.save(path.replace(".h5", ".keras")) 
     else:
+        # The pickle is kept for incremental training; the backend serves the .slim
         joblib.dump(model, path)
+        save_slim_model(model, path.replace(".pkl", ".slim"))
+
+# === Trainers ===
+#
+# Each trainer writes MODEL_DIR/<model>/<ticker>.<ext> and returns its accuracy,
+# or None when there isn't enough history. With `update=(previous_path, new_rows)`
+# the previous artifact is brought up to date with the last `new_rows` bars
+# instead of being refit from scratch (see plan_training for when that applies).
+
+def _stan_init(model):
+    # Prophet's documented warm start: seed the optimizer with a previous fit
+    # (used by the backtest between folds; it still runs a full fit)
+    init = {name: model.params[name][0][0] for name in ("k", "m", "sigma_obs")}
+    init.update({name: model.params[name][0] for name in ("delta", "beta")})
+    return init
 
-def train_prophet(ticker, df):
+
+def train_prophet(ticker, df, update=None):
+    # Always a full fit: plan_training never plans a Prophet update
     path = os.path.join(MODEL_DIR, "prophet", f"{ticker}.pkl")
-    if os.path.exists(path):
-        print(f"⏭️ Prophet: {ticker} already trained.")
-        return
     model = Prophet(daily_seasonality=True)
     model.fit(df)
     forecast = model.predict(df)
     acc = 1 - mean_absolute_percentage_error(df["y"], forecast["yhat"])
     save_model(model, path)
-    accuracy_tracker["prophet"][ticker] = round(acc, 4)
     print(f"✅ Prophet Model for {ticker} trained.")
+    return round(acc, 4)
 
 
-def train_arima(ticker, df):
+def train_arima(ticker, df, update=None):
     path = os.path.join(MODEL_DIR, "arima", f"{ticker}.pkl")
-    if os.path.exists(path) or len(df) < 100:
-        return
-    model = ARIMA(df["y"], order=(5, 1, 0)).fit()
-    forecast = model.predict(start=0, end=len(df)-1)
+    if len(df) < 100:
+        return None
+    if update:
+        # Extend the fitted results with the new bars, keeping the estimated parameters
+        previous, new_rows = joblib.load(update[0]), update[1]
+        new = df["y"].iloc[-new_rows:].to_numpy()
+        index = pd.RangeIndex(previous.nobs, previous.nobs + new_rows)
+        model = previous.append(pd.Series(new, index=index, name=previous.model.endog_names))
+        start = model.nobs - len(df)
+        forecast = model.predict(start=start, end=model.nobs - 1)
+    else:
+        model = ARIMA(df["y"], order=(5, 1, 0)).fit()
+        forecast = model.predict(start=0, end=len(df)-1)
     acc = 1 - mean_absolute_percentage_error(df["y"], forecast)
     save_model(model, path)
-    accuracy_tracker["arima"][ticker] = round(acc, 4)
-    print(f"✅ ARIMA Model for {ticker} trained.")
+    print(f"✅ ARIMA Model for {ticker} {'updated' if update else 'trained'}.")
+    return round(acc, 4)
 
-def train_xgboost(ticker, df):
+def train_xgboost(ticker, df, update=None):
     path = os.path.join(MODEL_DIR, "xgboost", f"{ticker}.pkl")
-    if os.path.exists(path) or len(df) < 100:
-        return
+    if len(df) < 100:
+        return None
+    df = df.copy()
     df["timestamp"] = df["ds"].astype("int64") // 1e9
     X = df["timestamp"].values.reshape(-1, 1)
     y = df["y"].values
-    model = XGBRegressor(n_estimators=100)
-    model.fit(X, y)
+    if update:
+        # A few more boosting rounds on the new bars, on top of the existing trees
+        previous, new_rows = joblib.load(update[0]), update[1]
+        model = XGBRegressor(n_estimators=XGB_INCREMENTAL_ROUNDS)
+        model.fit(X[-new_rows:], y[-new_rows:], xgb_model=previous.get_booster())
+    else:
+        model = XGBRegressor(n_estimators=100)
+        model.fit(X, y)
     preds = model.predict(X)
     acc = 1 - mean_absolute_percentage_error(y, preds)
     save_model(model, path)
-    accuracy_tracker["xgboost"][ticker] = round(acc, 4)
-    print(f"✅ XGBoost Model for {ticker} trained.")
+    print(f"✅ XGBoost Model for {ticker} {'updated' if update else 'trained'}.")
+    return round(acc, 4)
 
 #  Handles division-by-zero gracefully.
 def safe_mape(y_true, y_pred):
@@ -109,20 +166,28 @@ def safe_mape(y_true, y_pred):
         return float('inf')
     return np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask]))
 
-def train_lstm(ticker, df):
-    path = os.path.join(MODEL_DIR, "lstm", f"{ticker}.keras")
-    if os.path.exists(path) or len(df) < 100:
+def backfill_serving_artifact(model, ticker):
+    # Write the serving artifact (.npz bundle / .slim) for models trained before it existed
+    path = os.path.join(MODEL_DIR, model, f"{ticker}{ARTIFACT_EXTENSIONS[model]}")
+    serving_path = os.path.splitext(path)[0] + (".npz" if model == "lstm" else ".slim")
+    if not os.path.exists(path) or os.path.exists(serving_path):
         return
+    if model == "lstm":
+        export_lstm_bundle(path, serving_path)
+    else:
+        convert_pickle(path, serving_path)
 
-    scaler = MinMaxScaler()
-    scaled = scaler.fit_transform(df[["y"]])
-    X, y = [], []
-    window = 10
-    for i in range(window, len(scaled)):
-        X.append(scaled[i - window:i, 0])
-        y.append(scaled[i, 0])
-    X = np.array(X).reshape(-1, window, 1)
-    y = np.array(y)
+def lstm_windows(scaled, window=10):
+    # (samples, window, 1) inputs and next-bar targets from a scaled 1-d series
+    scaled = np.asarray(scaled).reshape(-1)
+    X = np.array([scaled[i - window:i] for i in range(window, len(scaled))]).reshape(-1, window, 1)
+    return X, scaled[window:]
+
+def fit_lstm(X, y):
+    # TensorFlow is imported here so only the LSTM workers pay for it
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense
+    from tensorflow.keras.callbacks import EarlyStopping
 
     # Split into train/val for better generalization
     split_idx = int(len(X) * 0.8)
@@ -130,7 +195,7 @@ def train_lstm(ticker, df):
     y_train, y_val = y[:split_idx], y[split_idx:]
 
     model = Sequential()
-    model.add(LSTM(50, activation="relu", input_shape=(window, 1)))
+    model.add(LSTM(50, activation="relu", input_shape=(X.shape[1], 1)))
     model.add(Dense(1))
     model.compile(optimizer="adam", loss="mse")
 
@@ -141,69 +206,360 @@ def train_lstm(ticker, df):
         validation_data=(X_val, y_val),
         callbacks=[EarlyStopping(patience=3, monitor="val_loss")]
     )
+    return model
+
+def train_lstm(ticker, df, update=None):
+    path = os.path.join(MODEL_DIR, "lstm", f"{ticker}.keras")
+    bundle_path = path.replace(".keras", ".npz")
+    if len(df) < 100:
+        return None
+
+    from tensorflow.keras.models import load_model
+    from lstm_engine import extract_lstm_weights
+
+    scaler = MinMaxScaler()
+    scaled = scaler.fit_transform(df[["y"]])
+    X, y = lstm_windows(scaled)
+    split_idx = int(len(X) * 0.8)
+    X_val, y_val = X[split_idx:], y[split_idx:]
+
+    if update:
+        # Fine-tune on the windows that end in the new bars
+        model, new_rows = load_model(update[0]), update[1]
+        model.fit(X[-new_rows:], y[-new_rows:], epochs=LSTM_FINE_TUNE_EPOCHS, verbose=0)
+    else:
+        model = fit_lstm(X, y)
 
     preds = model.predict(X_val).flatten()
     acc = 1 - safe_mape(y_val, preds)
     save_model(model, path, is_keras=True)
-    accuracy_tracker["lstm"][ticker] = round(acc, 4)
-    print(f"✅ LSTM Model for {ticker} trained.")
+    save_lstm_bundle(extract_lstm_weights(model), bundle_path)
+    print(f"✅ LSTM Model for {ticker} {'updated' if update else 'trained'}.")
+    return round(acc, 4)
+
+TRAINERS = {"prophet": train_prophet, "arima": train_arima, "xgboost": train_xgboost, "lstm": train_lstm}
+
+
+# === Previous models & training state ===
+#
+# <model>/training_state.json maps each ticker to the last bar its artifact has
+# seen, the bar of its last full fit and how many incremental updates followed.
+# On SageMaker MODEL_DIR starts empty, so previous artifacts and state files are
+# pulled from the published models in S3.
+
+def _download(key: str, dest: str) -> bool:
+    import boto3
 
-# We split the model training into light and heavy models to optimize CPU usage when using smaller instancess
-# as ml.m5large
-def train_light_models(ticker):
     try:
-        print(f"🔄 Training models for {ticker}")
-        df = prepare_yfinance_data(ticker)
-        if df.empty:
-            print(f"❌ No data for {ticker}")
-            return
-        train_prophet(ticker, df)
-        gc.collect()
-        train_arima(ticker, df)
-        gc.collect()
-        train_xgboost(ticker, df)
-        gc.collect()
-        print(f"✅ Completed training: {ticker}")
-    except Exception as e:
-        print(f"❌ Failed {ticker}: {e}")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        boto3.client("s3").download_file(S3_BUCKET, key, dest)
+        return True
+    except Exception:
+        return False
+
+
+def previous_artifact(model: str, ticker: str):
+    filename = f"{ticker}{ARTIFACT_EXTENSIONS[model]}"
+    path = os.path.join(MODEL_DIR, model, filename)
+    if os.path.exists(path):
+        return path
+    if USE_LOCAL:
+        return None
+    dest = os.path.join(PREVIOUS_MODEL_DIR, model, filename)
+    if os.path.exists(dest) or _download(f"models/{model}/{filename}", dest):
+        return dest
+    return None
+
 
-def train_heavy_models(ticker):
+def load_model_json(model: str, name: str) -> dict:
+    """Read <model>/<name> from MODEL_DIR, seeding it from S3 on SageMaker."""
+    path = os.path.join(MODEL_DIR, model, name)
+    if not os.path.exists(path) and not USE_LOCAL:
+        _download(f"models/{model}/{name}", path)
     try:
-        print(f"🔄 Training models for {ticker}")
-        df = prepare_yfinance_data(ticker)
-        if df.empty:
-            print(f"❌ No data for {ticker}")
-            return
-        train_lstm(ticker, df)
-        gc.collect()
-        print(f"✅ Completed training: {ticker}")
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def plan_training(model: str, ticker: str, df: pd.DataFrame, entry=None):
+    """
+    Decide how to train one model: ("full", None), ("incremental", (path, new_rows)),
+    or (None, None) when the artifact has already seen every bar.
+    """
+    if TRAIN_MODE == "full" or not entry:
+        return "full", None
+    if model not in INCREMENTAL_MODELS:
+        # Refit only when there are new bars; the previous artifact isn't needed
+        behind = (df["ds"] > pd.Timestamp(entry["last_ds"])).any()
+        return ("full", None) if behind else (None, None)
+    path = previous_artifact(model, ticker)
+    if path is None:
+        return "full", None
+    new_rows = int((df["ds"] > pd.Timestamp(entry["last_ds"])).sum())
+    if new_rows == 0:
+        return None, None
+    age_days = (df["ds"].iloc[-1] - pd.Timestamp(entry["full_fit_ds"])).days
+    if new_rows > TRAIN_MAX_INCREMENTAL_ROWS or age_days > TRAIN_REFIT_AFTER_DAYS:
+        return "full", None
+    return "incremental", (path, new_rows)
+
+
+# === Resource accounting (Linux /proc and cgroup files) ===
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM, so each pooled task measures its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _status_mb(field: str) -> float:
+    try:
+        with open("/proc/self/status") as f:
+            line = next(l for l in f if l.startswith(field + ":"))
+        return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, StopIteration):
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def available_memory_mb() -> float:
+    """MemAvailable, capped by the cgroup limit when running in a container."""
+    available = float("inf")
+    try:
+        with open("/proc/meminfo") as f:
+            line = next(l for l in f if l.startswith("MemAvailable:"))
+        available = int(line.split()[1]) / 1024
+    except (OSError, StopIteration):
+        pass
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            with open("/sys/fs/cgroup/memory.current") as f:
+                used = int(f.read().strip())
+            available = min(available, (int(limit) - used) / 2**20)
+    except (OSError, ValueError):
+        pass
+    return available
+
+
+def run_training_task(ticker: str, model: str, df: pd.DataFrame, entry=None) -> dict:
+    """
+    Train one (ticker, model) inside a pool worker and report how it went.
+    `entry` is the ticker's training state for this model, if any.
+    """
+    _reset_peak_rss()
+    start = time.perf_counter()
+    record = {"ticker": ticker, "model": model, "status": "trained", "mode": None,
+              "accuracy": None, "error": None, "state": None}
+    try:
+        mode, update = plan_training(model, ticker, df, entry)
+        if mode is None:
+            record["status"] = "skipped"
+            if USE_LOCAL:
+                # Only local runs keep artifacts in MODEL_DIR; SageMaker starts empty
+                backfill_serving_artifact(model, ticker)
+        else:
+            record["mode"] = mode
+            record["accuracy"] = TRAINERS[model](ticker, df, update=update)
+        if mode and record["accuracy"] is None:
+            record["status"] = "skipped"
+        elif mode:
+            last_ds = str(df["ds"].iloc[-1].date())
+            record["state"] = {
+                "trained_at": datetime.utcnow().isoformat(),
+                "last_ds": last_ds,
+                "full_fit_ds": last_ds if mode == "full" else entry["full_fit_ds"],
+                "updates": 0 if mode == "full" else entry.get("updates", 0) + 1,
+            }
     except Exception as e:
-        print(f"❌ Failed {ticker}: {e}")
+        print(f"❌ {model} failed for {ticker}: {e}")
+        record.update(status="failed", error=str(e))
+    record["wall_s"] = round(time.perf_counter() - start, 3)
+    record["peak_rss_mb"] = _status_mb("VmHWM")
+    gc.collect()
+    return record
 
-def train_all_sp500():
-    tickers = ["AAPL"]
-    print(f"📈 Found {len(tickers)} S&P 500 tickers")
-    # This maximizes CPU usage while avoiding deadlocks and mutex corruption from TensorFlow under concurrency.
-    # Light models (thread-safe)
-    # with ThreadPoolExecutor(max_workers=4) as executor:
-    #     executor.map(train_light_models, tickers)
-
-    # Heavy models (TensorFlow)
-    with ProcessPoolExecutor(max_workers=1) as executor:
-        executor.map(train_heavy_models, tickers)
-    
-    print(f"{accuracy_tracker.items()}")
-    
-    # Save accuracy.json per model
+
+# === Scheduler ===
+
+class TrainingScheduler:
+    """
+    Fetch each ticker's history once, then fan its models out over the light
+    and LSTM process pools while keeping projected memory above the reserve.
+    """
+
+    def __init__(self, light_workers: int = TRAIN_LIGHT_WORKERS, lstm_workers: int = TRAIN_LSTM_WORKERS,
+                 reserve_mb: int = TRAIN_MEMORY_RESERVE_MB, memory_fn=available_memory_mb, state=None):
+        self.state = state or {}
+        self.workers = {"light": max(1, light_workers), "lstm": max(1, lstm_workers)}
+        self.reserve_mb = reserve_mb
+        self.memory_fn = memory_fn
+        self.estimates = dict(MEMORY_ESTIMATES_MB)
+        self.records = []
+
+    def _pool_for(self, model: str) -> str:
+        return "lstm" if model == "lstm" else "light"
+
+    def _admit(self, pools, pending, inflight) -> None:
+        budget = self.memory_fn() - self.reserve_mb
+        for name, queue in pending.items():
+            running = sum(1 for pool_name, *_ in inflight.values() if pool_name == name)
+            while queue and running < self.workers[name]:
+                ticker, model, df = queue[0]
+                need = self.estimates[model]
+                # Under memory pressure wait for running tasks, but never stall an idle scheduler
+                if inflight and need > budget:
+                    break
+                queue.popleft()
+                entry = self.state.get(model, {}).get(ticker)
+                inflight[pools[name].submit(run_training_task, ticker, model, df, entry)] = (name, ticker, model)
+                budget -= need
+                running += 1
+
+    def _finish(self, future, inflight) -> None:
+        _, ticker, model = inflight.pop(future)
+        try:
+            record = future.result()
+        except Exception as e:  # worker crashed (e.g. OOM-killed)
+            record = {"ticker": ticker, "model": model, "status": "failed", "mode": None, "accuracy": None,
+                      "error": str(e), "state": None, "wall_s": None, "peak_rss_mb": None}
+        if record["status"] == "trained" and record["peak_rss_mb"]:
+            self.estimates[model] = max(self.estimates[model], record["peak_rss_mb"])
+        self.records.append(record)
+
+    def run(self, tickers, fetch=None) -> list:
+        fetch = fetch or prepare_yfinance_data
+        ctx = multiprocessing.get_context("spawn")
+        pools = {name: ProcessPoolExecutor(max_workers=n, mp_context=ctx) for name, n in self.workers.items()}
+        pending = {"light": deque(), "lstm": deque()}
+        inflight = {}
+        try:
+            with ThreadPoolExecutor(max_workers=DATA_WORKERS) as fetcher:
+                fetches = {fetcher.submit(fetch, t): t for t in tickers}
+                while fetches or inflight or any(pending.values()):
+                    for future in [f for f in fetches if f.done()]:
+                        ticker = fetches.pop(future)
+                        try:
+                            df = future.result()
+                        except Exception as e:
+                            df, error = pd.DataFrame(), str(e)
+                        else:
+                            error = "no data"
+                        if df.empty:
+                            print(f"❌ No data for {ticker}")
+                            self.records.append({"ticker": ticker, "model": None, "status": "failed",
+                                                 "mode": None, "accuracy": None, "error": error,
+                                                 "state": None, "wall_s": None, "peak_rss_mb": None})
+                            continue
+                        for model in LIGHT_MODELS + ["lstm"]:
+                            pending[self._pool_for(model)].append((ticker, model, df))
+
+                    self._admit(pools, pending, inflight)
+                    waiting = list(inflight) + list(fetches)
+                    if not waiting:
+                        continue
+                    done, _ = wait(waiting, timeout=5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in inflight:
+                            self._finish(future, inflight)
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+        return self.records
+
+    def report(self) -> dict:
+        summary = {}
+        for r in self.records:
+            if r["model"] is None:
+                continue
+            s = summary.setdefault(r["model"], {"trained": 0, "skipped": 0, "failed": 0, "full": 0,
+                                                "incremental": 0, "wall_s": 0.0, "peak_rss_mb": 0.0})
+            s[r["status"]] += 1
+            if r["status"] == "trained":
+                s[r["mode"]] += 1
+            s["wall_s"] = round(s["wall_s"] + (r["wall_s"] or 0.0), 3)
+            s["peak_rss_mb"] = max(s["peak_rss_mb"], r["peak_rss_mb"] or 0.0)
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "workers": self.workers,
+            "memory_estimates_mb": self.estimates,
+            "summary": summary,
+            "tasks": self.records,
+        }
+
+
+def save_accuracy(records) -> None:
+    for r in records:
+        if r["status"] == "trained" and r["accuracy"] is not None:
+            accuracy_tracker[r["model"]][r["ticker"]] = r["accuracy"]
+
+    # Save accuracy.json per model, keeping scores of models skipped this run
     for model, accs in accuracy_tracker.items():
         try:
             path = os.path.join(MODEL_DIR, model, "accuracy.json")
-            print(f"Accuracy for model: {model} -> {accs}" )
+            existing = load_model_json(model, "accuracy.json")
+            existing.update(accs)
             with open(path, "w") as f:
-                json.dump(accs, f, indent=2)
+                json.dump(existing, f, indent=2)
             print(f"📈 Saved accuracy for {model} → {path}")
         except Exception as e:
             print(f"❌ Failed to save accuracy.json: {e}")
 
+
+def save_training_state(state, records) -> None:
+    for r in records:
+        if r["state"]:
+            state.setdefault(r["model"], {})[r["ticker"]] = r["state"]
+    for model, entries in state.items():
+        path = os.path.join(MODEL_DIR, model, "training_state.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(entries, f, indent=2)
+
+
+def record_training_metrics(records, elapsed_s: float) -> None:
+    """Task timings and outcomes in Prometheus text format, next to the training report."""
+    batch_stage_seconds.observe(elapsed_s, stage="run", model="", endpoint="", job="training")
+    for r in records:
+        batch_items.inc(job="training", item=f"{r['model'] or 'data'}_{r['status']}")
+        if r["wall_s"] is not None:
+            batch_stage_seconds.observe(r["wall_s"], stage=f"train_{r['mode'] or r['status']}",
+                                        model=r["model"], endpoint="", job="training")
+    try:
+        metrics.write_textfile(METRICS_PATH)
+    except OSError as e:
+        print(f"⚠️ Failed to write training metrics: {e}")
+
+
+def train_all_sp500(tickers=None):
+    # TRAIN_TICKERS=AAPL,MSFT restricts a run to a few tickers
+    tickers = tickers or [t for t in os.getenv("TRAIN_TICKERS", "").split(",") if t] or get_sp500_tickers()
+    print(f"📈 Found {len(tickers)} S&P 500 tickers")
+
+    state = {model: load_model_json(model, "training_state.json") for model in TRAINERS}
+    scheduler = TrainingScheduler(state=state)
+    start = time.perf_counter()
+    # One bulk refresh of the whole universe instead of a request per ticker
+    closes = price_store.close_matrix(tickers)
+    records = scheduler.run(tickers, fetch=lambda t: column_frame(closes, t.upper()))
+    save_accuracy(records)
+    save_training_state(state, records)
+
+    elapsed = time.perf_counter() - start
+    report = scheduler.report()
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    record_training_metrics(records, elapsed)
+    print(f"⏱️ Trained {len(tickers)} tickers in {elapsed:.1f}s: {report['summary']}")
+    print(f"📝 Saved training report → {REPORT_PATH}")
+
+
 if __name__ == "__main__":
-    train_all_sp500()
\ No newline at end of file
+    train_all_sp500()
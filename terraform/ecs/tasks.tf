@@ -35,6 +35,8 @@ resource "aws_ecs_service" "backend" {
   task_definition = aws_ecs_task_definition.backend.arn
   launch_type     = "FARGATE"
   desired_count   = 1
+  # /ready returns 503 while the model caches warm up
+  health_check_grace_period_seconds = 300
 
   network_configuration {
     subnets         = var.subnets
@@ -85,7 +85,7 @@ resource "aws_lb_target_group" "backend" {
   vpc_id      = aws_vpc.main.id
 
   health_check {
-    path                = "/health"
+    path                = "/ready"
     protocol            = "HTTP"
     matcher             = "200"
     interval            = 30